@@ -1,11 +1,42 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from universities.models import University, Program, Coordinator
 
+from accounts import synthetic_data
+
 
 class Command(BaseCommand):
     help = 'Populate database with sample Italian universities and programs'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            help='Generate a synthetic load-testing dataset instead; 1.0 is the production profile '
+                 '(5k universities, 500k programs, 2M coordinators, 10M email logs)'
+        )
+        parser.add_argument('--universities', type=int, help='Override the number of synthetic universities')
+        parser.add_argument('--programs', type=int, help='Override the number of synthetic programs')
+        parser.add_argument('--coordinators', type=int, help='Override the number of synthetic coordinators')
+        parser.add_argument('--email-logs', type=int, help='Override the number of synthetic email logs')
+        parser.add_argument(
+            '--users',
+            type=int,
+            help=f'Users sending the synthetic email logs (default: one per {synthetic_data.EMAIL_LOGS_PER_USER} logs)'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed of the synthetic dataset (default: 42)')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=synthetic_data.DEFAULT_BATCH_SIZE,
+            help=f'Rows per bulk insert (default: {synthetic_data.DEFAULT_BATCH_SIZE})'
+        )
+
     def handle(self, *args, **options):
+        if options['scale'] is not None:
+            return self.generate_synthetic(options)
+
         self.stdout.write('Creating sample data...')
         
         # Create Italian universities
@@ -367,3 +398,38 @@ class Command(BaseCommand):
                 f'{len(programs)} programs, and {len(coordinators_data)} coordinators'
             )
         )
+
+    def generate_synthetic(self, options):
+        if options['scale'] <= 0:
+            raise CommandError('--scale must be positive')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if synthetic_data.synthetic_data_exists():
+            raise CommandError('Synthetic data already exists; flush the database before generating it again')
+
+        sizes = synthetic_data.scaled_sizes(
+            options['scale'],
+            universities=options['universities'],
+            programs=options['programs'],
+            coordinators=options['coordinators'],
+            email_logs=options['email_logs'],
+        )
+        if sizes['programs'] and not sizes['universities']:
+            raise CommandError('Programs need at least one university')
+        self.stdout.write(
+            f"Generating {sizes['universities']} universities, {sizes['programs']} programs, "
+            f"{sizes['coordinators']} coordinators and {sizes['email_logs']} email logs "
+            f"(seed {options['seed']})..."
+        )
+
+        started = time.monotonic()
+        synthetic_data.generate(
+            sizes,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            users=options['users'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Synthetic data generated in {time.monotonic() - started:.1f}s')
+        )
@@ -0,0 +1,408 @@
+"""
+Deterministic synthetic data for load testing.
+
+generate() fills the database with universities, programs, coordinators,
+users and email logs at production-like volumes. Everything is drawn from a
+random.Random seeded by the caller, so the same seed and sizes give the same
+data on an empty database, and rows are written with bulk_create in batches:
+programs and coordinators are generated one batch of universities at a time
+and only primary keys are kept in memory (compact arrays) for the email logs.
+
+bulk_create bypasses model saves and signals, so generate() recomputes the
+catalog counters, rebuilds the search index and bumps the catalog version at
+the end.
+"""
+
+import random
+import time
+from array import array
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from payments.models import EmailLog
+from universities import search
+from universities.catalog_version import bump_catalog_version
+from universities.counters import recount_programs, recount_universities
+from universities.ids import assign_ids, program_base_id, university_base_id
+from universities.models import University, Program, Coordinator
+
+
+# Volumes at scale 1.0, roughly a national-scale production catalog
+PRODUCTION_SIZES = {
+    'universities': 5000,
+    'programs': 500000,
+    'coordinators': 2000000,
+    'email_logs': 10000000,
+}
+
+# Email logs per synthetic user when the number of users is not given
+EMAIL_LOGS_PER_USER = 200
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Description of every synthetic university, used to detect earlier runs
+SYNTHETIC_MARKER = 'Synthetic university generated for load testing.'
+SYNTHETIC_USERNAME_PREFIX = 'synthetic'
+
+COUNTRIES = {
+    'Italy': (['Bologna', 'Rome', 'Milan', 'Padua', 'Turin', 'Naples', 'Florence', 'Pisa', 'Genoa', 'Trento'],
+              ['Università di {city}', 'Politecnico di {city}', 'Università degli Studi di {city}'], 'Italian', 'it'),
+    'Germany': (['Berlin', 'Munich', 'Hamburg', 'Heidelberg', 'Aachen', 'Cologne', 'Dresden', 'Freiburg'],
+                ['Universität {city}', 'Technische Universität {city}', 'Hochschule {city}'], 'German', 'de'),
+    'France': (['Paris', 'Lyon', 'Toulouse', 'Grenoble', 'Bordeaux', 'Lille', 'Strasbourg', 'Nantes'],
+               ['Université de {city}', 'École Polytechnique de {city}', 'Institut National de {city}'], 'French', 'fr'),
+    'Spain': (['Madrid', 'Barcelona', 'Valencia', 'Seville', 'Granada', 'Salamanca', 'Bilbao'],
+              ['Universidad de {city}', 'Universidad Politécnica de {city}'], 'Spanish', 'es'),
+    'Netherlands': (['Amsterdam', 'Delft', 'Leiden', 'Utrecht', 'Groningen', 'Eindhoven', 'Rotterdam'],
+                    ['University of {city}', '{city} University of Technology'], 'Dutch', 'nl'),
+    'United Kingdom': (['London', 'Manchester', 'Edinburgh', 'Glasgow', 'Bristol', 'Leeds', 'Oxford', 'Cambridge'],
+                       ['University of {city}', '{city} Metropolitan University', '{city} College'], 'English', 'ac.uk'),
+    'Sweden': (['Stockholm', 'Uppsala', 'Lund', 'Gothenburg', 'Linköping'],
+               ['{city} University', 'Royal Institute of Technology {city}'], 'Swedish', 'se'),
+    'Poland': (['Warsaw', 'Krakow', 'Wroclaw', 'Gdansk', 'Poznan'],
+               ['University of {city}', '{city} University of Technology'], 'Polish', 'pl'),
+}
+
+# Share of universities per country
+COUNTRY_WEIGHTS = {
+    'Italy': 20, 'Germany': 20, 'France': 15, 'Spain': 12,
+    'Netherlands': 8, 'United Kingdom': 15, 'Sweden': 5, 'Poland': 5,
+}
+
+FIELDS_OF_STUDY = [
+    'Computer Science', 'Data Science', 'Artificial Intelligence', 'Software Engineering',
+    'Electrical Engineering', 'Mechanical Engineering', 'Civil Engineering', 'Chemical Engineering',
+    'Biomedical Engineering', 'Aerospace Engineering', 'Mathematics', 'Statistics', 'Physics',
+    'Chemistry', 'Biology', 'Biotechnology', 'Neuroscience', 'Medicine', 'Public Health',
+    'Economics', 'Finance', 'Business Administration', 'Marketing', 'Management', 'Law',
+    'International Relations', 'Political Science', 'Psychology', 'Sociology', 'Architecture',
+    'Design', 'Fine Arts', 'History', 'Philosophy', 'Linguistics', 'Environmental Science',
+    'Agricultural Science', 'Food Science', 'Tourism Management', 'Education',
+]
+
+DEGREE_LEVELS = [('master', 60), ('bachelor', 20), ('phd', 15), ('diploma', 5)]
+
+DEGREE_TITLES = {
+    'master': ['Master in {field}', 'Master of Science in {field}', 'MSc {field}', 'Master of Arts in {field}'],
+    'bachelor': ['Bachelor in {field}', 'Bachelor of Science in {field}', 'BSc {field}'],
+    'phd': ['PhD in {field}', 'Doctoral Programme in {field}'],
+    'diploma': ['Diploma in {field}', 'Postgraduate Diploma in {field}'],
+}
+
+TRACKS = ['Applied', 'Advanced', 'International', 'Computational', 'Sustainable', 'Digital', 'Quantitative']
+
+FIRST_NAMES = [
+    'Marco', 'Anna', 'Giulia', 'Luca', 'Sofia', 'Hans', 'Lena', 'Jonas', 'Marie', 'Pierre', 'Camille',
+    'Lucas', 'Carmen', 'Javier', 'Lucia', 'Pieter', 'Sanne', 'James', 'Emma', 'Oliver', 'Erik', 'Astrid',
+    'Piotr', 'Zofia', 'Elena', 'Matteo', 'Clara', 'Felix', 'Ines', 'Noah',
+]
+LAST_NAMES = [
+    'Rossi', 'Bianchi', 'Romano', 'Colombo', 'Müller', 'Schmidt', 'Schneider', 'Fischer', 'Martin',
+    'Bernard', 'Dubois', 'Garcia', 'Fernandez', 'Lopez', 'de Jong', 'Jansen', 'Smith', 'Jones', 'Taylor',
+    'Brown', 'Andersson', 'Johansson', 'Nowak', 'Kowalski', 'Esposito', 'Ricci', 'Weber', 'Moreau',
+    'Martinez', 'Visser',
+]
+TITLES = ['Prof.', 'Dr.', '']
+ROLES = [('coordinator', 50), ('professor', 20), ('advisor', 15), ('director', 10), ('head', 5)]
+
+EMAIL_SUBJECTS = [
+    'Inquiry about the {program} program',
+    'Application question - {program}',
+    'Admission requirements for {program}',
+    'Scholarship opportunities in {program}',
+]
+EMAIL_STATUSES = [('sent', 90), ('failed', 5), ('pending', 5)]
+EMAIL_PROVIDERS = [('gmail', 70), ('outlook', 30)]
+
+
+def scaled_sizes(scale, **overrides):
+    """PRODUCTION_SIZES multiplied by ``scale``, with explicit counts taking precedence"""
+    sizes = {name: max(1, int(round(count * scale))) for name, count in PRODUCTION_SIZES.items()}
+    sizes.update({name: count for name, count in overrides.items() if count is not None})
+    return sizes
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _spread(rng, total, buckets):
+    """Split ``total`` into ``buckets`` skewed, non-negative counts"""
+    weights = [rng.lognormvariate(0, 0.8) for _ in range(buckets)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in rng.sample(range(buckets), total - sum(counts)) if buckets else []:
+        counts[index] += 1
+    return counts
+
+
+def _slug(value):
+    return ''.join(c for c in value.lower() if c.isalnum())
+
+
+class SyntheticDataGenerator:
+    """
+    Generates the synthetic dataset; see generate().
+
+    Args:
+        sizes: Dict with the number of universities, programs, coordinators
+            and email_logs to create
+        seed: Seed of the random generator
+        batch_size: Rows per bulk_create
+        users: Number of users sending the email logs
+        log: Optional callable receiving progress messages
+    """
+
+    def __init__(self, sizes, seed=42, batch_size=DEFAULT_BATCH_SIZE, users=None, log=None):
+        self.sizes = sizes
+        # One generator per stream so the data does not depend on the batch size
+        self.rng = random.Random(f'{seed}:universities')
+        self.program_rng = random.Random(f'{seed}:programs')
+        self.coordinator_rng = random.Random(f'{seed}:coordinators')
+        self.email_rng = random.Random(f'{seed}:email_logs')
+        self.batch_size = batch_size
+        self.users = users if users is not None else max(1, sizes['email_logs'] // EMAIL_LOGS_PER_USER)
+        self.log = log or (lambda message: None)
+        self.coordinator_ids = array('q')
+        self.program_names = {}
+        self.now = timezone.now()
+
+    def _progress(self, name, done, total, started):
+        rate = done / (time.monotonic() - started or 1e-9)
+        self.log(f'{name}: {done}/{total} ({rate:.0f} rows/s)')
+
+    def universities(self):
+        """Create the universities; returns their (pk, university_id, domain) rows"""
+        total = self.sizes['universities']
+        countries = list(COUNTRY_WEIGHTS)
+        weights = [COUNTRY_WEIGHTS[country] for country in countries]
+        used_names = set()
+        created = []
+        started = time.monotonic()
+
+        for start in range(0, total, self.batch_size):
+            batch = []
+            for index in range(start, min(start + self.batch_size, total)):
+                country = self.rng.choices(countries, weights)[0]
+                cities, patterns, _, tld = COUNTRIES[country]
+                city = self.rng.choice(cities)
+                name = self.rng.choice(patterns).format(city=city)
+                if name in used_names:
+                    name = f'{name} - Campus {index}'
+                used_names.add(name)
+                batch.append(University(
+                    name=name,
+                    country=country,
+                    city=city,
+                    website=f'https://www.{_slug(name)[:40]}{index}.{tld}',
+                    description=SYNTHETIC_MARKER,
+                    established_year=self.rng.randint(1088, 2015),
+                    student_count=self.rng.randint(2000, 120000),
+                    ranking_world=self.rng.randint(1, 2000),
+                    ranking_country=self.rng.randint(1, 200),
+                ))
+            assign_ids(batch, 'university_id', lambda u: university_base_id(u.name, u.country))
+            University.objects.bulk_create(batch)
+            created.extend(
+                (university.pk, university.university_id, university.website.split('//www.', 1)[1], university.country)
+                for university in batch
+            )
+            self._progress('universities', len(created), total, started)
+
+        if created[0][0] is None:
+            # Backends without RETURNING from bulk inserts
+            pks = dict(University.objects.filter(
+                description=SYNTHETIC_MARKER
+            ).values_list('university_id', 'pk'))
+            created = [(pks[public_id], public_id, domain, country) for _, public_id, domain, country in created]
+        return created
+
+    def _program(self, university, index):
+        university_pk, public_id, _, country = university
+        language = 'English' if self.program_rng.random() < 0.7 else COUNTRIES[country][2]
+        field = self.program_rng.choice(FIELDS_OF_STUDY)
+        level = _weighted(self.program_rng, DEGREE_LEVELS)
+        name = self.program_rng.choice(DEGREE_TITLES[level]).format(field=field)
+        names = self.program_names.setdefault(university_pk, set())
+        if name in names:
+            name = f'{name} ({self.program_rng.choice(TRACKS)} Track {index})'
+        names.add(name)
+
+        tuition = None
+        if self.program_rng.random() > 0.1:
+            tuition = Decimal(round(self.program_rng.lognormvariate(8, 0.9), -1)).quantize(Decimal('0.01'))
+            tuition = min(tuition, Decimal('99999.00'))
+        deadline = date(self.now.year, 1, 1) + timedelta(days=self.program_rng.randint(30, 500))
+
+        program = Program(
+            university_id=university_pk,
+            name=name,
+            field_of_study=field,
+            degree_level=level,
+            description=f'{name} at a {country} university, taught in {language}.',
+            duration_months=self.program_rng.choice([12, 18, 24, 36, 48]),
+            language=language,
+            tuition_fee_euro=tuition,
+            application_deadline=deadline,
+            start_date=deadline + timedelta(days=self.program_rng.randint(60, 180)),
+            min_gpa=Decimal(self.program_rng.choice(['2.50', '2.75', '3.00', '3.25', '3.50'])),
+            ielts_score=Decimal(self.program_rng.choice(['5.5', '6.0', '6.5', '7.0'])),
+            toefl_score=self.program_rng.choice([None, 79, 90, 100]),
+            gre_score=self.program_rng.choice([None, None, 300, 310, 320]),
+            is_active=self.program_rng.random() < 0.95,
+        )
+        program._university_public_id = public_id
+        return program
+
+    def _coordinators(self, program, university, count):
+        _, _, domain, _ = university
+        coordinators = []
+        emails = set()
+        for _ in range(count):
+            first = self.coordinator_rng.choice(FIRST_NAMES)
+            last = self.coordinator_rng.choice(LAST_NAMES)
+            title = self.coordinator_rng.choice(TITLES)
+            email = f'{_slug(first)}.{_slug(last)}@{domain}'
+            if email in emails:
+                email = f'{_slug(first)}.{_slug(last)}{len(emails)}@{domain}'
+            emails.add(email)
+            coordinators.append(Coordinator(
+                university_id=program.university_id,
+                program_id=program.pk,
+                name=f'{title} {first} {last}'.strip(),
+                public_email=email,
+                role=_weighted(self.coordinator_rng, ROLES),
+                department=program.field_of_study,
+                is_active=self.coordinator_rng.random() < 0.97,
+            ))
+        return coordinators
+
+    def _flush_coordinators(self, coordinators):
+        Coordinator.objects.bulk_create(coordinators, batch_size=self.batch_size)
+        if coordinators and coordinators[0].pk is None:
+            raise RuntimeError('Synthetic data generation needs a database returning primary keys from bulk inserts')
+        self.coordinator_ids.extend(coordinator.pk for coordinator in coordinators)
+
+    def programs_and_coordinators(self, universities):
+        """Create programs batch by batch together with their coordinators"""
+        program_counts = _spread(self.program_rng, self.sizes['programs'], len(universities))
+        coordinator_counts = iter(_spread(self.coordinator_rng, self.sizes['coordinators'], self.sizes['programs']))
+        total_programs = self.sizes['programs']
+        done = 0
+        started = time.monotonic()
+
+        pending = []
+        for university, count in zip(universities, program_counts):
+            for index in range(count):
+                pending.append((self._program(university, index), university))
+            if len(pending) >= self.batch_size:
+                done += self._write_programs(pending, coordinator_counts)
+                pending = []
+                self._progress('programs', done, total_programs, started)
+        if pending:
+            done += self._write_programs(pending, coordinator_counts)
+            self._progress('programs', done, total_programs, started)
+        self.program_names.clear()
+        self.log(f'coordinators: {len(self.coordinator_ids)}')
+
+    def _write_programs(self, pending, coordinator_counts):
+        programs = [program for program, _ in pending]
+        assign_ids(programs, 'program_id', lambda p: program_base_id(p._university_public_id, p.name))
+        with transaction.atomic():
+            Program.objects.bulk_create(programs, batch_size=self.batch_size)
+            coordinators = []
+            for program, university in pending:
+                coordinators.extend(self._coordinators(program, university, next(coordinator_counts, 0)))
+                if len(coordinators) >= self.batch_size:
+                    self._flush_coordinators(coordinators)
+                    coordinators = []
+            self._flush_coordinators(coordinators)
+        return len(programs)
+
+    def create_users(self):
+        """Create (or reuse) the synthetic users; returns their primary keys"""
+        User = get_user_model()
+        existing = User.objects.filter(username__startswith=SYNTHETIC_USERNAME_PREFIX)
+        user_ids = array('q', existing.order_by('pk').values_list('pk', flat=True)[:self.users])
+        password = make_password(None)
+        index = len(user_ids)
+        while len(user_ids) < self.users:
+            batch = []
+            for _ in range(min(self.batch_size, self.users - len(user_ids) - len(batch))):
+                username = f'{SYNTHETIC_USERNAME_PREFIX}{index:08d}'
+                index += 1
+                batch.append(User(
+                    username=username,
+                    email=f'{username}@example.com',
+                    password=password,
+                    nationality=self.email_rng.choice(list(COUNTRIES)),
+                ))
+            User.objects.bulk_create(batch)
+            user_ids.extend(user.pk for user in batch)
+        self.log(f'users: {len(user_ids)}')
+        return user_ids
+
+    def email_logs(self, user_ids):
+        total = self.sizes['email_logs']
+        if not total or not self.coordinator_ids:
+            return
+        started = time.monotonic()
+        for start in range(0, total, self.batch_size):
+            batch = []
+            for _ in range(min(self.batch_size, total - start)):
+                status = _weighted(self.email_rng, EMAIL_STATUSES)
+                sent_at = None
+                if status != 'pending':
+                    sent_at = self.now - timedelta(seconds=self.email_rng.randint(0, 365 * 24 * 3600))
+                batch.append(EmailLog(
+                    user_id=self.email_rng.choice(user_ids),
+                    coordinator_id=self.email_rng.choice(self.coordinator_ids),
+                    subject=self.email_rng.choice(EMAIL_SUBJECTS).format(program=self.email_rng.choice(FIELDS_OF_STUDY)),
+                    body='Dear Professor,\n\nI am interested in applying to your program.\n\nBest regards',
+                    email_provider=_weighted(self.email_rng, EMAIL_PROVIDERS),
+                    status=status,
+                    sent_at=sent_at,
+                    error_message='Recipient address rejected' if status == 'failed' else None,
+                ))
+            EmailLog.objects.bulk_create(batch)
+            self._progress('email logs', start + len(batch), total, started)
+
+    def finish(self):
+        """Rebuild what bulk_create bypassed"""
+        self.log('recomputing counters and the search index')
+        recount_programs()
+        recount_universities()
+        if search.is_supported(connection):
+            search.create_index(connection)
+            search.reindex_programs(conn=connection)
+        bump_catalog_version()
+
+
+def synthetic_data_exists():
+    return University.objects.filter(description=SYNTHETIC_MARKER).exists()
+
+
+def generate(sizes, seed=42, batch_size=DEFAULT_BATCH_SIZE, users=None, log=None):
+    """
+    Generate a synthetic dataset.
+
+    Args:
+        sizes: Dict of counts, see scaled_sizes()
+        seed: Seed making the data reproducible
+        batch_size: Rows per bulk_create
+        users: Users sending the email logs (default: email_logs / 200)
+        log: Optional callable receiving progress messages
+    """
+    generator = SyntheticDataGenerator(sizes, seed=seed, batch_size=batch_size, users=users, log=log)
+    universities = generator.universities()
+    generator.programs_and_coordinators(universities)
+    if sizes['email_logs']:
+        generator.email_logs(generator.create_users())
+    generator.finish()
+    return generator
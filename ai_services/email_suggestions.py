@@ -9,6 +9,8 @@ from typing import Dict, List, Optional
 import logging
 import json
 
+from uniworld_backend.metrics import track_outbound
+
 logger = logging.getLogger(__name__)
 
 class EmailSuggestionService:
@@ -22,11 +24,16 @@ class EmailSuggestionService:
         logger.info(f"Gemini client initialized with model: {self.model_name}")
         logger.info(f"Gemini API key configured: {bool(settings.GEMINI_API_KEY)}")
     
+    def _generate_content(self, prompt):
+        """Call Gemini, recording latency and errors in the outbound call metrics"""
+        with track_outbound('gemini', self.model_name):
+            return self.model.generate_content(prompt)
+    
     def test_gemini_connection(self):
         """Test Gemini API connection"""
         try:
             logger.info("Testing Gemini API connection...")
-            response = self.model.generate_content("Say hello in Italian.")
+            response = self._generate_content("Say hello in Italian.")
             result = response.text.strip()
             logger.info(f"Gemini test successful: {result}")
             return True
@@ -65,7 +72,7 @@ class EmailSuggestionService:
             # Create a system message for Gemini
             full_prompt = f"IMPORTANT: You MUST respond in {language.upper()} language only. Generate ONE professional, concise email subject line for students contacting university coordinators. Return ONLY the subject line, no explanations or multiple options. Language: {language.upper()}.\n\n{prompt}"
             
-            response = self.model.generate_content(full_prompt)
+            response = self._generate_content(full_prompt)
             return response.text.strip()
             
         except Exception as e:
@@ -111,7 +118,7 @@ class EmailSuggestionService:
             # Create a system message for Gemini
             full_prompt = f"CRITICAL: You MUST write the entire email content in {language.upper()} language. Do NOT use English. Write ONLY in {language.upper()}. Generate professional, personalized email content for students contacting university coordinators. Be respectful, specific, and demonstrate genuine interest in the program. Return ONLY the email body content (no subject line). Language requirement: {language.upper()} ONLY.\n\n{prompt}"
             
-            response = self.model.generate_content(full_prompt)
+            response = self._generate_content(full_prompt)
             content = response.text.strip()
             logger.info(f"Generated content (first 100 chars): {content[:100]}...")
             return content
@@ -389,7 +396,7 @@ Geef alleen de onderwerpen terug, één per regel.""",
             # Create a system message for Gemini
             full_prompt = f"You are an expert academic communication assistant. Generate multiple professional email subject line options. Respond in {language}.\n\n{prompt}"
             
-            response = self.model.generate_content(full_prompt)
+            response = self._generate_content(full_prompt)
             subjects = response.text.strip().split('\n')
             return [subject.strip() for subject in subjects if subject.strip()]
             
@@ -663,7 +670,7 @@ Geef alleen de verbeterde email-inhoud terug.""",
             # Create a system message for Gemini
             full_prompt = f"You are an expert academic communication assistant. Enhance email content while maintaining professionalism and the original intent. Respond in {language}.\n\n{prompt}"
             
-            response = self.model.generate_content(full_prompt)
+            response = self._generate_content(full_prompt)
             return response.text.strip()
             
         except Exception as e:
@@ -220,7 +220,7 @@ function setupEventListeners() {
 async function loadUniversitiesForFilter() {
     console.log('Loading universities for filter...');
     try {
-        const response = await fetch(`${API_BASE_URL}/universities/`);
+        const response = await fetch(`${API_BASE_URL}/universities/?stream=json`);
         console.log('Universities API response status:', response.status);
         
         const data = await response.json();
@@ -304,7 +304,7 @@ async function apiRequest(endpoint, options = {}) {
 async function loadUniversities() {
     console.log('=== LOADING UNIVERSITIES ===');
     try {
-        const universities = await apiRequest('/universities/');
+        const universities = await apiRequest('/universities/?stream=json');
         console.log('Universities API response:', universities);
         allUniversities = universities.results || universities;
         console.log('Universities array:', allUniversities);
@@ -328,7 +328,7 @@ async function loadUniversities() {
 async function loadPrograms() {
     console.log('=== LOADING PROGRAMS ===');
     try {
-        const programs = await apiRequest('/programs/');
+        const programs = await apiRequest('/programs/?stream=json');
         console.log('Programs API response:', programs);
         allPrograms = programs.results || programs;
         console.log('Programs array:', allPrograms);
@@ -982,7 +982,7 @@ async function loadEmailSuggestions(programId) {
         console.log('Program ID:', program.program_id);
         
         // Use the program_id to filter coordinators
-        const data = await apiRequest(`/coordinators/?program_id=${program.program_id}`);
+        const data = await apiRequest(`/coordinators/?program_id=${program.program_id}&stream=json`);
         console.log('Coordinators API response:', data);
         
         const coordinators = data.results || data;
@@ -1106,7 +1106,7 @@ async function populateCoordinatorDetails(programId) {
         }
         
         // Fetch coordinators for this program
-        const data = await apiRequest(`/coordinators/?program_id=${program.program_id}`);
+        const data = await apiRequest(`/coordinators/?program_id=${program.program_id}&stream=json`);
         const coordinators = data.results || data;
         
         if (coordinators.length > 0) {
@@ -1280,7 +1280,7 @@ Best regards,
 // Get coordinators for a program
 async function getCoordinatorsForProgram(programId) {
     try {
-        const response = await fetch(`/api/coordinators/?program_id=${programId}`);
+        const response = await fetch(`/api/coordinators/?program_id=${programId}&stream=json`);
         const data = await response.json();
         return data.coordinators || [];
     } catch (error) {
@@ -1556,7 +1556,7 @@ async function showEmailCompositionModal(programId) {
     
     // Fetch coordinators to set the coordinator ID
     try {
-        const data = await apiRequest(`/coordinators/?program_id=${program.program_id}`);
+        const data = await apiRequest(`/coordinators/?program_id=${program.program_id}&stream=json`);
         const coordinators = data.results || data;
         
         if (coordinators.length > 0) {
@@ -2077,6 +2077,8 @@ async function searchPrograms() {
         if (universityValue && universityValue !== 'all') params.append('university', universityValue);
         if (degreeLevelValue && degreeLevelValue !== 'all') params.append('degree_level', degreeLevelValue);
         if (languageValue && languageValue !== 'all') params.append('language', languageValue);
+        // Every match (results are paged here); plain responses are one page
+        params.append('stream', 'json');
         
         const url = `${API_BASE_URL}/search/?${params.toString()}`;
         console.log('Search URL:', url);
@@ -2494,7 +2496,7 @@ async function handleBulkEmailSubmit(e) {
     const allCoordinators = [];
     for (const program of selectedPrograms) {
         try {
-            const data = await apiRequest(`/coordinators/?program_id=${program.program_id}`);
+            const data = await apiRequest(`/coordinators/?program_id=${program.program_id}&stream=json`);
             const coordinators = data.results || data;
             coordinators.forEach(coordinator => {
                 if (coordinator.email) {
@@ -2551,7 +2553,7 @@ async function handleBulkEmailSubmit(e) {
             closeBulkEmailModal();
             
             // Show success notification
-            showNotification(`Bulk email sent successfully to ${allCoordinators.length} coordinators!`, 'success');
+            showNotification(result.message || `Bulk email queued for ${allCoordinators.length} coordinators`, 'success');
             
             // Add to email history
             addBulkEmailToHistory(allCoordinators, subject, body);
@@ -3289,7 +3291,7 @@ async function generateBulkAISubject() {
         const firstProgram = selectedPrograms[0];
         
         // Get coordinators for the first program
-        const data = await apiRequest(`/coordinators/?program_id=${firstProgram.program_id}`);
+        const data = await apiRequest(`/coordinators/?program_id=${firstProgram.program_id}&stream=json`);
         const coordinators = data.results || data;
         
         if (coordinators.length === 0) {
@@ -3353,7 +3355,7 @@ async function generateBulkAIContent() {
         const firstProgram = selectedPrograms[0];
         
         // Get coordinators for the first program
-        const data = await apiRequest(`/coordinators/?program_id=${firstProgram.program_id}`);
+        const data = await apiRequest(`/coordinators/?program_id=${firstProgram.program_id}&stream=json`);
         const coordinators = data.results || data;
         
         if (coordinators.length === 0) {
@@ -3414,7 +3416,7 @@ async function generateEmailTypeBasedAI() {
         const firstProgram = selectedPrograms[0];
         
         // Get coordinators for the first program
-        const data = await apiRequest(`/coordinators/?program_id=${firstProgram.program_id}`);
+        const data = await apiRequest(`/coordinators/?program_id=${firstProgram.program_id}&stream=json`);
         const coordinators = data.results || data;
         
         if (coordinators.length === 0) {
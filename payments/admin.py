@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Subscription, Payment, EmailLog
+from .models import Subscription, Payment, EmailLog, BulkEmailJob, BulkEmailRecipient
 
 
 @admin.register(Subscription)
@@ -78,4 +78,27 @@ class EmailLogAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+
+
+class BulkEmailRecipientInline(admin.TabularInline):
+    """Recipients of a bulk email job"""
+    
+    model = BulkEmailRecipient
+    fields = ('position', 'coordinator_email', 'coordinator_name', 'status', 'attempts', 'sent_at', 'error_message')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(BulkEmailJob)
+class BulkEmailJobAdmin(admin.ModelAdmin):
+    """Admin configuration for BulkEmailJob model"""
+    
+    list_display = ('user', 'email_provider', 'status', 'total_recipients', 'sent_count', 'failed_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'email_provider', 'created_at')
+    search_fields = ('user__email', 'subject')
+    ordering = ('-created_at',)
+    inlines = [BulkEmailRecipientInline]
+    
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'heartbeat_at', 'worker_id')
@@ -0,0 +1,395 @@
+"""
+Background processing of bulk emails.
+
+send_bulk_email_api_view stores the send as a BulkEmailJob with one
+BulkEmailRecipient per coordinator (subject and body already personalized)
+and returns the job id right away; the messages are sent by a worker that
+records the outcome of every recipient as it goes, which is what
+/api/bulk-email-jobs/<id>/ reports.
+
+How jobs reach a worker depends on BULK_EMAIL_QUEUE:
+
+- ``thread``: a thread of the web process starts on the job as soon as the
+  request's transaction commits. Nothing else to run, meant for development.
+- ``db``: jobs wait in the database for ``manage.py run_bulk_email_worker``.
+- ``celery``: a Celery task is queued (``celery -A uniworld_backend worker``).
+
+Whatever the queue, a job is claimed with a conditional UPDATE so only one
+worker processes it. Messages go out through the provider's transport
+(email_transports: Gmail and Graph batch requests), with up to
+BULK_EMAIL_CONCURRENCY requests in flight at once, each waiting for the
+user's and the provider's token buckets (rate_limits) so the sends stay
+under the provider's quotas. The worker refreshes the job's heartbeat after
+every batch. Running jobs whose heartbeat is older than BULK_EMAIL_STALE_SECONDS
+(e.g. after a deploy killed the thread) are claimed again by the database
+worker and resume with the recipients still pending.
+"""
+
+import os
+import socket
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import DateTimeField, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from uniworld_backend.oauth_token_views import refresh_gmail_token, refresh_outlook_token
+
+from . import email_transports, rate_limits
+from .models import BulkEmailJob, BulkEmailRecipient
+
+
+QUEUES = ('thread', 'db', 'celery')
+
+# Provider -> label used in messages, User token fields and refresh function
+PROVIDERS = {
+    'gmail': ('Gmail', 'google', refresh_gmail_token),
+    'outlook': ('Outlook', 'microsoft', refresh_outlook_token),
+}
+
+
+class ProviderNotConnected(Exception):
+    """The user can not send through the provider; the message is shown to the user"""
+
+
+def ensure_access_token(user, provider):
+    """
+    Return a valid access token of the user for the provider, refreshing it if expired.
+
+    Raises:
+        ProviderNotConnected: The account is not connected or the refresh failed
+    """
+    label, prefix, refresh = PROVIDERS[provider]
+    access_token = getattr(user, f'{prefix}_access_token')
+    refresh_token = getattr(user, f'{prefix}_refresh_token')
+    expiry = getattr(user, f'{prefix}_token_expiry')
+
+    if not access_token:
+        raise ProviderNotConnected(f'{label} not connected. Please connect your {label} account first.')
+    if not expiry or expiry >= timezone.now():
+        return access_token
+    if not refresh_token:
+        raise ProviderNotConnected(f'{label} token expired. Please reconnect your {label} account.')
+
+    new_token_data = refresh(refresh_token)
+    if not new_token_data:
+        raise ProviderNotConnected(
+            f'{label} token expired and refresh failed. Please reconnect your {label} account.'
+        )
+    setattr(user, f'{prefix}_access_token', new_token_data.get('access_token'))
+    if new_token_data.get('refresh_token'):
+        setattr(user, f'{prefix}_refresh_token', new_token_data.get('refresh_token'))
+    expires_in = new_token_data.get('expires_in', 3600)
+    setattr(user, f'{prefix}_token_expiry', timezone.now() + timedelta(seconds=expires_in))
+    user.save()
+    return getattr(user, f'{prefix}_access_token')
+
+
+def personalize(user, coordinator):
+    """Subject and body of the message to one coordinator of a bulk send"""
+    coordinator_name = coordinator.get('name', 'Coordinator')
+    program_name = coordinator.get('program_name', 'Program')
+    university_name = coordinator.get('university_name', 'University')
+
+    # Get program details for more specific content
+    program_data = coordinator.get('program', {})
+    field_of_study = program_data.get('field_of_study', '')
+    degree_level = program_data.get('degree_level', '')
+
+    # Create program-specific subject
+    if program_name == 'test program 1':
+        personalized_subject = f"Test 1 Programme Inquiry - {user.full_name or user.email} - {program_name} at {university_name}"
+    elif program_name == 'test 2 programe':
+        personalized_subject = f"Test 2 Programme Inquiry - {user.full_name or user.email} - {program_name} at {university_name}"
+    else:
+        personalized_subject = f"{program_name} Programme Inquiry - {user.full_name or user.email} - {university_name}"
+
+    # Create program-specific email body
+    if program_name == 'test program 1':
+        personalized_body = f"""Dear {coordinator_name},
+
+My name is {user.full_name or user.email}, and I am writing to express my strong interest in the Test 1 Programme at the University of Turin. I am particularly drawn to this program's focus on {field_of_study} and believe it aligns perfectly with my academic and career goals.
+
+Having researched the University of Turin's excellent reputation in {field_of_study}, I am excited about the opportunity to contribute to and learn from your distinguished faculty. My background in economics provides a solid foundation for this {degree_level} program, and I am confident that my analytical skills and dedication to academic excellence would make me a valuable addition to your cohort.
+
+I would be grateful if you could provide me with further information regarding the admission requirements, application deadlines, and the selection criteria for the Test 1 Programme. I am particularly interested in understanding the program structure and any specific prerequisites.
+
+Thank you for your time and consideration. I look forward to hearing from you soon.
+
+Best regards,
+{user.full_name or user.email}"""
+
+    elif program_name == 'test 2 programe':
+        personalized_body = f"""Dear {coordinator_name},
+
+I hope this email finds you well. My name is {user.full_name or user.email}, and I am writing to inquire about the Test 2 Programme at the University of Turin. I am very interested in pursuing my {degree_level} studies in {field_of_study} at your prestigious institution.
+
+The University of Turin's commitment to academic excellence and innovation in {field_of_study} has particularly caught my attention. I believe that the Test 2 Programme would provide me with the advanced knowledge and skills necessary to excel in my chosen field.
+
+I would appreciate any information you could provide about the program curriculum, admission process, and application requirements. Additionally, I would be grateful for any insights into the program's unique features and what makes it stand out among similar programs.
+
+Thank you for taking the time to consider my inquiry. I look forward to your response and the possibility of joining your academic community.
+
+Best regards,
+{user.full_name or user.email}"""
+
+    else:
+        # Generic template for other programs
+        personalized_body = f"""Dear {coordinator_name},
+
+My name is {user.full_name or user.email}, and I am writing to express my interest in the {program_name} at {university_name}. I am particularly interested in the {field_of_study} field and believe this {degree_level} program would be an excellent fit for my academic and career aspirations.
+
+I would be grateful if you could provide me with information about the admission requirements, application process, and program details. Thank you for your time and consideration.
+
+Best regards,
+{user.full_name or user.email}"""
+
+    return personalized_subject, personalized_body
+
+
+def create_job(user, coordinators, subject, body, email_provider):
+    """Store a bulk send with its personalized messages and queue it"""
+    with transaction.atomic():
+        job = BulkEmailJob.objects.create(
+            user=user,
+            email_provider=email_provider,
+            subject=subject,
+            body=body,
+            total_recipients=len(coordinators),
+        )
+        recipients = []
+        for position, coordinator in enumerate(coordinators):
+            personalized_subject, personalized_body = personalize(user, coordinator)
+            recipient = BulkEmailRecipient(
+                job=job,
+                position=position,
+                coordinator_email=coordinator.get('email') or '',
+                coordinator_name=coordinator.get('name') or '',
+                program_name=coordinator.get('program_name') or '',
+                university_name=coordinator.get('university_name') or '',
+                subject=personalized_subject[:500],
+                body=personalized_body,
+            )
+            if not recipient.coordinator_email:
+                recipient.status = 'failed'
+                recipient.error_message = 'Missing coordinator email'
+            recipients.append(recipient)
+        BulkEmailRecipient.objects.bulk_create(recipients)
+
+        failed = sum(1 for recipient in recipients if recipient.status == 'failed')
+        if failed:
+            BulkEmailJob.objects.filter(pk=job.pk).update(failed_count=failed)
+            job.failed_count = failed
+        transaction.on_commit(lambda: enqueue(job))
+    return job
+
+
+def queue_backend():
+    backend = getattr(settings, 'BULK_EMAIL_QUEUE', 'thread')
+    if backend not in QUEUES:
+        raise ValueError(f'BULK_EMAIL_QUEUE must be one of: {", ".join(QUEUES)}')
+    return backend
+
+
+def enqueue(job):
+    """Hand a job to the configured queue"""
+    backend = queue_backend()
+    if backend == 'celery':
+        from .tasks import process_bulk_email_job
+        process_bulk_email_job.delay(job.pk)
+    elif backend == 'thread':
+        threading.Thread(target=_process_in_thread, args=(job.pk,), daemon=True).start()
+    # 'db': run_bulk_email_worker polls for queued jobs
+
+
+def _process_in_thread(job_id):
+    try:
+        process_job(job_id, worker_id=f'thread:{default_worker_id()}')
+    finally:
+        close_old_connections()
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def stale_before():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'BULK_EMAIL_STALE_SECONDS', 300))
+
+
+def _claimable():
+    return Q(status='queued') | Q(status='running', heartbeat_at__lt=stale_before())
+
+
+def claim_job(job_id, worker_id):
+    """Take a queued (or abandoned) job for this worker; False if someone else has it"""
+    now = timezone.now()
+    return BulkEmailJob.objects.filter(_claimable(), pk=job_id).update(
+        status='running',
+        worker_id=worker_id,
+        heartbeat_at=now,
+        started_at=Coalesce(F('started_at'), Value(now, output_field=DateTimeField())),
+    ) == 1
+
+
+def claim_next_job(worker_id):
+    """Claim the oldest claimable job, None when there is none"""
+    candidates = BulkEmailJob.objects.filter(_claimable()).order_by('created_at').values_list('pk', flat=True)
+    for job_id in candidates[:10]:
+        if claim_job(job_id, worker_id):
+            return job_id
+    return None
+
+
+def _fail_pending(job, message):
+    failed = job.recipients.filter(status='pending').update(status='failed', error_message=message)
+    BulkEmailJob.objects.filter(pk=job.pk).update(failed_count=F('failed_count') + failed)
+
+
+def _finish(job_id, error_message=None):
+    job = BulkEmailJob.objects.get(pk=job_id)
+    if job.sent_count == job.total_recipients:
+        job.status = 'completed'
+    elif job.sent_count:
+        job.status = 'partial'
+    else:
+        job.status = 'failed'
+    job.finished_at = timezone.now()
+    job.error_message = error_message
+    job.save(update_fields=['status', 'finished_at', 'error_message'])
+    return job
+
+
+def process_job(job_id, worker_id=None, claimed=False):
+    """
+    Send the pending messages of a job.
+
+    Args:
+        job_id: The BulkEmailJob to process
+        worker_id: Identifies this worker in the job row
+        claimed: The caller already claimed the job (claim_next_job)
+
+    Returns the job, or None if another worker owns it.
+    """
+    worker_id = worker_id or default_worker_id()
+    if not claimed and not claim_job(job_id, worker_id):
+        return None
+
+    job = BulkEmailJob.objects.select_related('user').get(pk=job_id)
+    user = job.user
+    transport = email_transports.for_provider(job.email_provider)
+    limiter = rate_limits.SendLimiter(job.email_provider, user.pk)
+    concurrency = max(1, getattr(settings, 'BULK_EMAIL_CONCURRENCY', 4))
+    pending = job.recipients.filter(status='pending').order_by('position')
+    last_position = -1
+    in_flight = {}
+    owned = True
+    error_message = None
+    try:
+        # Database work stays on this thread; the pool only talks to the provider
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f'bulk-email-{job_id}') as pool:
+            while True:
+                while owned and error_message is None and len(in_flight) < concurrency:
+                    recipients = list(pending.filter(position__gt=last_position)[:transport.batch_size])
+                    if not recipients:
+                        break
+                    try:
+                        access_token = ensure_access_token(user, job.email_provider)
+                    except ProviderNotConnected as e:
+                        error_message = str(e)
+                        break
+                    last_position = recipients[-1].position
+                    in_flight[pool.submit(transport.send, access_token, recipients, limiter)] = recipients
+
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    recipients = in_flight.pop(future)
+                    if not _record_batch(job, worker_id, recipients, future.result()):
+                        # Taken over (our heartbeat went stale): let the
+                        # batches already sent finish, the new owner carries on
+                        owned = False
+    except Exception as e:
+        if not owned:
+            return None
+        # The pool waited for the batches still in flight: those the provider
+        # took are recorded, so they are not reported failed (and sent again)
+        for future, recipients in in_flight.items():
+            if not future.cancelled() and future.exception() is None:
+                _record_batch(job, worker_id, recipients, future.result())
+        # Nothing will pick the job up again: don't leave recipients pending
+        _fail_pending(job, str(e))
+        return _finish(job_id, str(e))
+
+    if not owned:
+        return None
+    if error_message:
+        _fail_pending(job, error_message)
+        return _finish(job_id, error_message)
+    return _finish(job_id)
+
+
+def _record_batch(job, worker_id, recipients, results):
+    """Store the outcome of a sent batch; False if the job is no longer ours"""
+    sent_at = timezone.now()
+    for recipient, result in zip(recipients, results):
+        recipient.attempts += result.attempts
+        if result.ok:
+            recipient.status = 'sent'
+            recipient.sent_at = sent_at
+            recipient.message_id = result.message_id
+        else:
+            recipient.status = 'failed'
+            recipient.error_message = result.error_message or f'Failed to send email via {job.email_provider}'
+    BulkEmailRecipient.objects.bulk_update(
+        recipients, ['status', 'attempts', 'sent_at', 'error_message', 'message_id']
+    )
+    sent = sum(1 for result in results if result.ok)
+
+    # Progress and heartbeat in one statement
+    return BulkEmailJob.objects.filter(pk=job.pk, worker_id=worker_id).update(
+        heartbeat_at=timezone.now(),
+        sent_count=F('sent_count') + sent,
+        failed_count=F('failed_count') + len(recipients) - sent,
+    ) == 1
+
+
+def job_progress(job, include_recipients=True):
+    """JSON-ready progress report of a job"""
+    total = job.total_recipients
+    data = {
+        'job_id': job.pk,
+        'status': job.status,
+        'email_provider': job.email_provider,
+        'subject': job.subject,
+        'total_recipients': total,
+        'sent': job.sent_count,
+        'failed': job.failed_count,
+        'pending': total - job.processed_count,
+        'progress': round(job.processed_count / total, 4) if total else 1.0,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'error_message': job.error_message,
+    }
+    if include_recipients:
+        data['recipients'] = [
+            {
+                'position': recipient.position,
+                'email': recipient.coordinator_email,
+                'name': recipient.coordinator_name,
+                'program_name': recipient.program_name,
+                'university_name': recipient.university_name,
+                'status': recipient.status,
+                'attempts': recipient.attempts,
+                'sent_at': recipient.sent_at.isoformat() if recipient.sent_at else None,
+                'error_message': recipient.error_message,
+            }
+            for recipient in job.recipients.order_by('position')
+        ]
+    return data
@@ -0,0 +1,402 @@
+"""
+How the messages of a bulk email job reach the provider.
+
+A transport sends a list of BulkEmailRecipient and returns one SendResult per
+recipient, in the same order. process_job hands it at most ``batch_size``
+recipients at a time, possibly from several threads at once, together with
+the job's rate_limits.SendLimiter: every request first takes a token per
+message it carries.
+
+- GmailBatchTransport packs up to GMAIL_BATCH_SIZE ``messages/send`` calls
+  into one ``multipart/mixed`` request to Gmail's batch endpoint and maps the
+  response parts back to the recipients by Content-ID. Gmail accepts up to 100
+  calls per batch; larger batches are more likely to be rate limited, hence
+  the default of 50.
+- GraphBatchTransport packs up to GRAPH_BATCH_SIZE ``sendMail`` calls (Graph
+  accepts 20) into one JSON ``$batch`` request and maps the sub-responses
+  back by id.
+- SingleMessageTransport sends one request per message (either provider with
+  its batch size set to 1).
+
+Messages the provider throttled (429) or could not take (503) are sent again
+in a smaller batch, up to BULK_EMAIL_MAX_RETRIES times, after the longest
+Retry-After the provider asked for (exponential backoff when it gave none,
+never more than BULK_EMAIL_MAX_RETRY_AFTER seconds). The wait goes through
+the limiter, so the user's other sends back off as well.
+
+GMAIL_API_URL and GRAPH_API_URL point the transports somewhere else than the
+real APIs, e.g. at ``manage.py fake_email_provider`` for load tests.
+"""
+
+import base64
+import email
+import email.utils
+import json
+import logging
+import time
+import uuid
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from uniworld_backend import http_clients, metrics
+
+
+logger = logging.getLogger(__name__)
+
+GMAIL_MAX_BATCH_SIZE = 100
+GRAPH_MAX_BATCH_SIZE = 20
+
+# Statuses meaning the provider did not take the message and it can be sent again
+RETRYABLE_STATUSES = (429, 503)
+
+
+class SendResult:
+    """Outcome of sending one message"""
+
+    def __init__(self, ok, status_code=None, message_id=None, error_message=None, retry_after=None):
+        self.ok = ok
+        self.status_code = status_code
+        self.message_id = message_id
+        self.error_message = error_message
+        # Seconds the provider asked to wait before sending it again
+        self.retry_after = retry_after
+        self.attempts = 1
+
+    @property
+    def retryable(self):
+        return not self.ok and self.status_code in RETRYABLE_STATUSES
+
+    def __repr__(self):
+        return f'SendResult(ok={self.ok}, status_code={self.status_code})'
+
+
+def gmail_api_url():
+    return getattr(settings, 'GMAIL_API_URL', 'https://gmail.googleapis.com').rstrip('/')
+
+
+def graph_api_url():
+    return getattr(settings, 'GRAPH_API_URL', 'https://graph.microsoft.com').rstrip('/')
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay in seconds or HTTP date), None if absent"""
+    if value in (None, ''):
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, (email.utils.parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def gmail_raw_message(to_email, subject, body):
+    """The message as the base64url ``raw`` field of the Gmail API"""
+    message = MIMEMultipart()
+    message['to'] = to_email
+    message['subject'] = subject
+    message.attach(MIMEText(body, 'plain'))
+    return base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+
+
+def outlook_message(to_email, subject, body):
+    """The ``sendMail`` request body of the Graph API"""
+    return {
+        'message': {
+            'subject': subject,
+            'body': {
+                'contentType': 'Text',
+                'content': body
+            },
+            'toRecipients': [
+                {
+                    'emailAddress': {
+                        'address': to_email
+                    }
+                }
+            ]
+        },
+        'saveToSentItems': True
+    }
+
+
+def _error_message(status_code, body):
+    try:
+        error = (body if isinstance(body, dict) else json.loads(body)).get('error')
+    except (TypeError, ValueError, AttributeError):
+        error = None
+    if isinstance(error, dict) and error.get('message'):
+        return f'{status_code}: {error["message"]}'
+    return f'{status_code}: {str(body)[:200]}' if body else str(status_code)
+
+
+def parse_http_response(text):
+    """Status code, headers and body of an ``application/http`` response part"""
+    head, _, body = text.replace('\r\n', '\n').partition('\n\n')
+    status_line, *header_lines = head.strip('\n').split('\n')
+    status_code = int(status_line.split()[1])
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status_code, headers, body
+
+
+def parse_multipart_response(content_type, content):
+    """Map the Content-ID of every part of a ``multipart/mixed`` response to its HTTP response"""
+    message = email.message_from_bytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + content)
+    if not message.is_multipart():
+        raise ValueError('Batch response is not multipart')
+    responses = {}
+    for part in message.get_payload():
+        content_id = (part.get('Content-ID') or '').strip('<> ')
+        payload = part.get_payload(decode=True) or b''
+        responses[content_id] = parse_http_response(payload.decode('utf-8', 'replace'))
+    return responses
+
+
+class SingleMessageTransport:
+    """One API request per message, through the senders of uniworld_backend.views"""
+
+    batch_size = 1
+
+    def __init__(self, email_provider):
+        self.email_provider = email_provider
+
+    def send(self, access_token, recipients, limiter=None):
+        from uniworld_backend.views import send_gmail_email, send_outlook_email
+        send = send_gmail_email if self.email_provider == 'gmail' else send_outlook_email
+        results = []
+        for recipient in recipients:
+            if limiter is not None:
+                limiter.acquire(1)
+            if send(access_token, recipient.coordinator_email, recipient.subject, recipient.body):
+                results.append(SendResult(True))
+            else:
+                results.append(SendResult(False, error_message=f'Failed to send email via {self.email_provider}'))
+        return results
+
+
+class BatchTransport:
+    """
+    Sends recipients in batch requests and retries the throttled ones.
+
+    Subclasses implement send_batch(access_token, recipients), returning one
+    SendResult per recipient.
+    """
+
+    max_batch_size = 1
+    setting = None
+    default_batch_size = 1
+
+    def __init__(self, batch_size=None):
+        batch_size = batch_size or getattr(settings, self.setting, self.default_batch_size)
+        self.batch_size = max(1, min(batch_size, self.max_batch_size))
+
+    def send(self, access_token, recipients, limiter=None):
+        results = [None] * len(recipients)
+        pending = list(range(len(recipients)))
+        max_retries = getattr(settings, 'BULK_EMAIL_MAX_RETRIES', 3)
+        for attempt in range(max_retries + 1):
+            if limiter is not None:
+                limiter.acquire(len(pending))
+            batch = self.send_batch(access_token, [recipients[index] for index in pending])
+            retry = []
+            for index, result in zip(pending, batch):
+                result.attempts = attempt + 1
+                results[index] = result
+                if result.retryable and attempt < max_retries:
+                    retry.append(index)
+            if not retry:
+                break
+            delay = self.retry_delay([results[index] for index in retry], attempt)
+            if limiter is not None:
+                limiter.backoff(delay)
+            else:
+                time.sleep(delay)
+            pending = retry
+        return results
+
+    def retry_delay(self, results, attempt):
+        """Longest Retry-After asked for, exponential backoff if none was"""
+        delays = [result.retry_after for result in results if result.retry_after is not None]
+        delay = max(delays) if delays else 2 ** attempt
+        return min(delay, getattr(settings, 'BULK_EMAIL_MAX_RETRY_AFTER', 60))
+
+
+class GmailBatchTransport(BatchTransport):
+    """Gmail ``messages/send`` calls sent as batch requests"""
+
+    send_path = '/gmail/v1/users/me/messages/send'
+    batch_path = '/batch/gmail/v1'
+    max_batch_size = GMAIL_MAX_BATCH_SIZE
+    setting = 'GMAIL_BATCH_SIZE'
+    default_batch_size = 50
+
+    def build_body(self, boundary, recipients):
+        lines = []
+        for index, recipient in enumerate(recipients):
+            raw = gmail_raw_message(recipient.coordinator_email, recipient.subject, recipient.body)
+            lines += [
+                f'--{boundary}',
+                'Content-Type: application/http',
+                'Content-Transfer-Encoding: binary',
+                f'Content-ID: <item-{index}>',
+                '',
+                f'POST {self.send_path}',
+                'Content-Type: application/json; charset=UTF-8',
+                '',
+                json.dumps({'raw': raw}),
+            ]
+        lines.append(f'--{boundary}--')
+        return '\r\n'.join(lines).encode('utf-8')
+
+    def send_batch(self, access_token, recipients):
+        if not recipients:
+            return []
+        boundary = f'batch_{uuid.uuid4().hex}'
+        try:
+            with metrics.track_outbound('gmail', 'batch_send'):
+                response = http_clients.session('google').post(
+                    f'{gmail_api_url()}{self.batch_path}',
+                    headers={
+                        'Authorization': f'Bearer {access_token}',
+                        'Content-Type': f'multipart/mixed; boundary={boundary}',
+                    },
+                    data=self.build_body(boundary, recipients),
+                )
+        except requests.RequestException as e:
+            logger.error('Error sending Gmail batch: %s', e)
+            return [SendResult(False, error_message=f'Gmail batch request failed: {e}') for _ in recipients]
+
+        if response.status_code != 200:
+            # The whole batch was rejected (e.g. expired token)
+            logger.warning('Failed to send Gmail batch: %s - %s', response.status_code, response.text[:500])
+            error_message = _error_message(response.status_code, response.text)
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            return [
+                SendResult(False, response.status_code, error_message=error_message, retry_after=retry_after)
+                for _ in recipients
+            ]
+
+        try:
+            parts = parse_multipart_response(response.headers.get('Content-Type', ''), response.content)
+        except (ValueError, IndexError) as e:
+            logger.error('Unreadable Gmail batch response: %s', e)
+            return [SendResult(False, error_message=f'Unreadable Gmail batch response: {e}') for _ in recipients]
+
+        results = []
+        for index, recipient in enumerate(recipients):
+            part = parts.get(f'response-item-{index}')
+            if part is None:
+                results.append(SendResult(False, error_message='No response for this message in the Gmail batch'))
+                continue
+            status_code, headers, body = part
+            if status_code == 200:
+                try:
+                    message_id = json.loads(body).get('id')
+                except ValueError:
+                    message_id = None
+                results.append(SendResult(True, status_code, message_id=message_id))
+            else:
+                metrics.OUTBOUND_ERRORS.labels('gmail', 'batch_send').inc()
+                results.append(SendResult(
+                    False, status_code,
+                    error_message=_error_message(status_code, body),
+                    retry_after=parse_retry_after(headers.get('retry-after')),
+                ))
+
+        sent = sum(1 for result in results if result.ok)
+        logger.debug('Gmail batch: %d of %d emails sent', sent, len(recipients))
+        return results
+
+
+class GraphBatchTransport(BatchTransport):
+    """Microsoft Graph ``sendMail`` calls sent as JSON ``$batch`` requests"""
+
+    batch_path = '/v1.0/$batch'
+    max_batch_size = GRAPH_MAX_BATCH_SIZE
+    setting = 'GRAPH_BATCH_SIZE'
+    default_batch_size = GRAPH_MAX_BATCH_SIZE
+
+    def build_body(self, recipients):
+        return {
+            'requests': [
+                {
+                    'id': str(index),
+                    'method': 'POST',
+                    'url': '/me/sendMail',
+                    'headers': {'Content-Type': 'application/json'},
+                    'body': outlook_message(recipient.coordinator_email, recipient.subject, recipient.body),
+                }
+                for index, recipient in enumerate(recipients)
+            ]
+        }
+
+    def send_batch(self, access_token, recipients):
+        if not recipients:
+            return []
+        try:
+            with metrics.track_outbound('outlook', 'batch_send'):
+                response = http_clients.session('microsoft').post(
+                    f'{graph_api_url()}{self.batch_path}',
+                    headers={'Authorization': f'Bearer {access_token}'},
+                    json=self.build_body(recipients),
+                )
+        except requests.RequestException as e:
+            logger.error('Error sending Outlook batch: %s', e)
+            return [SendResult(False, error_message=f'Graph batch request failed: {e}') for _ in recipients]
+
+        if response.status_code != 200:
+            # The whole batch was rejected (e.g. expired token, throttled app)
+            logger.warning('Failed to send Outlook batch: %s - %s', response.status_code, response.text[:500])
+            error_message = _error_message(response.status_code, response.text)
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            return [
+                SendResult(False, response.status_code, error_message=error_message, retry_after=retry_after)
+                for _ in recipients
+            ]
+
+        try:
+            responses = {str(item.get('id')): item for item in response.json()['responses']}
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error('Unreadable Outlook batch response: %s', e)
+            return [SendResult(False, error_message=f'Unreadable Graph batch response: {e}') for _ in recipients]
+
+        results = []
+        for index, recipient in enumerate(recipients):
+            item = responses.get(str(index))
+            if item is None:
+                results.append(SendResult(False, error_message='No response for this message in the Graph batch'))
+                continue
+            status_code = item.get('status')
+            # sendMail answers 202 Accepted with no body and no message id
+            if status_code == 202:
+                results.append(SendResult(True, status_code))
+            else:
+                metrics.OUTBOUND_ERRORS.labels('outlook', 'batch_send').inc()
+                headers = {name.lower(): value for name, value in (item.get('headers') or {}).items()}
+                results.append(SendResult(
+                    False, status_code,
+                    error_message=_error_message(status_code, item.get('body')),
+                    retry_after=parse_retry_after(headers.get('retry-after')),
+                ))
+
+        sent = sum(1 for result in results if result.ok)
+        logger.debug('Outlook batch: %d of %d emails sent', sent, len(recipients))
+        return results
+
+
+def for_provider(email_provider):
+    """The transport used for bulk sends through a provider"""
+    if email_provider == 'gmail' and getattr(settings, 'GMAIL_BATCH_SIZE', 50) > 1:
+        return GmailBatchTransport()
+    if email_provider == 'outlook' and getattr(settings, 'GRAPH_BATCH_SIZE', GRAPH_MAX_BATCH_SIZE) > 1:
+        return GraphBatchTransport()
+    return SingleMessageTransport(email_provider)
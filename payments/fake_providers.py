@@ -0,0 +1,233 @@
+"""
+Local stand-in for the email provider APIs used by bulk sends.
+
+FakeProviderServer answers the Gmail ``messages/send`` call, Gmail batch
+requests, Microsoft Graph ``/me/sendMail`` and Graph JSON ``$batch``
+requests the way the real APIs do, without sending anything, so the
+transports in email_transports can be exercised and load tested locally:
+
+    python manage.py fake_email_provider --port 8025
+    GMAIL_API_URL=http://127.0.0.1:8025 GRAPH_API_URL=http://127.0.0.1:8025 python manage.py runserver
+
+Any Bearer token is accepted except ``invalid`` (401). Every request waits
+``latency`` seconds, like a round trip to the provider would, and with
+``rate_limit_every`` set every n-th message is answered with a 429 instead
+of being accepted (Graph ones with ``Retry-After: <retry_after>``, like the
+real throttling responses). Like Graph, $batch sub-responses come back in no
+particular order. Accepted messages are listed at ``GET /_fake/messages``.
+"""
+
+import base64
+import email
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .email_transports import GMAIL_MAX_BATCH_SIZE, GRAPH_MAX_BATCH_SIZE
+
+
+def _parse_http_request(text):
+    """Method, path, headers and body of an ``application/http`` request part"""
+    head, _, body = text.replace('\r\n', '\n').partition('\n\n')
+    request_line, *header_lines = head.strip('\n').split('\n')
+    method, path = request_line.split()[:2]
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return method, path, headers, body
+
+
+def _error(status_code, message, reason):
+    return status_code, {'error': {'code': status_code, 'message': message, 'errors': [{'reason': reason}]}}
+
+
+def _graph_error(status_code, code, message):
+    return status_code, {'error': {'code': code, 'message': message}}
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    """HTTP server keeping the messages it accepted in memory"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, rate_limit_every=0, retry_after=1):
+        super().__init__(address, FakeProviderHandler)
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.messages = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start_in_thread(self):
+        """Serve from a daemon thread (scripts and benchmarks); returns the thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def accept_message(self, provider, recipient, subject):
+        """Record a message; returns its id, or None when it is rate limited"""
+        number = next(self._counter)
+        if self.rate_limit_every and number % self.rate_limit_every == 0:
+            return None
+        message_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            self.messages.append({'id': message_id, 'provider': provider, 'to': recipient, 'subject': subject})
+        return message_id
+
+    def gmail_send(self, body):
+        try:
+            raw = json.loads(body)['raw']
+            message = email.message_from_bytes(base64.urlsafe_b64decode(raw.encode('ascii')))
+        except (ValueError, KeyError, TypeError):
+            return _error(400, 'Invalid raw message', 'invalidArgument')
+        if not message['to']:
+            return _error(400, 'Invalid To header', 'invalidArgument')
+        message_id = self.accept_message('gmail', message['to'], message['subject'])
+        if message_id is None:
+            return _error(429, 'User-rate limit exceeded', 'rateLimitExceeded')
+        return 200, {'id': message_id, 'threadId': message_id, 'labelIds': ['SENT']}
+
+    def graph_send_mail(self, data):
+        """Status code, body and headers of a sendMail call"""
+        try:
+            message = data['message']
+            recipient = message['toRecipients'][0]['emailAddress']['address']
+        except (KeyError, IndexError, TypeError):
+            return (*_graph_error(400, 'ErrorInvalidRecipients', 'At least one recipient is not valid.'), {})
+        if self.accept_message('outlook', recipient, message.get('subject')) is None:
+            return (
+                *_graph_error(429, 'ApplicationThrottled', 'Application is over its MailboxConcurrency limit.'),
+                {'Retry-After': str(self.retry_after)},
+            )
+        return 202, None, {}
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    gmail_send_path = '/gmail/v1/users/me/messages/send'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _authorized(self):
+        authorization = self.headers.get('Authorization', '')
+        return authorization.startswith('Bearer ') and authorization != 'Bearer invalid'
+
+    def _send(self, status_code, content, content_type='application/json; charset=UTF-8', headers=None):
+        if content is None:
+            content = b''
+        elif not isinstance(content, bytes):
+            content = json.dumps(content).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == '/_fake/messages':
+            with self.server._lock:
+                messages = list(self.server.messages)
+            return self._send(200, {'count': len(messages), 'requests': self.server.requests, 'messages': messages})
+        self._send(*_error(404, 'Not found', 'notFound'))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with self.server._lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        graph = self.path.startswith('/v1.0/')
+        if not self._authorized():
+            if graph:
+                return self._send(*_graph_error(401, 'InvalidAuthenticationToken', 'Access token is invalid.'))
+            return self._send(*_error(401, 'Invalid Credentials', 'authError'))
+
+        if self.path == self.gmail_send_path:
+            return self._send(*self.server.gmail_send(body))
+        if self.path == '/batch/gmail/v1':
+            return self.gmail_batch(body)
+        if self.path == '/v1.0/me/sendMail':
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return self._send(*_graph_error(400, 'BadRequest', 'Invalid JSON'))
+            status_code, content, headers = self.server.graph_send_mail(data)
+            return self._send(status_code, content, headers=headers)
+        if self.path == '/v1.0/$batch':
+            return self.graph_batch(body)
+        self._send(*_error(404, 'Not found', 'notFound'))
+
+    def gmail_batch(self, body):
+        content_type = self.headers.get('Content-Type', '')
+        request = email.message_from_bytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+        if not request.is_multipart():
+            return self._send(*_error(400, 'Batch request must be multipart/mixed', 'invalidArgument'))
+        parts = request.get_payload()
+        if len(parts) > GMAIL_MAX_BATCH_SIZE:
+            return self._send(*_error(
+                400, f'Too many requests in batch (limit {GMAIL_MAX_BATCH_SIZE})', 'batchSizeTooLarge'
+            ))
+
+        boundary = f'batch_{uuid.uuid4().hex}'
+        lines = []
+        for part in parts:
+            content_id = (part.get('Content-ID') or '').strip('<> ')
+            payload = (part.get_payload(decode=True) or b'').decode('utf-8', 'replace')
+            method, path, _, part_body = _parse_http_request(payload)
+            if method == 'POST' and path == self.gmail_send_path:
+                status_code, result = self.server.gmail_send(part_body.encode('utf-8'))
+            else:
+                status_code, result = _error(404, 'Not found', 'notFound')
+            lines += [
+                f'--{boundary}',
+                'Content-Type: application/http',
+                f'Content-ID: <response-{content_id}>',
+                '',
+                f'HTTP/1.1 {status_code} {self.responses.get(status_code, ("",))[0]}',
+                'Content-Type: application/json; charset=UTF-8',
+                '',
+                json.dumps(result),
+            ]
+        lines.append(f'--{boundary}--')
+        self._send(200, '\r\n'.join(lines).encode('utf-8'), f'multipart/mixed; boundary={boundary}')
+
+    def graph_batch(self, body):
+        try:
+            requests = json.loads(body)['requests']
+        except (ValueError, KeyError, TypeError):
+            return self._send(*_graph_error(400, 'BadRequest', 'Invalid batch payload format.'))
+        if len(requests) > GRAPH_MAX_BATCH_SIZE:
+            return self._send(*_graph_error(
+                400, 'BadRequest', f'Number of batch requests cannot exceed {GRAPH_MAX_BATCH_SIZE}.'
+            ))
+
+        responses = []
+        for item in requests:
+            if item.get('method') == 'POST' and item.get('url') == '/me/sendMail':
+                status_code, content, headers = self.server.graph_send_mail(item.get('body'))
+            else:
+                (status_code, content), headers = _graph_error(404, 'NotFound', 'Resource not found.'), {}
+            response = {'id': item.get('id'), 'status': status_code, 'headers': headers}
+            if content is not None:
+                response['body'] = content
+            responses.append(response)
+        random.shuffle(responses)
+        self._send(200, {'responses': responses})
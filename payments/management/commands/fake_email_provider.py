@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from payments.fake_providers import FakeProviderServer
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the Gmail and Microsoft Graph APIs to exercise and load test bulk sends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8025, help='Port to listen on (default: 8025)')
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.05,
+            help='Seconds every request takes, like a round trip to the provider (default: 0.05)'
+        )
+        parser.add_argument(
+            '--rate-limit-every',
+            type=int,
+            default=0,
+            help='Answer every n-th message with 429 (default: never)'
+        )
+        parser.add_argument(
+            '--retry-after',
+            type=int,
+            default=1,
+            help='Retry-After seconds of throttled Graph messages (default: 1)'
+        )
+
+    def handle(self, *args, **options):
+        server = FakeProviderServer(
+            (options['host'], options['port']),
+            latency=options['latency'],
+            rate_limit_every=options['rate_limit_every'],
+            retry_after=options['retry_after'],
+        )
+        self.stdout.write(f'Fake email provider listening on {server.url}')
+        self.stdout.write(f'Point the app at it with GMAIL_API_URL={server.url} GRAPH_API_URL={server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.stdout.write(self.style.SUCCESS(f'Accepted {len(server.messages)} messages'))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from payments import bulk_email
+
+
+class Command(BaseCommand):
+    help = 'Process queued bulk email jobs (BULK_EMAIL_QUEUE = "db") and resume abandoned ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between checks for new jobs (default: 2)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs waiting now and exit'
+        )
+
+    def handle(self, *args, **options):
+        worker_id = f'db:{bulk_email.default_worker_id()}'
+        self.stdout.write(f'Bulk email worker {worker_id} started')
+
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                job_id = bulk_email.claim_next_job(worker_id)
+                if job_id is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'Processing bulk email job {job_id}...')
+                job = bulk_email.process_job(job_id, worker_id=worker_id, claimed=True)
+                processed += 1
+                if job is None:
+                    self.stdout.write(self.style.WARNING(f'Job {job_id} was taken over by another worker'))
+                else:
+                    self.stdout.write(
+                        f'Job {job_id} {job.status}: {job.sent_count} sent, {job.failed_count} failed '
+                        f'of {job.total_recipients}'
+                    )
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} bulk email jobs'))
@@ -156,4 +156,93 @@ class EmailLog(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.user.email} -> {self.coordinator.public_email} ({self.status})"
\ No newline at end of file
+        return f"{self.user.email} -> {self.coordinator.public_email} ({self.status})"
+
+class BulkEmailJob(models.Model):
+    """A bulk email send, processed in the background (see payments.bulk_email)"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('partial', 'Partially sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bulk_email_jobs')
+    email_provider = models.CharField(max_length=20, choices=EmailLog.EMAIL_PROVIDER_CHOICES)
+    subject = models.CharField(max_length=500)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    
+    # Progress
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    
+    # Worker bookkeeping: the worker processing the job refreshes heartbeat_at;
+    # running jobs with a stale heartbeat are picked up again
+    worker_id = models.CharField(max_length=100, blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'bulk_email_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='bulk_email_jobs_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.total_recipients} recipients ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'partial', 'failed')
+    
+    @property
+    def processed_count(self):
+        return self.sent_count + self.failed_count
+
+
+class BulkEmailRecipient(models.Model):
+    """One personalized message of a bulk email job"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    job = models.ForeignKey(BulkEmailJob, on_delete=models.CASCADE, related_name='recipients')
+    position = models.PositiveIntegerField()
+    
+    # Recipient
+    coordinator_email = models.EmailField(blank=True)
+    coordinator_name = models.CharField(max_length=200, blank=True)
+    program_name = models.CharField(max_length=300, blank=True)
+    university_name = models.CharField(max_length=200, blank=True)
+    
+    # Personalized message
+    subject = models.CharField(max_length=500)
+    body = models.TextField()
+    
+    # Outcome
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+    message_id = models.CharField(max_length=200, blank=True, null=True)
+    
+    class Meta:
+        db_table = 'bulk_email_recipients'
+        ordering = ['job', 'position']
+        unique_together = ['job', 'position']
+    
+    def __str__(self):
+        return f"{self.coordinator_email} ({self.status})"
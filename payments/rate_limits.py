@@ -0,0 +1,166 @@
+"""
+Token buckets keeping bulk sends under the providers' quotas.
+
+Every message sent counts against two buckets: the sending user's (per
+mailbox quotas) and the provider's (per application quotas).
+BULK_EMAIL_RATE_LIMITS gives, per provider, the sustained rate in messages
+per second and the burst each bucket allows. The values in settings follow
+the published limits:
+
+- Gmail: 250 quota units per user per second, ``messages.send`` costing 100
+  (2.5 messages/s), and 1,200,000 units per project per minute (200/s).
+- Outlook: Exchange Online accepts 30 messages per minute from a mailbox
+  (0.5/s); Graph's per-application limits are far above anything a single
+  deployment sends.
+
+A batch request takes as many tokens as it carries messages, so a batch
+larger than the burst leaves the bucket in debt and the next one waits for
+it to refill. When the provider throttles anyway, backoff() pauses the
+user's bucket for the Retry-After delay, holding back every thread sending
+for that user instead of letting each of them run into its own 429.
+
+The buckets of SendLimiter live in the ``rate_limits`` cache, so every web
+process, database worker and Celery worker draws from the same ones (Redis
+when REDIS_URL is set). Without a shared cache each process has its own
+buckets and N processes may send N times the quota.
+"""
+
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+CACHE_ALIAS = 'rate_limits'
+
+# How long a process may hold a shared bucket's lock before it is released anyway
+LOCK_TIMEOUT = 5
+LOCK_POLL_INTERVAL = 0.005
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilling at ``rate`` tokens per second up to ``capacity``"""
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self.updated = self.clock()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _state(self):
+        """Hold the bucket while its state is read and changed"""
+        with self._lock:
+            yield
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def _wait_time(self, tokens, now):
+        """Seconds until ``tokens`` can be taken, 0 if they can be taken now"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        # More than the capacity can never be available at once: take what a
+        # full bucket holds and go into debt for the rest
+        needed = min(tokens, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until ``tokens`` are taken; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._state():
+                now = self.clock()
+                self._refill(now)
+                wait = self._wait_time(tokens, now)
+                if wait <= 0:
+                    self.tokens -= tokens
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """Hold back every acquire for ``seconds``, then refill from empty"""
+        with self._state():
+            now = self.clock()
+            self._refill(now)
+            self.paused_until = max(self.paused_until, now + seconds)
+            # No burst right after the pause: tokens accumulate from its end
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = self.paused_until
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket whose state is kept in a cache, shared by every process using it.
+
+    The state is read and written under a lock taken with cache.add(), which
+    is atomic on Redis. Wall clock time is used so that processes agree on it.
+    """
+
+    clock = staticmethod(time.time)
+
+    def __init__(self, key, rate, capacity, cache):
+        super().__init__(rate, capacity)
+        self.key = key
+        self.cache = cache
+
+    @contextmanager
+    def _state(self):
+        lock_key = f'{self.key}:lock'
+        owner = uuid.uuid4().hex
+        while not self.cache.add(lock_key, owner, LOCK_TIMEOUT):
+            time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            state = self.cache.get(self.key)
+            if state is None:
+                # Never used, or idle long enough to be full again
+                self.tokens, self.updated, self.paused_until = self.capacity, self.clock(), 0.0
+            else:
+                self.tokens, self.updated, self.paused_until = state
+                self.tokens = min(self.tokens, self.capacity)
+            yield
+            # Once it has refilled the bucket is full, like a missing entry
+            idle = max(self.paused_until, self.updated) - self.clock() + (self.capacity - self.tokens) / self.rate
+            self.cache.set(self.key, (self.tokens, self.updated, self.paused_until), math.ceil(max(idle, 0)) + 1)
+        finally:
+            if self.cache.get(lock_key) == owner:
+                self.cache.delete(lock_key)
+
+
+def rate_cache():
+    return caches[CACHE_ALIAS] if CACHE_ALIAS in settings.CACHES else caches['default']
+
+
+def rate_limits(email_provider):
+    return settings.BULK_EMAIL_RATE_LIMITS[email_provider]
+
+
+class SendLimiter:
+    """The buckets messages of one user through one provider go through"""
+
+    def __init__(self, email_provider, user_id):
+        limits = rate_limits(email_provider)
+        cache = rate_cache()
+        self.user_bucket = SharedTokenBucket(f'user:{email_provider}:{user_id}', *limits['user'], cache)
+        self.provider_bucket = SharedTokenBucket(f'provider:{email_provider}', *limits['provider'], cache)
+
+    def acquire(self, messages=1):
+        """Block until ``messages`` may be sent; returns the seconds waited"""
+        return self.user_bucket.acquire(messages) + self.provider_bucket.acquire(messages)
+
+    def backoff(self, seconds):
+        """The provider throttled this user: hold back all of the user's sends"""
+        self.user_bucket.pause(seconds)
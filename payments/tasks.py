@@ -0,0 +1,10 @@
+from celery import shared_task
+
+from . import bulk_email
+
+
+@shared_task(name='payments.process_bulk_email_job')
+def process_bulk_email_job(job_id):
+    """Celery entry point of bulk email jobs (BULK_EMAIL_QUEUE = 'celery')"""
+    job = bulk_email.process_job(job_id, worker_id=f'celery:{bulk_email.default_worker_id()}')
+    return job.status if job else None
@@ -1,3 +1,342 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from uniworld_backend import http_clients
+from uniworld_backend.metrics import InstrumentedStripeClient
+
+from . import bulk_email, email_transports
+from .email_transports import BatchTransport, SendResult
+from .fake_providers import FakeProviderServer
+from .rate_limits import SendLimiter, SharedTokenBucket, TokenBucket
+from .tasks import process_bulk_email_job
+
+# Buckets that never hold a test back
+NO_RATE_LIMITS = {
+    provider: {'user': (10000, 10000), 'provider': (10000, 10000)} for provider in ('gmail', 'outlook')
+}
+
+
+def coordinators(count):
+    return [
+        {'email': f'coordinator{number}@example.com', 'name': f'Coordinator {number}',
+         'program_name': 'Economics', 'university_name': 'University of Turin'}
+        for number in range(count)
+    ]
+
+
+@override_settings(BULK_EMAIL_QUEUE='db')
+class ProcessJobTests(TestCase):
+    """Processing a bulk email job"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='student', email='student@example.com', google_access_token='token'
+        )
+
+    def test_unexpected_error_fails_the_pending_recipients(self):
+        job = bulk_email.create_job(self.user, coordinators(3), 'Inquiry', 'Hello', 'gmail')
+
+        with mock.patch.object(BatchTransport, 'send', side_effect=RuntimeError('Connection pool is closed')):
+            job = bulk_email.process_job(job.pk)
+
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error_message, 'Connection pool is closed')
+        self.assertEqual(job.failed_count, 3)
+        self.assertFalse(job.recipients.filter(status='pending').exists())
+
+    @override_settings(GMAIL_BATCH_SIZE=2)
+    def test_batches_sent_before_an_unexpected_error_are_recorded(self):
+        job = bulk_email.create_job(self.user, coordinators(4), 'Inquiry', 'Hello', 'gmail')
+        failed = threading.Event()
+
+        def send(access_token, recipients, limiter=None):
+            if recipients[0].position == 2:
+                failed.set()
+                raise RuntimeError('Connection pool is closed')
+            # Still in flight when the other batch fails
+            failed.wait(5)
+            time.sleep(0.2)
+            return [SendResult(True, 200, message_id=f'id-{recipient.position}') for recipient in recipients]
+
+        with mock.patch.object(BatchTransport, 'send', side_effect=send):
+            job = bulk_email.process_job(job.pk)
+
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('partial', 2, 2))
+        statuses = dict(job.recipients.values_list('position', 'status'))
+        self.assertEqual(statuses, {0: 'sent', 1: 'sent', 2: 'failed', 3: 'failed'})
+        self.assertEqual(job.recipients.get(position=0).message_id, 'id-0')
+
+
+class FakeClock:
+    """Clock for the token buckets that advances when they sleep"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Token bucket arithmetic, on a fake clock"""
+
+    bucket_class = TokenBucket
+
+    def setUp(self):
+        self.clock = FakeClock()
+        for patch in (
+            mock.patch.object(self.bucket_class, 'clock', staticmethod(self.clock)),
+            mock.patch('payments.rate_limits.time.sleep', self.clock.sleep),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def bucket(self, rate, capacity):
+        return TokenBucket(rate, capacity)
+
+    def test_full_bucket_allows_a_burst(self):
+        bucket = self.bucket(2, 5)
+
+        self.assertEqual(bucket.acquire(5), 0)
+        self.assertAlmostEqual(bucket.acquire(1), 0.5)
+
+    def test_bucket_refills_at_its_rate(self):
+        bucket = self.bucket(2, 5)
+        bucket.acquire(5)
+
+        self.clock.now += 1
+        self.assertEqual(bucket.acquire(2), 0)
+        self.assertAlmostEqual(bucket.acquire(1), 0.5)
+
+    def test_bucket_never_refills_past_its_capacity(self):
+        bucket = self.bucket(2, 5)
+        bucket.acquire(5)
+
+        self.clock.now += 60
+        self.assertEqual(bucket.acquire(5), 0)
+        self.assertAlmostEqual(bucket.acquire(1), 0.5)
+
+    def test_oversized_batch_leaves_the_bucket_in_debt(self):
+        bucket = self.bucket(1, 5)
+
+        # A full bucket lets a batch larger than the burst through...
+        self.assertEqual(bucket.acquire(8), 0)
+        # ...and the next message waits for the 3 tokens of debt and its own
+        self.assertAlmostEqual(bucket.acquire(1), 4)
+
+    def test_pause_holds_back_acquires_then_refills_from_empty(self):
+        bucket = self.bucket(2, 5)
+
+        bucket.pause(10)
+
+        self.assertAlmostEqual(bucket.acquire(1), 10.5)
+
+
+class SharedTokenBucketTests(TokenBucketTests):
+    """Token buckets kept in the cache, as every process sees them"""
+
+    bucket_class = SharedTokenBucket
+
+    def setUp(self):
+        super().setUp()
+        self.cache = caches['rate_limits']
+        self.cache.clear()
+
+    def bucket(self, rate, capacity):
+        return SharedTokenBucket('user:gmail:1', rate, capacity, self.cache)
+
+    def test_buckets_with_the_same_key_share_their_tokens(self):
+        first, second = self.bucket(2, 5), self.bucket(2, 5)
+
+        first.acquire(5)
+
+        self.assertAlmostEqual(second.acquire(1), 0.5)
+
+    def test_pause_holds_back_every_process(self):
+        first, second = self.bucket(2, 5), self.bucket(2, 5)
+
+        first.pause(10)
+
+        self.assertAlmostEqual(second.acquire(1), 10.5)
+
+
+class CeleryTaskTests(SimpleTestCase):
+    """The bulk email task of the 'celery' queue"""
+
+    def test_task_uses_the_configured_broker(self):
+        self.assertEqual(process_bulk_email_job.app.conf.broker_url, settings.CELERY_BROKER_URL)
+
+
+class StripeClientTests(SimpleTestCase):
+    """The HTTP client Stripe API calls go through"""
+
+    def test_forked_process_does_not_reuse_the_parent_session(self):
+        client = InstrumentedStripeClient()
+        sessions = []
+
+        def request(session, method, url, **kwargs):
+            sessions.append(session)
+            return mock.Mock(content=b'{}', status_code=200, headers={})
+
+        with mock.patch.object(http_clients.ProviderSession, 'request', autospec=True, side_effect=request):
+            client.request('get', 'https://api.stripe.com/v1/customers', {})
+            # What the after-fork hook does in a child process
+            http_clients._forget_sessions()
+            client.request('get', 'https://api.stripe.com/v1/customers', {})
+
+        self.assertIsNot(sessions[0], sessions[1])
+        self.assertIs(sessions[1], http_clients.session('stripe'))
+
+
+@override_settings(BULK_EMAIL_QUEUE='db', BULK_EMAIL_RATE_LIMITS=NO_RATE_LIMITS, BULK_EMAIL_CONCURRENCY=1)
+class FakeProviderTestCase(TestCase):
+    """Bulk sends of a user through ``email_provider``, answered by a FakeProviderServer"""
+
+    email_provider = None
+    token_field = None
+    api_url_setting = None
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='student', email='student@example.com', **{self.token_field: 'token'}
+        )
+        self.server = FakeProviderServer(('127.0.0.1', 0))
+        self.server.start_in_thread()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        api_url = override_settings(**{self.api_url_setting: self.server.url})
+        api_url.enable()
+        self.addCleanup(api_url.disable)
+
+    def send(self, count):
+        job = bulk_email.create_job(self.user, coordinators(count), 'Inquiry', 'Hello', self.email_provider)
+        return bulk_email.process_job(job.pk)
+
+
+class GmailBatchTransportTests(FakeProviderTestCase):
+    """Gmail bulk sends against the fake provider"""
+
+    email_provider = 'gmail'
+    token_field = 'google_access_token'
+    api_url_setting = 'GMAIL_API_URL'
+
+    def test_responses_are_mapped_to_recipients_by_content_id(self):
+        job = self.send(3)
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(self.server.requests, 1)
+        message_ids = {message['to']: message['id'] for message in self.server.messages}
+        for recipient in job.recipients.all():
+            self.assertEqual(recipient.status, 'sent')
+            self.assertEqual(recipient.message_id, message_ids[recipient.coordinator_email])
+
+    def test_rejected_message_fails_only_its_recipient(self):
+        job = bulk_email.create_job(self.user, coordinators(3), 'Inquiry', 'Hello', 'gmail')
+        job.recipients.filter(position=1).update(coordinator_email='')
+
+        job = bulk_email.process_job(job.pk)
+
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('partial', 2, 1))
+        rejected = job.recipients.get(position=1)
+        self.assertEqual(rejected.status, 'failed')
+        self.assertEqual(rejected.error_message, '400: Invalid To header')
+        self.assertEqual(rejected.attempts, 1)
+
+    def test_rejected_batch_fails_every_recipient(self):
+        self.user.google_access_token = 'invalid'
+        self.user.save()
+
+        with self.assertLogs('payments.email_transports', 'WARNING'):
+            job = self.send(3)
+
+        self.assertEqual((job.status, job.failed_count), ('failed', 3))
+        for recipient in job.recipients.all():
+            self.assertEqual(recipient.error_message, '401: Invalid Credentials')
+            self.assertEqual(recipient.attempts, 1)
+
+    def test_throttled_messages_are_sent_again(self):
+        self.server.rate_limit_every = 3
+
+        with mock.patch.object(SendLimiter, 'backoff') as backoff:
+            job = self.send(3)
+
+        self.assertEqual((job.status, job.sent_count), ('completed', 3))
+        self.assertEqual(self.server.requests, 2)
+        # No Retry-After from Gmail: exponential backoff from 1 second
+        backoff.assert_called_once_with(1)
+        attempts = dict(job.recipients.values_list('position', 'attempts'))
+        self.assertEqual(attempts, {0: 1, 1: 1, 2: 2})
+
+
+class GraphBatchTransportTests(FakeProviderTestCase):
+    """Outlook bulk sends against the fake provider"""
+
+    email_provider = 'outlook'
+    token_field = 'microsoft_access_token'
+    api_url_setting = 'GRAPH_API_URL'
+
+    def test_accepted_messages_are_sent(self):
+        job = self.send(3)
+
+        # sendMail answers 202 Accepted
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('completed', 3, 0))
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertFalse(job.recipients.exclude(status='sent').exists())
+
+    @override_settings(BULK_EMAIL_MAX_RETRIES=0)
+    def test_responses_out_of_order_are_mapped_to_recipients_by_id(self):
+        # Every third message is throttled, whatever order the responses come back in
+        self.server.rate_limit_every = 3
+
+        with mock.patch('payments.fake_providers.random.shuffle', side_effect=list.reverse):
+            job = self.send(9)
+
+        statuses = dict(job.recipients.values_list('position', 'status'))
+        self.assertEqual(
+            statuses, {position: 'failed' if position % 3 == 2 else 'sent' for position in range(9)}
+        )
+
+    def test_throttled_messages_wait_for_retry_after(self):
+        self.server.rate_limit_every = 3
+        self.server.retry_after = 7
+
+        with mock.patch.object(SendLimiter, 'backoff') as backoff:
+            job = self.send(3)
+
+        self.assertEqual((job.status, job.sent_count), ('completed', 3))
+        backoff.assert_called_once_with(7.0)
+        self.assertEqual(job.recipients.get(position=2).attempts, 2)
+
+    def test_rejected_message_stores_the_error(self):
+        outlook_message = email_transports.outlook_message
+
+        def message(to_email, subject, body):
+            if to_email == 'coordinator1@example.com':
+                return {'message': {'subject': subject, 'toRecipients': []}}
+            return outlook_message(to_email, subject, body)
+
+        with mock.patch.object(email_transports, 'outlook_message', message):
+            job = self.send(3)
+
+        self.assertEqual((job.status, job.sent_count, job.failed_count), ('partial', 2, 1))
+        rejected = job.recipients.get(position=1)
+        self.assertEqual(rejected.status, 'failed')
+        self.assertEqual(rejected.error_message, '400: At least one recipient is not valid.')
+
+    @override_settings(GRAPH_BATCH_SIZE=50)
+    def test_batches_are_capped_at_twenty_messages(self):
+        self.assertEqual(email_transports.GraphBatchTransport().batch_size, 20)
+
+        job = self.send(25)
+
+        self.assertEqual((job.status, job.sent_count), ('completed', 25))
+        self.assertEqual(self.server.requests, 2)
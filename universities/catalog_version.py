@@ -0,0 +1,54 @@
+"""
+Catalog version used for conditional GET on the catalog endpoints.
+
+The version is bumped on every save/delete of University, Program and
+Coordinator (see universities.signals) and after bulk imports. ETag and
+Last-Modified are derived from it, so an unchanged catalog is answered with
+304 Not Modified before the view queries or serializes anything.
+"""
+
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import CatalogVersion
+
+
+CATALOG_VERSION_PK = 1
+
+
+def get_catalog_version():
+    """Return (version, updated_at) of the catalog; (0, None) before the first change"""
+    row = CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+def bump_catalog_version():
+    """Mark the catalog as changed"""
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK).update(
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_PK, defaults={'version': 1})
+
+
+def _request_version(request):
+    """Read the catalog version once per request"""
+    if not hasattr(request, '_catalog_version'):
+        request._catalog_version = get_catalog_version()
+    return request._catalog_version
+
+
+def catalog_etag(request, *args, **kwargs):
+    version, _ = _request_version(request)
+    return f'"catalog-{version}"'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    _, updated_at = _request_version(request)
+    return updated_at
+
+
+# Decorator adding ETag/Last-Modified and answering 304 for an unchanged catalog
+catalog_condition = condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
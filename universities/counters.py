@@ -0,0 +1,53 @@
+"""
+Recomputation of the denormalized catalog counters.
+
+University.programs_count, University.coordinators_count and
+Program.coordinators_count are maintained incrementally by model saves and
+deletes. Bulk writes (bulk_create, queryset.update) bypass that, so callers
+doing bulk work recount the affected rows here afterwards. Only rows whose
+counters are wrong are written; the recount functions return how many.
+"""
+
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import University, Program, Coordinator
+
+
+def _active_count(model, fk):
+    """Correlated subquery counting active rows of model pointing at the outer row"""
+    counts = (
+        model.objects.filter(**{fk: OuterRef('pk'), 'is_active': True})
+        .order_by()
+        .values(fk)
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def _recount(queryset, counters):
+    """Set the counters (field -> expression) of the rows where they are wrong; returns how many"""
+    stale = Q()
+    for field, count in counters.items():
+        stale |= ~Q(**{field: count})
+    return queryset.filter(stale).update(**counters)
+
+
+def recount_universities(university_ids=None):
+    """Recompute programs_count and coordinators_count; all universities by default"""
+    universities = University.objects.all()
+    if university_ids is not None:
+        universities = universities.filter(pk__in=list(university_ids))
+    return _recount(universities, {
+        'programs_count': _active_count(Program, 'university'),
+        'coordinators_count': _active_count(Coordinator, 'university'),
+    })
+
+
+def recount_programs(program_ids=None):
+    """Recompute coordinators_count; all programs by default"""
+    programs = Program.objects.all()
+    if program_ids is not None:
+        programs = programs.filter(pk__in=list(program_ids))
+    return _recount(programs, {'coordinators_count': _active_count(Coordinator, 'program')})
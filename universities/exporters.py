@@ -0,0 +1,241 @@
+"""
+Streaming export of the catalog in the layout import_csv reads.
+
+Rows are read with ``values_list().iterator(chunk_size)`` (a server-side
+cursor on PostgreSQL) and written as they arrive, so memory use does not
+depend on the size of the catalog. Output formats and compression are the
+ones the importer accepts (see universities.import_sources): CSV or JSON
+lines, optionally gzip/zstd compressed, and Parquet written one row group
+per chunk.
+"""
+
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.utils import timezone
+
+from payments.models import EmailLog
+
+from .import_rows import COLUMN_TYPES
+from .import_sources import UnsupportedFormat, require_package, detect_format
+from .models import University, Program, Coordinator
+
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Column name -> ORM path, per exported model, in import_csv's column order
+EXPORT_COLUMNS = {
+    'universities': (University, [
+        ('university_id', 'university_id'),
+        ('name', 'name'),
+        ('country', 'country'),
+        ('city', 'city'),
+        ('website', 'website'),
+        ('description', 'description'),
+        ('established_year', 'established_year'),
+        ('student_count', 'student_count'),
+        ('ranking_world', 'ranking_world'),
+        ('ranking_country', 'ranking_country'),
+    ]),
+    'programs': (Program, [
+        ('program_id', 'program_id'),
+        ('university_id', 'university__university_id'),
+        ('name', 'name'),
+        ('field_of_study', 'field_of_study'),
+        ('degree_level', 'degree_level'),
+        ('description', 'description'),
+        ('duration_months', 'duration_months'),
+        ('language', 'language'),
+        ('tuition_fee_euro', 'tuition_fee_euro'),
+        ('application_deadline', 'application_deadline'),
+        ('start_date', 'start_date'),
+        ('min_gpa', 'min_gpa'),
+        ('ielts_score', 'ielts_score'),
+        ('toefl_score', 'toefl_score'),
+        ('gre_score', 'gre_score'),
+        ('program_website', 'program_website'),
+        ('brochure_url', 'brochure_url'),
+        ('is_active', 'is_active'),
+    ]),
+    'coordinators': (Coordinator, [
+        ('program_id', 'program__program_id'),
+        ('name', 'name'),
+        ('email', 'public_email'),
+        ('role', 'role'),
+        ('is_active', 'is_active'),
+    ]),
+    'email_logs': (EmailLog, [
+        ('user_id', 'user_id'),
+        ('coordinator_id', 'coordinator_id'),
+        ('subject', 'subject'),
+        ('body', 'body'),
+        ('email_provider', 'email_provider'),
+        ('status', 'status'),
+        ('sent_at', 'sent_at'),
+        ('error_message', 'error_message'),
+        ('message_id', 'message_id'),
+    ]),
+}
+
+EXPORT_MODELS = tuple(EXPORT_COLUMNS)
+
+
+def _split_name(row):
+    """Coordinators are imported from first_name/last_name columns"""
+    first, _, last = (row.pop('name') or '').partition(' ')
+    row['first_name'] = first
+    row['last_name'] = last
+    return row
+
+
+def _header(model_name):
+    names = [name for name, _ in EXPORT_COLUMNS[model_name][1]]
+    if model_name == 'coordinators':
+        names[names.index('name'):names.index('name') + 1] = ['first_name', 'last_name']
+    return names
+
+
+def iter_rows(model_name, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the rows of one model as dicts of Python values, in primary key order"""
+    model, columns = EXPORT_COLUMNS[model_name]
+    names = [name for name, _ in columns]
+    queryset = model.objects.order_by('pk').values_list(*[path for _, path in columns])
+    for values in queryset.iterator(chunk_size=chunk_size):
+        row = dict(zip(names, values))
+        yield _split_name(row) if model_name == 'coordinators' else row
+
+
+def _datetime(value):
+    # import_csv reads naive local timestamps
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, datetime):
+        return _datetime(value)
+    return str(value)
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return _datetime(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _open_text(path, compression):
+    """Open a text stream for writing, compressing it if requested"""
+    if path == '-':
+        if compression:
+            raise UnsupportedFormat('Compressed output can not be written to stdout')
+        return sys.stdout, False
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline=''), True
+    if compression == 'zstd':
+        zstandard = require_package('zstandard', 'zstandard', 'zstd compressed files')
+        raw = zstandard.ZstdCompressor().stream_writer(open(path, 'wb'), closefd=True)
+        return io.TextIOWrapper(raw, encoding='utf-8', newline=''), True
+    return open(path, 'w', encoding='utf-8', newline=''), True
+
+
+def _write_csv(rows, file, header):
+    writer = csv.writer(file)
+    writer.writerow(header)
+    count = 0
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_value(row.get(name)) for name in header])
+    return count
+
+
+def _write_jsonl(rows, file, header):
+    count = 0
+    for count, row in enumerate(rows, 1):
+        file.write(json.dumps({name: _json_value(row.get(name)) for name in header}, ensure_ascii=False))
+        file.write('\n')
+    return count
+
+
+def _parquet_schema(pa, model_name, header):
+    types = COLUMN_TYPES.get(model_name, {})
+    arrow_types = {
+        'int': pa.int64(),
+        'decimal': pa.decimal128(18, 2),
+        'date': pa.date32(),
+        'bool': pa.bool_(),
+    }
+    return pa.schema([(name, arrow_types.get(types.get(name), pa.string())) for name in header])
+
+
+def _write_parquet(rows, path, model_name, header, chunk_size):
+    pa = require_package('pyarrow', 'pyarrow', 'parquet files')
+    parquet = require_package('pyarrow.parquet', 'pyarrow', 'parquet files')
+    schema = _parquet_schema(pa, model_name, header)
+    string_columns = {field.name for field in schema if pa.types.is_string(field.type)}
+
+    def batch(chunk):
+        columns = {
+            name: [
+                None if row.get(name) is None else (_csv_value(row[name]) if name in string_columns else row[name])
+                for row in chunk
+            ]
+            for name in header
+        }
+        return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+    count = 0
+    with parquet.ParquetWriter(path, schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                writer.write_batch(batch(chunk))
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_batch(batch(chunk))
+            count += len(chunk)
+    return count
+
+
+def export_model(model_name, path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write one model to ``path`` ('-' for stdout).
+
+    Returns:
+        Tuple of (rows written, seconds taken)
+    """
+    fmt, compression = detect_format(path if path != '-' else 'stdout.csv', fmt)
+    if fmt == 'arrow':
+        raise UnsupportedFormat('Export to Arrow IPC is not supported, use parquet')
+    if fmt == 'parquet' and path == '-':
+        raise UnsupportedFormat('Parquet output can not be written to stdout')
+
+    started = time.monotonic()
+    header = _header(model_name)
+    rows = iter_rows(model_name, chunk_size)
+    if fmt == 'parquet':
+        count = _write_parquet(rows, path, model_name, header, chunk_size)
+    else:
+        file, close = _open_text(path, compression)
+        try:
+            write = _write_csv if fmt == 'csv' else _write_jsonl
+            count = write(rows, file, header)
+        finally:
+            if close:
+                file.close()
+    return count, time.monotonic() - started
@@ -0,0 +1,111 @@
+"""
+Facet counts for program search.
+
+Each facet is computed with one grouped aggregate query over the programs
+matching the current filters, excluding the facet's own filter so the UI can
+still show the other values of a facet the user has already narrowed
+(e.g. "Italy: 412, Germany: 130" while Italy is selected).
+"""
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from .models import Program
+
+
+# Facet name -> Program field it groups on
+FACET_FIELDS = {
+    'country': 'university__country',
+    'field_of_study': 'field_of_study',
+    'degree_level': 'degree_level',
+    'language': 'language',
+    'tuition': 'tuition_bucket',
+}
+
+# Tuition buckets: (key, label, lower bound inclusive, upper bound exclusive)
+TUITION_BUCKETS = (
+    ('lt_1000', 'Under €1,000', None, 1000),
+    ('1000_3000', '€1,000 - €3,000', 1000, 3000),
+    ('3000_5000', '€3,000 - €5,000', 3000, 5000),
+    ('5000_10000', '€5,000 - €10,000', 5000, 10000),
+    ('gte_10000', '€10,000 and above', 10000, None),
+)
+TUITION_UNKNOWN = 'unknown'
+
+_LABELS = {
+    'degree_level': dict(Program.DEGREE_LEVEL_CHOICES),
+    'tuition': {**{key: label for key, label, _, _ in TUITION_BUCKETS}, TUITION_UNKNOWN: 'Not specified'},
+}
+
+
+def requested_facets(value):
+    """Parse the ``facets`` query parameter ("1"/"true" or a comma separated list)"""
+    if not value:
+        return []
+    if value.lower() in ('1', 'true', 'all'):
+        return list(FACET_FIELDS)
+    return [name for name in (part.strip() for part in value.split(',')) if name in FACET_FIELDS]
+
+
+def _bucket_q(lower, upper):
+    q = Q(tuition_fee_euro__isnull=False)
+    if lower is not None:
+        q &= Q(tuition_fee_euro__gte=lower)
+    if upper is not None:
+        q &= Q(tuition_fee_euro__lt=upper)
+    return q
+
+
+def tuition_filter(key):
+    """Q object selecting programs in a tuition bucket, None for unknown keys"""
+    if key == TUITION_UNKNOWN:
+        return Q(tuition_fee_euro__isnull=True)
+    for bucket_key, _, lower, upper in TUITION_BUCKETS:
+        if bucket_key == key:
+            return _bucket_q(lower, upper)
+    return None
+
+
+def _tuition_bucket():
+    return Case(
+        *[When(_bucket_q(lower, upper), then=Value(key)) for key, _, lower, upper in TUITION_BUCKETS],
+        default=Value(TUITION_UNKNOWN),
+        output_field=CharField(),
+    )
+
+
+def facet_queryset(queryset, name):
+    """Grouped aggregate query counting programs per value of one facet"""
+    field = FACET_FIELDS[name]
+    queryset = queryset.order_by()
+    if name == 'tuition':
+        queryset = queryset.annotate(tuition_bucket=_tuition_bucket())
+    return queryset.values(field).annotate(count=Count('id')).order_by('-count', field)
+
+
+def facet_counts(queryset, name):
+    """Count programs in queryset per value of one facet, most common first"""
+    field = FACET_FIELDS[name]
+    rows = facet_queryset(queryset, name)
+    labels = _LABELS.get(name)
+    counts = []
+    for row in rows:
+        entry = {'value': row[field], 'count': row['count']}
+        if labels is not None:
+            entry['label'] = labels.get(row[field], row[field])
+        counts.append(entry)
+    return counts
+
+
+def compute_facets(build_queryset, names):
+    """
+    Compute facet counts for the current filter set.
+
+    Args:
+        build_queryset: Callable taking ``exclude`` (a facet name) and returning
+            the filtered Program queryset without that facet's filter
+        names: Facets to compute
+
+    Returns:
+        Dict of facet name -> list of {value, count[, label]}
+    """
+    return {name: facet_counts(build_queryset(exclude=name), name) for name in names}
@@ -0,0 +1,129 @@
+"""
+Allocation of the public ``university_id`` / ``program_id`` identifiers.
+
+Identifiers have the form ``<base>_<NN>`` where the base is derived from the
+names (see university_base_id / program_base_id) and NN is a per-base counter.
+The last counter handed out for each base is kept in an IdSequence row that is
+locked while allocating, so allocation costs a constant number of queries
+however many ids already share the base, concurrent writers never receive the
+same id, and a bulk insert can reserve a whole block of ids at once.
+
+A sequence row is seeded from the highest counter already present in the
+table the first time its base is seen, so existing data keeps working.
+"""
+
+import re
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+
+from .models import IdSequence
+
+
+# Maximum allocation attempts when explicitly assigned ids collide with a sequence
+MAX_ATTEMPTS = 5
+
+
+def _slug(value, length):
+    return ''.join(c.upper() for c in (value or '') if c.isalnum())[:length]
+
+
+def university_base_id(name, country):
+    """Base of a university_id: first alphanumerics of name and country"""
+    return f"{_slug(name, 6)}_{_slug(country, 3)}"
+
+
+def program_base_id(university_public_id, name):
+    """Base of a program_id: university_id prefix and first alphanumerics of the name"""
+    university_prefix = university_public_id[:6] if university_public_id and university_public_id != 'TEMP_ID' else 'UNI'
+    return f"{university_prefix}_{_slug(name, 6)}"
+
+
+def format_id(base_id, counter):
+    return f"{base_id}_{counter:02d}"
+
+
+def _existing_max(model, field, base_id):
+    """Highest counter already used in the table for base_id (0 if none)"""
+    pattern = re.compile(rf"^{re.escape(base_id)}_(\d+)$")
+    highest = 0
+    existing = model.objects.filter(**{f'{field}__startswith': f'{base_id}_'}).values_list(field, flat=True)
+    for value in existing.iterator():
+        match = pattern.match(value)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def _locked_sequence(key, model, field, base_id):
+    """Fetch the sequence row for key with a row lock, creating it if needed"""
+    sequence = IdSequence.objects.select_for_update().filter(prefix=key).first()
+    if sequence is not None:
+        return sequence
+    try:
+        with transaction.atomic():
+            return IdSequence.objects.create(prefix=key, last_value=_existing_max(model, field, base_id))
+    except IntegrityError:
+        # Another writer seeded it first
+        return IdSequence.objects.select_for_update().get(prefix=key)
+
+
+def allocate_ids(model, field, base_id, count=1):
+    """
+    Reserve ``count`` unused identifiers sharing ``base_id``.
+
+    Args:
+        model: Model owning the identifier column (University or Program)
+        field: Name of the identifier column
+        base_id: Identifier base, e.g. from program_base_id()
+        count: Number of identifiers to reserve
+
+    Returns:
+        List of identifiers, in counter order
+    """
+    if count <= 0:
+        return []
+
+    key = f"{model._meta.model_name}:{base_id}"
+    for _ in range(MAX_ATTEMPTS):
+        with transaction.atomic():
+            sequence = _locked_sequence(key, model, field, base_id)
+            start = sequence.last_value + 1
+            sequence.last_value += count
+            sequence.save(update_fields=['last_value'])
+
+        ids = [format_id(base_id, counter) for counter in range(start, start + count)]
+        # Ids assigned explicitly (e.g. by a CSV import) do not advance the
+        # sequence; skip past them by reseeding from the table
+        if not model.objects.filter(**{f'{field}__in': ids}).exists():
+            return ids
+        with transaction.atomic():
+            sequence = _locked_sequence(key, model, field, base_id)
+            sequence.last_value = max(sequence.last_value, _existing_max(model, field, base_id))
+            sequence.save(update_fields=['last_value'])
+
+    raise IntegrityError(f"Could not allocate a unique {field} for {base_id}")
+
+
+def assign_ids(objects, field, base_id_for):
+    """
+    Fill in missing identifiers on unsaved instances, e.g. before bulk_create.
+
+    Args:
+        objects: Instances of one model
+        field: Name of the identifier column
+        base_id_for: Callable returning the identifier base of an instance
+
+    Ids are allocated with one reservation per distinct base.
+    """
+    groups = defaultdict(list)
+    model = None
+    for obj in objects:
+        model = type(obj)
+        if not getattr(obj, field):
+            groups[base_id_for(obj)].append(obj)
+
+    for base_id, members in groups.items():
+        for obj, value in zip(members, allocate_ids(model, field, base_id, len(members))):
+            setattr(obj, field, value)
+    return objects
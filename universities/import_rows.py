@@ -0,0 +1,288 @@
+"""
+Row parsing for catalog imports.
+
+This module deliberately does not import Django models: the functions here
+run in worker processes of the parallel import (import_csv --workers), which
+only parse and validate rows and send plain dicts back to the single process
+writing to the database.
+
+Parallel imports split a CSV file into byte ranges aligned on line breaks, so
+they require files whose quoted fields contain no embedded newlines.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+from decimal import Decimal
+from datetime import date, datetime
+
+
+# Default size of the byte ranges parsed by each worker task
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+# Typed columns per model. Columnar sources convert these per record batch
+# (see universities.import_sources); the converters below accept both the raw
+# CSV strings and already converted values.
+COLUMN_TYPES = {
+    'universities': {
+        'established_year': 'int',
+        'student_count': 'int',
+        'ranking_world': 'int',
+        'ranking_country': 'int',
+    },
+    'programs': {
+        'duration_months': 'int',
+        'tuition_fee_euro': 'decimal',
+        'application_deadline': 'date',
+        'start_date': 'date',
+        'min_gpa': 'decimal',
+        'ielts_score': 'decimal',
+        'toefl_score': 'int',
+        'gre_score': 'int',
+        'is_active': 'bool',
+    },
+    'coordinators': {
+        'is_active': 'bool',
+    },
+}
+
+
+class InvalidRow:
+    """Placeholder yielded by a source for an input record it could not decode"""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def _empty(value):
+    return value is None or value == ''
+
+
+def _text(value):
+    return value if value else None
+
+
+def _int(value):
+    return None if _empty(value) else int(value)
+
+
+def _decimal(value):
+    if _empty(value):
+        return None
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _date(value):
+    if _empty(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').lower() == 'true'
+
+
+def parse_university(row):
+    """Convert a universities CSV row into model field values"""
+    return {
+        'university_id': row.get('university_id') or '',
+        'name': row['name'],
+        'country': row['country'],
+        'city': row['city'],
+        'website': _text(row.get('website')),
+        'description': _text(row.get('description')),
+        'established_year': _int(row.get('established_year')),
+        'student_count': _int(row.get('student_count')),
+        'ranking_world': _int(row.get('ranking_world')),
+        'ranking_country': _int(row.get('ranking_country')),
+    }
+
+
+def parse_program(row):
+    """Convert a programs CSV row into model field values; ``university`` is the public id"""
+    return {
+        'program_id': row.get('program_id') or '',
+        'university': row['university_id'],
+        'name': row['name'],
+        'field_of_study': row['field_of_study'],
+        'degree_level': row['degree_level'],
+        'description': _text(row.get('description')),
+        'duration_months': _int(row.get('duration_months')),
+        'language': row['language'],
+        'tuition_fee_euro': _decimal(row.get('tuition_fee_euro')),
+        'application_deadline': _date(row.get('application_deadline')),
+        'start_date': _date(row.get('start_date')),
+        'min_gpa': _decimal(row.get('min_gpa')),
+        'ielts_score': _decimal(row.get('ielts_score')),
+        'toefl_score': _int(row.get('toefl_score')),
+        'gre_score': _int(row.get('gre_score')),
+        'program_website': _text(row.get('program_website')),
+        'brochure_url': _text(row.get('brochure_url')),
+        'is_active': _bool(row.get('is_active')),
+    }
+
+
+def parse_coordinator(row):
+    """Convert a coordinators CSV row into model field values; ``program`` is the public id"""
+    return {
+        'program': row['program_id'],
+        'name': f"{row['first_name']} {row['last_name'] or ''}".strip(),
+        'public_email': row['email'],
+        'role': row['role'],
+        # Optional column, written by export_catalog
+        'is_active': True if _empty(row.get('is_active')) else _bool(row['is_active']),
+    }
+
+
+PARSERS = {
+    'universities': parse_university,
+    'programs': parse_program,
+    'coordinators': parse_coordinator,
+}
+
+
+def parse_rows(rows, parser, first_row=1):
+    """
+    Parse CSV rows, collecting errors instead of raising.
+
+    Returns:
+        Tuple of (records, errors, row count)
+    """
+    records = []
+    errors = []
+    count = 0
+    for count, row in enumerate(rows, 1):
+        if isinstance(row, InvalidRow):
+            errors.append(f'Row {first_row + count - 1}: {row.message}')
+            continue
+        try:
+            records.append(parser(row))
+        except (KeyError, ValueError, ArithmeticError) as e:
+            errors.append(f'Row {first_row + count - 1}: {e!r}')
+    return records, errors, count
+
+
+def _canonical(value):
+    # 1500.5 and 1500.50 (e.g. from JSON and from CSV) are the same value
+    if isinstance(value, Decimal):
+        return format(value.normalize(), 'f')
+    return str(value)
+
+
+def record_digest(record):
+    """Stable content hash of a parsed record (import_csv --incremental)"""
+    canonical = json.dumps(record, sort_keys=True, default=_canonical, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(path, sample_bytes=1024 * 1024):
+    """
+    Identify a file by its size and the hash of its first and last megabyte.
+
+    Cheap enough for multi-gigabyte files and changes whenever rows are
+    added, removed or rewritten at either end.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode('ascii'))
+    with open(path, 'rb') as file:
+        digest.update(file.read(sample_bytes))
+        if size > sample_bytes:
+            file.seek(max(sample_bytes, size - sample_bytes))
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+class OffsetCSVReader:
+    """
+    DictReader-like iterator over a CSV file opened in binary mode.
+
+    ``offset`` is the byte position right after the last row returned, so an
+    import can record it and later resume with ``start=offset``. The csv
+    module only pulls the lines a record needs, which keeps the offset exact
+    even for quoted fields spanning several lines.
+    """
+
+    def __init__(self, file, start=None):
+        self.file = file
+        header = file.readline()
+        self.fieldnames = next(csv.reader([header.decode('utf-8-sig')]))
+        # Offsets count bytes from the start of the (possibly decompressed) stream
+        self.data_start = self.offset = len(header)
+        if start is not None and start > self.data_start:
+            file.seek(start)
+            self.offset = start
+        self._reader = csv.reader(self._lines())
+
+    def _lines(self):
+        for line in self.file:
+            self.offset += len(line)
+            yield line.decode('utf-8')
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        values = next(self._reader)
+        while not values:
+            values = next(self._reader)
+        row = dict(zip(self.fieldnames, values))
+        for name in self.fieldnames[len(values):]:
+            row[name] = None
+        return row
+
+
+def read_header(path):
+    """Return (fieldnames, byte offset of the first data line) of a CSV file"""
+    with open(path, 'rb') as file:
+        line = file.readline()
+        fieldnames = next(csv.reader([line.decode('utf-8-sig')]))
+        return fieldnames, file.tell()
+
+
+def byte_ranges(path, chunk_bytes=DEFAULT_CHUNK_BYTES, start=None):
+    """
+    Split the data lines of a CSV file into (start, end) byte ranges.
+
+    Every range starts at the beginning of a line and ends right after a line
+    break (or at the end of the file).
+    """
+    if start is None:
+        _, start = read_header(path)
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as file:
+        while start < size:
+            end = min(start + chunk_bytes, size)
+            if end < size:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(model_name, path, start, end, fieldnames):
+    """
+    Parse the rows of one byte range (run in a worker process).
+
+    Returns:
+        Tuple of (records, errors, row count)
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''), fieldnames=fieldnames)
+    records, errors, count = parse_rows(reader, PARSERS[model_name])
+    # Row numbers are only known relative to the range
+    errors = [f'Bytes {start}-{end}, {error}' for error in errors]
+    return records, errors, count
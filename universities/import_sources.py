@@ -0,0 +1,262 @@
+"""
+Input formats for catalog imports.
+
+open_source() returns an iterator of row dicts read from:
+
+- CSV, plain or gzip/zstd compressed (``.csv``, ``.csv.gz``, ``.csv.zst``)
+- JSON lines, one object per line, plain or compressed
+  (``.jsonl``/``.ndjson`` with optional ``.gz``/``.zst``)
+- Parquet (``.parquet``) and Arrow IPC files or streams
+  (``.arrow``, ``.feather``, ``.ipc``), read in record batches
+
+Columnar sources convert the typed columns listed in COLUMN_TYPES (dates,
+decimals, integers, booleans) with one vectorized pyarrow cast per record
+batch, so the row parsers receive Python values instead of parsing every cell.
+A column that can not be cast as a whole is left as is and converted, with
+per-row error reporting, by the parsers.
+
+zstandard and pyarrow are optional: they are only imported when a file that
+needs them is opened.
+
+Like import_rows, this module does not import Django models.
+"""
+
+import gzip
+import importlib
+import io
+import json
+import os
+
+from .import_rows import COLUMN_TYPES, InvalidRow, OffsetCSVReader
+
+
+FORMATS = ('csv', 'jsonl', 'parquet', 'arrow')
+
+COMPRESSIONS = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+# Scale of the decimal columns (tuition, GPA, IELTS all fit two places)
+DECIMAL_SCALE = 2
+
+
+class UnsupportedFormat(ValueError):
+    """Raised for unknown formats or when the package a format needs is missing"""
+
+
+def detect_format(path, fmt=None):
+    """
+    Work out (format, compression) of an input file from its extension.
+
+    Args:
+        path: File path, e.g. ``programs.csv.gz``
+        fmt: Explicit format overriding the extension
+    """
+    name = path.lower()
+    compression = None
+    for suffix, kind in COMPRESSIONS.items():
+        if name.endswith(suffix):
+            compression = kind
+            name = name[:-len(suffix)]
+            break
+
+    fmt = fmt or FORMAT_EXTENSIONS.get(os.path.splitext(name)[1])
+    if fmt not in FORMATS:
+        raise UnsupportedFormat(f'Can not tell the format of {path}; pass one of: {", ".join(FORMATS)}')
+    if compression and fmt in ('parquet', 'arrow'):
+        raise UnsupportedFormat(f'{fmt} files are compressed internally and can not be {compression} compressed')
+    return fmt, compression
+
+
+def require_package(module, package, purpose):
+    """Import an optional dependency, failing with an installation hint"""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise UnsupportedFormat(f'{purpose.capitalize()} require the {package} package (pip install {package})')
+
+
+def _decompressed(raw, compression):
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if compression == 'zstd':
+        zstandard = require_package('zstandard', 'zstandard', 'zstd compressed files')
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    return raw
+
+
+def _skip(rows, count):
+    for _ in range(count):
+        if next(rows, None) is None:
+            break
+    return rows
+
+
+class StreamSource:
+    """
+    CSV or JSON lines read sequentially from a plain or compressed file.
+
+    Plain CSV files resume from a byte offset (``offset``); compressed files
+    and JSON lines can not seek and resume by skipping ``skip_rows`` rows.
+    """
+
+    def __init__(self, path, fmt, compression=None, offset=None, skip_rows=0):
+        self.raw = open(path, 'rb')
+        self.seekable = fmt == 'csv' and compression is None
+        stream = _decompressed(self.raw, compression)
+
+        if fmt == 'csv':
+            self.reader = OffsetCSVReader(stream, start=offset if self.seekable else None)
+            rows = iter(self.reader)
+            if not (self.seekable and offset):
+                rows = _skip(rows, skip_rows)
+        else:
+            self.reader = None
+            rows = _skip(self._json_lines(stream), skip_rows)
+        self._rows = rows
+
+    @staticmethod
+    def _json_lines(stream):
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield InvalidRow(f'invalid JSON: {e}')
+                continue
+            yield row if isinstance(row, dict) else InvalidRow('expected a JSON object')
+
+    @property
+    def offset(self):
+        """Byte offset to resume from, None if this source can only skip rows"""
+        return self.reader.offset if self.seekable else None
+
+    @property
+    def position(self):
+        """Bytes of the file on disk consumed so far"""
+        return self.reader.offset if self.seekable else self.raw.tell()
+
+    def __iter__(self):
+        return self._rows
+
+    def close(self):
+        self.raw.close()
+
+
+def _convert_column(pa, pc, array, kind):
+    """Cast one column to the Python-friendly type of ``kind``, or return it unchanged"""
+    try:
+        if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            array = pc.if_else(pc.equal(pc.utf8_trim_whitespace(array), ''), pa.scalar(None, array.type), array)
+            if kind == 'bool':
+                return pc.equal(pc.utf8_lower(array), 'true')
+            if kind == 'date':
+                return pc.cast(pc.strptime(array, format='%Y-%m-%d', unit='s'), pa.date32())
+        target = {
+            'int': pa.int64(),
+            'decimal': pa.decimal128(18, DECIMAL_SCALE),
+            'date': pa.date32(),
+            'bool': pa.bool_(),
+        }[kind]
+        return pc.cast(array, target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        return array
+
+
+class ArrowSource:
+    """
+    Parquet or Arrow IPC file read in record batches.
+
+    ``position`` is estimated from the share of rows read. Resuming skips
+    ``skip_rows`` rows at the batch level without converting them.
+    """
+
+    offset = None
+
+    def __init__(self, path, fmt, model_name, batch_size, skip_rows=0):
+        self.pa = require_package('pyarrow', 'pyarrow', f'{fmt} files')
+        self.pc = require_package('pyarrow.compute', 'pyarrow', f'{fmt} files')
+        self.size = os.path.getsize(path)
+        self.column_types = COLUMN_TYPES.get(model_name, {})
+        self.rows_read = 0
+        self.skip_rows = skip_rows
+
+        if fmt == 'parquet':
+            parquet = require_package('pyarrow.parquet', 'pyarrow', 'parquet files')
+            self._file = parquet.ParquetFile(path)
+            self.total_rows = self._file.metadata.num_rows
+            self._batches = self._file.iter_batches(batch_size=batch_size)
+        else:
+            self._file = self.pa.memory_map(path)
+            try:
+                reader = self.pa.ipc.open_file(self._file)
+                self.total_rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+                self._batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            except self.pa.ArrowInvalid:
+                self._file.seek(0)
+                self.total_rows = None
+                self._batches = iter(self.pa.ipc.open_stream(self._file))
+
+    def convert(self, batch):
+        """Vectorized conversion of the typed columns of one record batch"""
+        columns = []
+        for name, array in zip(batch.schema.names, batch.columns):
+            kind = self.column_types.get(name)
+            columns.append(_convert_column(self.pa, self.pc, array, kind) if kind else array)
+        return self.pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+    @property
+    def position(self):
+        if not self.total_rows:
+            return 0
+        return self.size * self.rows_read // self.total_rows
+
+    def __iter__(self):
+        skip = self.skip_rows
+        for batch in self._batches:
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                self.rows_read += batch.num_rows
+                continue
+            if skip:
+                batch = batch.slice(skip)
+                self.rows_read += skip
+                skip = 0
+            for row in self.convert(batch).to_pylist():
+                self.rows_read += 1
+                yield row
+
+    def close(self):
+        if hasattr(self._file, 'close'):
+            self._file.close()
+
+
+def open_source(path, model_name, fmt=None, batch_size=1000, offset=None, skip_rows=0):
+    """
+    Open an import file as an iterator of row dicts.
+
+    Args:
+        path: Input file
+        model_name: Imported model (selects the typed columns)
+        fmt: Explicit format, detected from the extension by default
+        batch_size: Record batch size of columnar sources
+        offset: Byte offset to resume a plain CSV file from
+        skip_rows: Rows to skip when resuming any other source
+    """
+    fmt, compression = detect_format(path, fmt)
+    if fmt in ('csv', 'jsonl'):
+        return StreamSource(path, fmt, compression, offset=offset, skip_rows=skip_rows)
+    return ArrowSource(path, fmt, model_name, batch_size, skip_rows=skip_rows)
@@ -0,0 +1,641 @@
+"""
+Batched import of universities, programs and coordinators.
+
+Rows are consumed as a stream and written in chunks. For each chunk the
+foreign keys are resolved with one query per related model, the rows are
+upserted with ``bulk_create(update_conflicts=True)`` inside a transaction and
+the search index is refreshed for the programs it touched. The denormalized
+counters are recomputed once at the end, also when the import fails part
+way (the batches committed until then stay in the database).
+
+Sequential file imports (run_file) accept CSV, JSON lines, Parquet and
+Arrow input (see universities.import_sources) and store a checkpoint after
+every committed batch, so an interrupted import of the same file resumes
+where it stopped.
+
+Files can also be split into byte ranges processed by a pool of worker
+processes (run_parallel). On PostgreSQL every worker writes its own ranges,
+so keys should be unique within the file as the order of those writes is not
+defined; on other databases the workers only parse and the records are
+written by a single process in file order.
+
+bulk_create bypasses Model.save() and signals, so everything they maintain
+(generated ids, counters, search index) is handled here instead; callers are
+expected to bump the catalog version once the import is done.
+"""
+
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+import django
+from django.db import connection, connections, transaction
+
+from . import search
+from .counters import recount_programs, recount_universities
+from .ids import assign_ids, program_base_id, university_base_id
+from .import_rows import (
+    DEFAULT_CHUNK_BYTES, PARSERS, byte_ranges, file_fingerprint, parse_coordinator, parse_program,
+    parse_range, parse_rows, parse_university, read_header, record_digest,
+)
+from .import_sources import open_source
+from .models import University, Program, Coordinator, ImportCheckpoint, ImportFingerprint
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Number of row errors kept for the final report
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportResult:
+    """Counters reported at the end of an import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        # Incremental imports only
+        self.unchanged = 0
+        self.missing = 0
+        self.deactivated = 0
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+        # Position in the file, for progress reporting
+        self.bytes_start = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.resumed_rows = 0
+
+    def error(self, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    @property
+    def rate(self):
+        """Rows per second processed in this run"""
+        return (self.rows - self.resumed_rows) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def progress(self):
+        """Fraction of the file processed, None when the size is unknown"""
+        if not self.bytes_total:
+            return None
+        return self.bytes_done / self.bytes_total
+
+    @property
+    def eta(self):
+        """Estimated seconds left, from the bytes processed so far in this run"""
+        done = self.bytes_done - self.bytes_start
+        if not self.bytes_total or done <= 0 or not self.elapsed:
+            return None
+        return (self.bytes_total - self.bytes_done) * self.elapsed / done
+
+
+class CatalogImporter:
+    """
+    Base class of the batched importers.
+
+    Subclasses set ``model``, ``unique_fields`` (the conflict target),
+    ``parse_row`` and ``resolved_fields`` (columns filled by ``resolve``
+    rather than read from the file) and implement ``resolve`` to turn parsed
+    records into unsaved model instances.
+
+    In incremental mode every record is hashed and compared with the
+    ImportFingerprint stored for its key by the previous import: unchanged
+    records are not written, and records imported before but missing from
+    the file are deactivated (unless ``deactivate_missing`` is False). With
+    ``dry_run`` nothing is written and the result only describes the delta.
+    """
+
+    name = None
+    model = None
+    unique_fields = ()
+    parse_row = None
+    resolved_fields = ()
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, incremental=False, dry_run=False, deactivate_missing=True):
+        self.batch_size = batch_size
+        self.incremental = incremental or dry_run
+        self.dry_run = dry_run
+        self.deactivate_missing = deactivate_missing
+        self.result = ImportResult()
+        self.university_ids = set()
+        self.program_ids = set()
+        self.seen_keys = set()
+        self.parse_errors = 0
+        # Set when resuming: rows written before the interruption are not tracked
+        self.resumed = False
+        self.finished = False
+
+    @property
+    def update_fields(self):
+        """
+        Columns overwritten on conflict: the ones the file provides, the
+        foreign keys resolved from it and updated_at. Columns the import does
+        not know about (a coordinator's phone, a university's logo) keep their
+        stored values, as do the counters.
+        """
+        # Parsers return the same keys for every row
+        provided = set(PARSERS[self.name](defaultdict(str))) | set(self.resolved_fields) | {'updated_at'}
+        return [
+            field.name for field in self.model._meta.concrete_fields
+            if field.name in provided and field.name not in self.unique_fields
+        ]
+
+    def resolve(self, records):
+        """Return unsaved instances for the records, reporting unresolvable ones"""
+        raise NotImplementedError
+
+    def existing_keys(self, instances):
+        """Conflict-target values of the instances that are already stored"""
+        raise NotImplementedError
+
+    def key(self, instance):
+        raise NotImplementedError
+
+    def record_key(self, record):
+        """Stable key of a parsed record, used for its fingerprint"""
+        raise NotImplementedError
+
+    def deactivate(self, keys):
+        """Deactivate the active rows with the given record keys; returns how many"""
+        return 0
+
+    def after_write(self, instances):
+        """Hook run inside the batch transaction once the rows are written"""
+
+    def finish(self):
+        """Recompute what the bulk writes bypassed for the rows touched"""
+        self.finished = True
+        if self.resumed:
+            # The ids touched before the interruption are unknown
+            recount_programs()
+            recount_universities()
+            return
+        for ids in _chunks(sorted(self.program_ids), self.batch_size):
+            recount_programs(ids)
+        for ids in _chunks(sorted(self.university_ids), self.batch_size):
+            recount_universities(ids)
+
+    def write_batch(self, records):
+        instances = self.resolve(records)
+        if not instances:
+            return
+
+        with transaction.atomic():
+            existing = self.existing_keys(instances)
+            self.model.objects.bulk_create(
+                instances,
+                update_conflicts=True,
+                unique_fields=list(self.unique_fields),
+                update_fields=self.update_fields,
+            )
+            self.after_write(instances)
+            fingerprints = [instance._fingerprint for instance in instances if getattr(instance, '_fingerprint', None)]
+            if fingerprints:
+                self.save_fingerprints(fingerprints)
+
+        updated = sum(1 for instance in instances if self.key(instance) in existing)
+        self.result.updated += updated
+        self.result.created += len(instances) - updated
+
+    def write_changes(self, records):
+        """Write only the records whose content differs from their fingerprint"""
+        keyed = []
+        for record in records:
+            key = self.record_key(record)
+            if not key:
+                self.result.error(f'{self.name} row without a key can not be imported incrementally')
+                continue
+            keyed.append((key, record_digest(record), record))
+        self.seen_keys.update(key for key, _, _ in keyed)
+
+        stored = dict(ImportFingerprint.objects.filter(
+            model_name=self.name, key__in=[key for key, _, _ in keyed]
+        ).values_list('key', 'digest'))
+
+        changed = []
+        for key, digest, record in keyed:
+            previous = stored.get(key)
+            if previous == digest:
+                self.result.unchanged += 1
+            elif self.dry_run:
+                if previous is None:
+                    self.result.created += 1
+                else:
+                    self.result.updated += 1
+            else:
+                record['_fingerprint'] = (key, digest)
+                changed.append(record)
+        if changed:
+            self.write_batch(changed)
+
+    def save_fingerprints(self, fingerprints):
+        ImportFingerprint.objects.bulk_create(
+            [ImportFingerprint(model_name=self.name, key=key, digest=digest) for key, digest in fingerprints],
+            update_conflicts=True,
+            unique_fields=['model_name', 'key'],
+            update_fields=['digest', 'updated_at'],
+        )
+
+    def deactivate_unseen(self):
+        """Deactivate records imported before but absent from this import"""
+        if self.parse_errors:
+            # Keys of unparseable rows are unknown, they must not be treated as missing
+            self.result.errors.append(
+                f'Not deactivating missing {self.name}: {self.parse_errors} rows could not be parsed'
+            )
+            return
+        stored = ImportFingerprint.objects.filter(model_name=self.name).exclude(digest='')
+        missing = [key for key in stored.values_list('key', flat=True).iterator() if key not in self.seen_keys]
+        self.result.missing = len(missing)
+
+        for keys in _chunks(missing, self.batch_size):
+            with transaction.atomic():
+                self.result.deactivated += self.deactivate(keys)
+                if not self.dry_run:
+                    # Reappearing records then count as updated
+                    ImportFingerprint.objects.filter(model_name=self.name, key__in=keys).update(digest='')
+
+    def add_parsed(self, records, errors, count):
+        """Account for a block of parsed rows and write its records in batches"""
+        self.result.rows += count
+        self.parse_errors += len(errors)
+        for error in errors:
+            self.result.error(error)
+        write = self.write_changes if self.incremental else self.write_batch
+        for batch in _chunks(records, self.batch_size):
+            write(batch)
+
+    def run(self, rows, progress=None):
+        """
+        Import an iterable of CSV rows (dicts).
+
+        Args:
+            rows: Iterable of rows, consumed lazily
+            progress: Optional callable receiving the ImportResult after each batch
+        """
+        rows = iter(rows)
+        with self._finish_on_error():
+            while True:
+                chunk = list(islice(rows, self.batch_size))
+                if not chunk:
+                    break
+                self.add_parsed(*parse_rows(chunk, self.parse_row, first_row=self.result.rows + 1))
+                self._progress(progress)
+            return self._finish()
+
+    def run_file(self, path, progress=None, resume=True, fmt=None):
+        """
+        Import a file sequentially, checkpointing after every batch.
+
+        The position and row count after each committed batch are stored in
+        ImportCheckpoint under the file's fingerprint; running the same file
+        again after an interruption continues from there (unless ``resume``
+        is False). Plain CSV files resume from the byte offset, other formats
+        (see universities.import_sources) by skipping the committed rows. The
+        checkpoint is removed once the import ends. Batches are upserts, so a
+        batch committed just before a crash and imported again on resume is
+        harmless.
+        """
+        checkpoints = not self.dry_run
+        fingerprint = file_fingerprint(path) if checkpoints else None
+        checkpoint = None
+        if checkpoints:
+            checkpoint = ImportCheckpoint.objects.filter(model_name=self.name, file_fingerprint=fingerprint).first()
+            if checkpoint and not resume:
+                checkpoint.delete()
+                checkpoint = None
+
+        self.result.bytes_total = os.path.getsize(path)
+        source = open_source(
+            path, self.name, fmt=fmt, batch_size=self.batch_size,
+            offset=checkpoint.byte_offset if checkpoint else None,
+            skip_rows=checkpoint.rows if checkpoint else 0,
+        )
+        with self._finish_on_error():
+            try:
+                if checkpoint:
+                    self.resumed = True
+                    self.result.rows = self.result.resumed_rows = checkpoint.rows
+                self.result.bytes_start = self.result.bytes_done = source.position
+
+                rows = iter(source)
+                while True:
+                    chunk = list(islice(rows, self.batch_size))
+                    if not chunk:
+                        break
+                    self.add_parsed(*parse_rows(chunk, self.parse_row, first_row=self.result.rows + 1))
+                    self.result.bytes_done = source.position
+                    if checkpoints:
+                        ImportCheckpoint.objects.update_or_create(
+                            model_name=self.name, file_fingerprint=fingerprint,
+                            defaults={
+                                'file_name': os.path.basename(path)[:255],
+                                'byte_offset': source.offset or 0,
+                                'rows': self.result.rows,
+                            }
+                        )
+                    self._progress(progress)
+            finally:
+                source.close()
+
+            result = self._finish()
+            if checkpoints:
+                ImportCheckpoint.objects.filter(model_name=self.name, file_fingerprint=fingerprint).delete()
+            return result
+
+    def run_parallel(self, model_name, path, workers, chunk_bytes=DEFAULT_CHUNK_BYTES, progress=None):
+        """
+        Import a CSV file, processing byte ranges of it in ``workers`` processes.
+
+        On PostgreSQL each worker also writes its ranges in its own
+        transactions. Elsewhere (SQLite allows a single writer) the workers only
+        parse, and the parsed ranges are written by this process in file order.
+        """
+        fieldnames, start = read_header(path)
+        ranges = byte_ranges(path, chunk_bytes, start)
+        self.result.bytes_total = os.path.getsize(path)
+        self.result.bytes_start = self.result.bytes_done = start
+        # Incremental imports diff against fingerprints in this process
+        parallel_writes = connection.vendor == 'postgresql' and not self.incremental
+        if parallel_writes:
+            # Forked workers must open their own database connections
+            connections.close_all()
+        # Bound the ranges parsed but not yet written held in memory
+        window = workers * 2
+
+        with self._finish_on_error():
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+                pending = deque()
+                for range_start, range_end in ranges:
+                    if parallel_writes:
+                        task = (_write_range, model_name, path, range_start, range_end, fieldnames, self.batch_size)
+                    else:
+                        task = (parse_range, model_name, path, range_start, range_end, fieldnames)
+                    pending.append((executor.submit(*task), range_end))
+                    if len(pending) >= window:
+                        self._collect(*pending.popleft(), parallel_writes, progress)
+                while pending:
+                    self._collect(*pending.popleft(), parallel_writes, progress)
+            return self._finish()
+
+    def _collect(self, future, range_end, written, progress):
+        output = future.result()
+        # Ranges are collected in file order
+        self.result.bytes_done = range_end
+        if written:
+            self.merge(*output)
+        else:
+            self.add_parsed(*output)
+        self._progress(progress)
+
+    def merge(self, rows, created, updated, errors, skipped, university_ids, program_ids):
+        """Add the outcome of a range written by a worker process"""
+        self.result.rows += rows
+        self.result.created += created
+        self.result.updated += updated
+        for error in errors:
+            self.result.error(error)
+        # Errors beyond the ones a worker kept still count as skipped rows
+        self.result.skipped += skipped - len(errors)
+        self.university_ids.update(university_ids)
+        self.program_ids.update(program_ids)
+
+    @contextmanager
+    def _finish_on_error(self):
+        """
+        Run finish() if the import fails: the batches committed before the
+        error are in the database and their counters must not drift.
+        """
+        try:
+            yield
+        except BaseException:
+            if not self.dry_run and not self.finished:
+                self.finish()
+            raise
+
+    def _progress(self, progress):
+        self.result.elapsed = time.monotonic() - self.result.started
+        if progress:
+            progress(self.result)
+
+    def _finish(self):
+        if self.incremental and self.deactivate_missing:
+            if self.resumed:
+                # Keys seen before the interruption are unknown
+                self.result.errors.append(f'Not deactivating missing {self.name}: the import was resumed')
+            else:
+                self.deactivate_unseen()
+        if not self.dry_run:
+            self.finish()
+        self.result.elapsed = time.monotonic() - self.result.started
+        return self.result
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _instance(model, record, **fields):
+    """Build an unsaved instance, carrying over the record's fingerprint if any"""
+    fingerprint = record.pop('_fingerprint', None)
+    instance = model(**fields, **record)
+    instance._fingerprint = fingerprint
+    return instance
+
+
+def _dedupe(instances, key):
+    """Keep the last occurrence of each key; a batch may not upsert the same row twice"""
+    unique = {}
+    for instance in instances:
+        unique[key(instance)] = instance
+    return list(unique.values())
+
+
+class UniversityImporter(CatalogImporter):
+    name = 'universities'
+    model = University
+    unique_fields = ('university_id',)
+    parse_row = staticmethod(parse_university)
+
+    def resolve(self, records):
+        instances = [_instance(University, record) for record in records]
+        assign_ids(instances, 'university_id', lambda u: university_base_id(u.name, u.country))
+        return _dedupe(instances, self.key)
+
+    def key(self, instance):
+        return instance.university_id
+
+    def record_key(self, record):
+        # Universities have no is_active flag, missing ones are only reported
+        return record['university_id']
+
+    def existing_keys(self, instances):
+        return set(University.objects.filter(
+            university_id__in=[u.university_id for u in instances]
+        ).values_list('university_id', flat=True))
+
+    def after_write(self, instances):
+        # University names are part of the program search documents
+        rows = University.objects.filter(
+            university_id__in=[u.university_id for u in instances]
+        ).values_list('pk', flat=True)
+        for pk in rows:
+            search.reindex_programs(university_id=pk)
+
+
+class ProgramImporter(CatalogImporter):
+    name = 'programs'
+    model = Program
+    unique_fields = ('program_id',)
+    parse_row = staticmethod(parse_program)
+    resolved_fields = ('university',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # university_id (public) -> pk, filled lazily across batches
+        self.universities = {}
+
+    def resolve(self, records):
+        missing = {record['university'] for record in records} - self.universities.keys()
+        if missing:
+            self.universities.update(
+                University.objects.filter(university_id__in=missing).values_list('university_id', 'pk')
+            )
+
+        instances = []
+        for record in records:
+            public_id = record.pop('university')
+            university_pk = self.universities.get(public_id)
+            if university_pk is None:
+                self.result.error(f'University with ID {public_id} does not exist')
+                continue
+            program = _instance(Program, record, university_id=university_pk)
+            program._university_public_id = public_id
+            instances.append(program)
+
+        assign_ids(instances, 'program_id', lambda p: program_base_id(p._university_public_id, p.name))
+        return _dedupe(instances, self.key)
+
+    def key(self, instance):
+        return instance.program_id
+
+    def record_key(self, record):
+        return record['program_id']
+
+    def deactivate(self, keys):
+        programs = Program.objects.filter(program_id__in=keys, is_active=True)
+        if self.dry_run:
+            return programs.count()
+        self.university_ids.update(programs.values_list('university_id', flat=True))
+        return programs.update(is_active=False)
+
+    def existing_keys(self, instances):
+        rows = Program.objects.filter(
+            program_id__in=[p.program_id for p in instances]
+        ).values_list('program_id', 'university_id')
+        existing = set()
+        for program_id, university_pk in rows:
+            existing.add(program_id)
+            # A program moved to another university changes the old one's counters too
+            self.university_ids.add(university_pk)
+        return existing
+
+    def after_write(self, instances):
+        rows = list(Program.objects.filter(
+            program_id__in=[p.program_id for p in instances]
+        ).values_list('pk', 'university_id'))
+        search.reindex_programs(program_ids=[pk for pk, _ in rows])
+        self.university_ids.update(university_pk for _, university_pk in rows)
+
+
+class CoordinatorImporter(CatalogImporter):
+    name = 'coordinators'
+    model = Coordinator
+    unique_fields = ('program', 'public_email')
+    parse_row = staticmethod(parse_coordinator)
+    resolved_fields = ('university',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # program_id (public) -> (program pk, university pk)
+        self.programs = {}
+
+    def resolve(self, records):
+        missing = {record['program'] for record in records} - self.programs.keys()
+        if missing:
+            for program_id, pk, university_pk in Program.objects.filter(
+                program_id__in=missing
+            ).values_list('program_id', 'pk', 'university_id'):
+                self.programs[program_id] = (pk, university_pk)
+
+        instances = []
+        for record in records:
+            public_id = record.pop('program')
+            ids = self.programs.get(public_id)
+            if ids is None:
+                self.result.error(f'Program with ID {public_id} does not exist')
+                continue
+            instances.append(_instance(Coordinator, record, program_id=ids[0], university_id=ids[1]))
+        return _dedupe(instances, self.key)
+
+    def key(self, instance):
+        return (instance.program_id, instance.public_email)
+
+    def record_key(self, record):
+        return f"{record['program']}|{record['public_email']}"
+
+    def deactivate(self, keys):
+        wanted = {tuple(key.split('|', 1)) for key in keys}
+        rows = Coordinator.objects.filter(
+            program__program_id__in={program_id for program_id, _ in wanted}, is_active=True
+        ).values_list('pk', 'program__program_id', 'public_email', 'program_id', 'university_id')
+        matched = [row for row in rows if (row[1], row[2]) in wanted]
+        if self.dry_run or not matched:
+            return len(matched)
+        self.program_ids.update(row[3] for row in matched)
+        self.university_ids.update(row[4] for row in matched)
+        return Coordinator.objects.filter(pk__in=[row[0] for row in matched]).update(is_active=False)
+
+    def existing_keys(self, instances):
+        return set(Coordinator.objects.filter(
+            program_id__in={c.program_id for c in instances},
+            public_email__in={c.public_email for c in instances},
+        ).values_list('program_id', 'public_email'))
+
+    def after_write(self, instances):
+        for coordinator in instances:
+            self.program_ids.add(coordinator.program_id)
+            self.university_ids.add(coordinator.university_id)
+
+
+IMPORTERS = {
+    'universities': UniversityImporter,
+    'programs': ProgramImporter,
+    'coordinators': CoordinatorImporter,
+}
+
+
+def _init_worker():
+    # Needed when workers are spawned rather than forked
+    django.setup()
+
+
+def _write_range(model_name, path, start, end, fieldnames, batch_size):
+    """Parse and write one byte range in a worker process; counters are left to the caller"""
+    importer = IMPORTERS[model_name](batch_size=batch_size)
+    importer.add_parsed(*parse_range(model_name, path, start, end, fieldnames))
+    result = importer.result
+    return (
+        result.rows, result.created, result.updated, result.errors, result.skipped,
+        importer.university_ids, importer.program_ids,
+    )
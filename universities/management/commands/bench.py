@@ -0,0 +1,241 @@
+import json
+import logging
+import platform
+import subprocess
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from accounts import synthetic_data
+from uniworld_backend import benchmarks, query_budget
+from universities.models import University, Program
+
+
+BENCH_USERNAME = 'bench_user'
+BENCH_PASSWORD = 'bench-password-123'
+METRICS_TOKEN = 'bench-metrics-token'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every endpoint: p50/p95/p99 latency, queries per request and response bytes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=0.01,
+            help='Synthetic dataset scale seeded into the test database (default: 0.01, see populate_sample_data)'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Seed of the synthetic dataset (default: 42)')
+        parser.add_argument('--iterations', type=int, default=30, help='Timed requests per endpoint (default: 30)')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint (default: 3)')
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            help='Only run the named endpoint(s); may be repeated'
+        )
+        parser.add_argument('--output', help='Write the JSON results to this file')
+        parser.add_argument('--compare', help='Results file of an earlier run to compare against')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=10.0,
+            help='Latency increase in percent reported as a regression by --compare (default: 10)'
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error when --compare finds regressions'
+        )
+        parser.add_argument(
+            '--use-existing-db',
+            action='store_true',
+            help=(
+                'Benchmark the configured database as is instead of a freshly seeded test database. '
+                'Endpoints that write data (register, login) are skipped, and the benchmark user and '
+                'its sessions are removed afterwards'
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        endpoints = benchmarks.ENDPOINTS
+        if options['endpoint']:
+            known = {endpoint.name for endpoint in endpoints}
+            unknown = sorted(set(options['endpoint']) - known)
+            if unknown:
+                raise CommandError(f'Unknown endpoint(s): {", ".join(unknown)}')
+            endpoints = [endpoint for endpoint in endpoints if endpoint.name in options['endpoint']]
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        skipped = dict(benchmarks.SKIPPED)
+        if options['use_existing_db']:
+            for endpoint in endpoints:
+                if endpoint.writes:
+                    skipped[endpoint.url_name] = 'writes to the database (--use-existing-db)'
+                    self.stdout.write(f'Skipping {endpoint.name}: writes to the database')
+            endpoints = [endpoint for endpoint in endpoints if not endpoint.writes]
+
+        uncovered = benchmarks.check_coverage()
+        for name in uncovered:
+            self.stdout.write(self.style.WARNING(f'URL {name} has no benchmark or skip reason'))
+
+        # Per-request query log lines would drown the report; budget
+        # warnings still come through
+        query_logger = logging.getLogger(query_budget.__name__)
+        level = query_logger.level
+        query_logger.setLevel(logging.WARNING)
+
+        setup_test_environment()
+        old_name = None
+        if not options['use_existing_db']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            sizes = self.seed(options) if old_name is not None else None
+            with override_settings(
+                ROOT_URLCONF=benchmarks.URLCONF, DEBUG=False, QUERY_BUDGET_STRICT=False, METRICS_TOKEN=METRICS_TOKEN
+            ):
+                results = self.run(endpoints, options)
+        finally:
+            query_logger.setLevel(level)
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': self.metadata(options, sizes),
+            'results': results,
+            'skipped': skipped,
+            'unbenchmarked': uncovered,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if baseline is not None:
+            self.report_comparison(baseline, report, options)
+
+    def seed(self, options):
+        sizes = synthetic_data.scaled_sizes(options['scale'])
+        self.stdout.write(
+            f"Seeding {sizes['universities']} universities, {sizes['programs']} programs, "
+            f"{sizes['coordinators']} coordinators and {sizes['email_logs']} email logs..."
+        )
+        started = time.monotonic()
+        synthetic_data.generate(sizes, seed=options['seed'])
+        self.stdout.write(f'Seeded in {time.monotonic() - started:.1f}s')
+        return sizes
+
+    def fixtures(self):
+        """The benchmark user, whether this run created it, and the values substituted into the endpoints"""
+        university = University.objects.order_by('pk').first()
+        program = Program.objects.filter(is_active=True).order_by('pk').first()
+        if university is None or program is None:
+            raise CommandError('The database has no universities or programs to benchmark')
+        User = get_user_model()
+        user = User.objects.filter(username=BENCH_USERNAME).first()
+        created = user is None
+        if created:
+            user = User.objects.create_user(
+                username=BENCH_USERNAME, email=f'{BENCH_USERNAME}@example.com', password=BENCH_PASSWORD
+            )
+        return user, created, {
+            'run': int(time.time()),
+            'user': user.pk,
+            'user_email': user.email,
+            'user_password': BENCH_PASSWORD,
+            'metrics_token': METRICS_TOKEN,
+            'university': university.pk,
+            'country': university.country,
+            'program': program.pk,
+            'program_id': program.program_id,
+            'search_term': program.field_of_study.split()[0].lower(),
+        }
+
+    def run(self, endpoints, options):
+        user, created, fixtures = self.fixtures()
+        try:
+            return self.run_endpoints(endpoints, options, user, fixtures)
+        finally:
+            if created:
+                user.delete()
+
+    def run_endpoints(self, endpoints, options, user, fixtures):
+        results = {}
+        for endpoint in endpoints:
+            # A fresh client per endpoint so sessions (e.g. from the login
+            # endpoint) do not leak into the next one; failing views are
+            # reported through their status instead of aborting the run
+            client = Client(raise_request_exception=False)
+            if endpoint.auth:
+                client.force_login(user)
+            try:
+                run = benchmarks.run_endpoint(
+                    endpoint, client, fixtures, options['iterations'], options['warmup']
+                )
+            finally:
+                # Deletes the session row
+                client.logout()
+            summary = benchmarks.summarize(run)
+            results[endpoint.name] = summary
+            line = (
+                f"{endpoint.name:<28} p50 {summary['p50_ms']:>9.2f}ms  p95 {summary['p95_ms']:>9.2f}ms  "
+                f"p99 {summary['p99_ms']:>9.2f}ms  {summary['queries']:>4} queries  {summary['bytes']:>10} bytes"
+            )
+            if any(status >= 400 for status in summary['status']):
+                self.stdout.write(self.style.WARNING(f"{line}  status {summary['status']}"))
+            elif summary['over_budget']:
+                self.stdout.write(self.style.WARNING(f"{line}  over budget of {summary['query_budget']}"))
+            else:
+                self.stdout.write(line)
+        return results
+
+    def metadata(self, options, sizes):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'scale': None if options['use_existing_db'] else options['scale'],
+            'seed': None if options['use_existing_db'] else options['seed'],
+            'sizes': sizes,
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+        }
+
+    def report_comparison(self, baseline, report, options):
+        base_commit = (baseline.get('meta') or {}).get('commit') or 'baseline'
+        self.stdout.write(f'\nCompared with {base_commit[:12]}:')
+        rows, regressions = benchmarks.compare(baseline, report, options['threshold'] / 100)
+        for name, metric, old, new, change in rows:
+            line = f'{name:<28} {metric:<8} {old:>12} -> {new:<12} ({change:+.1%})'
+            if (name, metric, old, new, change) in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if not rows:
+            self.stdout.write('No changes')
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}')
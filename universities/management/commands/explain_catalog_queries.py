@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import QueryDict
+from universities import facets
+from universities.models import University, Program, Coordinator
+from uniworld_backend import pagination, views as api_views
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the queries behind the catalog endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='Run EXPLAIN ANALYZE (PostgreSQL only)')
+        parser.add_argument('--search', type=str, action='append', default=[],
+                            help='Extra /api/search/ query string to explain, e.g. "country=Italy&language=English"')
+        parser.add_argument('--sql', action='store_true', help='Also print the SQL of each query')
+
+    def get_queries(self, extra_searches):
+        """Representative (label, queryset) pairs matching the endpoint query shapes"""
+        # Rows fetched per keyset page (one extra to detect the next page)
+        page = pagination.default_page_size() + 1
+        program_id = Program.objects.values_list('program_id', flat=True).first() or 'UNKNOWN'
+        program_pk = Program.objects.values_list('pk', flat=True).first() or 0
+
+        queries = [
+            ('universities-api page', University.objects.order_by(*api_views.UNIVERSITY_ORDERING)[:page]),
+            ('programs-api page', Program.objects.select_related('university').order_by(*api_views.PROGRAM_ORDERING)[:page]),
+            ('coordinators-api ?program_id', Coordinator.objects.select_related('university', 'program').filter(program__program_id=program_id)),
+            ('countries-api', University.objects.values_list('country', flat=True).distinct().order_by('country')),
+            ('fields-of-study-api', Program.objects.values_list('field_of_study', flat=True).distinct().order_by('field_of_study')),
+            ('drf program-list (active, level + field)', Program.objects.filter(is_active=True, degree_level='master', field_of_study='Computer Science').select_related('university')),
+            ('drf coordinators-by-program', Coordinator.objects.filter(program_id=program_pk, is_active=True)),
+        ]
+
+        searches = [
+            'country=Italy&degree_level=master',
+            'field_of_study=Computer Science&degree_level=master',
+            'language=English&degree_level=master',
+            'q=computer science',
+        ] + extra_searches
+        for search in searches:
+            params = QueryDict(search)
+            ordering = api_views.SEARCH_RANK_ORDERING if params.get('q') else api_views.PROGRAM_ORDERING
+            programs = api_views.filter_search_programs(params).order_by(*ordering)
+            queries.append((f'search-api ?{search}', programs[:page]))
+
+        base = QueryDict('country=Italy&degree_level=master')
+        for name in facets.FACET_FIELDS:
+            queryset = api_views.filter_search_programs(base, exclude=name)
+            queries.append((f'search-api facet {name}', facets.facet_queryset(queryset, name)))
+
+        return queries
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                self.stdout.write(self.style.WARNING('--analyze is only supported on PostgreSQL, ignoring'))
+            else:
+                explain_options['analyze'] = True
+
+        for label, queryset in self.get_queries(options['search']):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            if options['sql']:
+                self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
@@ -0,0 +1,55 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from universities.exporters import DEFAULT_CHUNK_SIZE, EXPORT_MODELS, export_model
+from universities.import_sources import UnsupportedFormat
+
+
+EXTENSIONS = {
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'parquet': '.parquet',
+}
+
+
+class Command(BaseCommand):
+    help = 'Export the catalog in the layout import_csv reads (CSV, JSON lines or Parquet)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', type=str, required=True, choices=EXPORT_MODELS + ('catalog',),
+                            help='Model to export; "catalog" exports universities, programs and coordinators')
+        parser.add_argument('--output', type=str, required=True,
+                            help='Output file (format and .gz/.zst compression from the extension, "-" for stdout); '
+                                 'a directory with --model catalog')
+        parser.add_argument('--format', type=str, choices=tuple(EXTENSIONS),
+                            help='Output format (default: from the extension; csv for --model catalog)')
+        parser.add_argument('--compress', type=str, choices=('gzip', 'zstd'),
+                            help='Compression of the files written with --model catalog')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Rows fetched per database round trip (default {DEFAULT_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+
+        if options['model'] == 'catalog':
+            fmt = options['format'] or 'csv'
+            suffix = EXTENSIONS[fmt] + {None: '', 'gzip': '.gz', 'zstd': '.zst'}[options['compress']]
+            os.makedirs(options['output'], exist_ok=True)
+            targets = [
+                (model_name, os.path.join(options['output'], model_name + suffix))
+                for model_name in ('universities', 'programs', 'coordinators')
+            ]
+        else:
+            fmt = options['format']
+            targets = [(options['model'], options['output'])]
+
+        for model_name, path in targets:
+            try:
+                count, elapsed = export_model(model_name, path, fmt=fmt, chunk_size=chunk_size)
+            except UnsupportedFormat as e:
+                raise CommandError(str(e))
+            if path != '-':
+                rate = count / elapsed if elapsed else 0
+                self.stderr.write(
+                    self.style.SUCCESS(f'Exported {count} {model_name} to {path} in {elapsed:.1f}s ({rate:.0f} rows/s)')
+                )
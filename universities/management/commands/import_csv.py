@@ -1,10 +1,19 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from universities.models import University, Program, Coordinator
+from universities.catalog_version import bump_catalog_version
+from universities.importers import DEFAULT_BATCH_SIZE, IMPORTERS
+from universities.import_rows import DEFAULT_CHUNK_BYTES
+from universities.import_sources import FORMATS, UnsupportedFormat, detect_format
 from payments.models import Subscription, Payment, EmailLog
 import csv
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+
+
+# Seconds between progress lines of --bulk imports (every batch with -v 2)
+PROGRESS_INTERVAL = 5
 
 
 class Command(BaseCommand):
@@ -13,8 +22,27 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--file', type=str, help='CSV file to import')
         parser.add_argument('--model', type=str, help='Model to import to')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Batched upsert import (universities, programs and coordinators only)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Rows per batch in --bulk mode (default {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Parse the file in N processes (implies --bulk; no multi-line quoted fields)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_BYTES // (1024 * 1024),
+                            help='Size in MB of the file chunks handed to each worker')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only write rows changed since the last import and deactivate missing ones (implies --bulk)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the incremental delta without writing anything (implies --incremental)')
+        parser.add_argument('--keep-missing', action='store_true',
+                            help='Do not deactivate records missing from the file (partial files)')
+        parser.add_argument('--format', type=str, choices=FORMATS,
+                            help='Input format (default: from the extension; .gz/.zst compression is detected)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint of an interrupted --bulk import of this file and start over')
 
     def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
         file_path = options.get('file')
         model_name = options.get('model')
 
@@ -31,7 +59,36 @@ class Command(BaseCommand):
             return
 
         try:
-            if model_name == 'universities':
+            fmt, compression = detect_format(file_path, options['format'])
+        except UnsupportedFormat as e:
+            self.stdout.write(self.style.ERROR(str(e)))
+            return
+        options['format'] = fmt
+
+        if options['workers'] > 0 or options['incremental'] or options['dry_run'] or fmt != 'csv' or compression:
+            # Everything but plain per-row CSV imports goes through the batched importer
+            options['bulk'] = True
+
+        if options['workers'] > 0 and (fmt != 'csv' or compression):
+            self.stdout.write(
+                self.style.ERROR('--workers needs an uncompressed CSV file')
+            )
+            return
+
+        if options['bulk'] and model_name not in IMPORTERS:
+            self.stdout.write(
+                self.style.ERROR(f'Batched imports (--bulk, --workers, --incremental, non-CSV formats) are not supported for {model_name}')
+            )
+            return
+
+        # Per-row imports commit every row: invalidate the conditional GET
+        # caches once at the end, also after an error. --bulk imports do
+        # this themselves
+        bump = not options['bulk'] and model_name in IMPORTERS
+        try:
+            if options['bulk']:
+                self.import_bulk(file_path, model_name, options)
+            elif model_name == 'universities':
                 self.import_universities(file_path)
             elif model_name == 'programs':
                 self.import_programs(file_path)
@@ -47,10 +104,77 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.ERROR(f'Unknown model: {model_name}')
                 )
+                return
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'Error importing data: {str(e)}')
             )
+        finally:
+            if bump:
+                bump_catalog_version()
+
+    def import_bulk(self, file_path, model_name, options):
+        """Run a batched import, bumping the catalog version if it wrote anything"""
+        importer = IMPORTERS[model_name](
+            batch_size=max(1, options['batch_size']),
+            incremental=options['incremental'],
+            dry_run=options['dry_run'],
+            deactivate_missing=not options['keep_missing'],
+        )
+        workers = options['workers']
+        last_report = [0.0]
+
+        def progress(result):
+            # Every batch with -v 2, otherwise at most every PROGRESS_INTERVAL seconds
+            now = time.monotonic()
+            if self.verbosity < 1 or (self.verbosity < 2 and now - last_report[0] < PROGRESS_INTERVAL):
+                return
+            last_report[0] = now
+            line = f'{result.rows} rows ({result.rate:.0f} rows/s)'
+            if result.progress is not None:
+                line += f', {result.progress:.1%} of file'
+            if result.eta is not None:
+                line += f', ETA {timedelta(seconds=round(result.eta))}'
+            self.stdout.write(line)
+
+        try:
+            if workers > 0:
+                result = importer.run_parallel(
+                    model_name, file_path, workers,
+                    chunk_bytes=max(1, options['chunk_size']) * 1024 * 1024, progress=progress
+                )
+            else:
+                result = importer.run_file(
+                    file_path, progress=progress, resume=not options['restart'], fmt=options['format']
+                )
+        finally:
+            written = importer.result
+            if not importer.dry_run and (written.created or written.updated or written.deactivated):
+                # Batches are committed one by one: invalidate the conditional
+                # GET caches once, also when the import failed part way
+                bump_catalog_version()
+
+        if result.resumed_rows:
+            self.stdout.write(f'Resumed an interrupted import after row {result.resumed_rows}')
+        for error in result.errors:
+            self.stdout.write(self.style.ERROR(error))
+        if result.skipped > len(result.errors):
+            self.stdout.write(self.style.ERROR(f'... and {result.skipped - len(result.errors)} more errors'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {result.rows} {model_name} rows in {result.elapsed:.1f}s '
+                f'({result.rate:.0f} rows/s): {result.created} created, '
+                f'{result.updated} updated, {result.skipped} skipped'
+            )
+        )
+        if importer.incremental:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{"Dry run: " if importer.dry_run else ""}{result.created} inserts, '
+                    f'{result.updated} updates, {result.unchanged} unchanged, '
+                    f'{result.deactivated} deactivations ({result.missing} missing from the file)'
+                )
+            )
 
     def import_universities(self, file_path):
         with open(file_path, 'r', encoding='utf-8') as file:
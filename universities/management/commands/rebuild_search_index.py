@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from universities import search
+from universities.models import Program
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for programs'
+
+    def handle(self, *args, **options):
+        if not search.is_supported(connection):
+            self.stdout.write(
+                self.style.WARNING(f'Full-text search is not supported on {connection.vendor}, nothing to do')
+            )
+            return
+
+        with transaction.atomic():
+            search.create_index(connection)
+            search.reindex_programs(conn=connection)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {Program.objects.count()} programs')
+        )
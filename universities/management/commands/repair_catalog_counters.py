@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from universities.catalog_version import bump_catalog_version
+from universities.counters import recount_universities, recount_programs
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized program and coordinator counters'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            universities = recount_universities()
+            programs = recount_programs()
+            if universities or programs:
+                # Cached and conditional responses carry the old counts
+                bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Corrected the counters of {universities} universities and {programs} programs')
+        )
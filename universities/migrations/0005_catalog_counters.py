@@ -0,0 +1,52 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _active_count(model, fk):
+    counts = (
+        model.objects.filter(**{fk: OuterRef('pk'), 'is_active': True})
+        .order_by()
+        .values(fk)
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def populate_counters(apps, schema_editor):
+    University = apps.get_model('universities', 'University')
+    Program = apps.get_model('universities', 'Program')
+    Coordinator = apps.get_model('universities', 'Coordinator')
+
+    University.objects.update(
+        programs_count=_active_count(Program, 'university'),
+        coordinators_count=_active_count(Coordinator, 'university'),
+    )
+    Program.objects.update(coordinators_count=_active_count(Coordinator, 'program'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('universities', '0004_program_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='university',
+            name='programs_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='university',
+            name='coordinators_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='program',
+            name='coordinators_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
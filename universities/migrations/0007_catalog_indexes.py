@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('universities', '0006_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='university',
+            index=models.Index(fields=['country', 'name'], name='universities_country_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='program',
+            index=models.Index(fields=['field_of_study', 'degree_level'], name='programs_field_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='program',
+            index=models.Index(fields=['language', 'degree_level'], name='programs_language_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='program',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['degree_level', 'field_of_study', 'language'], name='programs_active_filters_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coordinator',
+            index=models.Index(fields=['program', 'is_active'], name='coord_program_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coordinator',
+            index=models.Index(fields=['university', 'is_active'], name='coord_university_active_idx'),
+        ),
+    ]
@@ -1,7 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 import uuid
 
 
+def adjust_counter(model, pk, field, delta):
+    """Atomically add delta to a denormalized counter column of one row"""
+    if pk is not None and delta:
+        model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
 class University(models.Model):
     """Model representing a university"""
     
@@ -19,6 +27,11 @@ class University(models.Model):
     ranking_world = models.IntegerField(blank=True, null=True)
     ranking_country = models.IntegerField(blank=True, null=True)
     
+    # Denormalized counters of active programs and coordinators, maintained by
+    # Program/Coordinator saves and deletes (repair with repair_catalog_counters)
+    programs_count = models.PositiveIntegerField(default=0, editable=False)
+    coordinators_count = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -26,35 +39,22 @@ class University(models.Model):
         db_table = 'universities'
         ordering = ['name']
         verbose_name_plural = 'Universities'
+        indexes = [
+            # Country filter / country list, ordered by name
+            models.Index(fields=['country', 'name'], name='universities_country_name_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.university_id:
             # Generate a unique university_id based on name and country
-            name_slug = ''.join(c.upper() for c in self.name if c.isalnum())[:6]
-            country_slug = ''.join(c.upper() for c in self.country if c.isalnum())[:3]
-            base_id = f"{name_slug}_{country_slug}"
-            
-            # Ensure uniqueness
-            counter = 1
-            self.university_id = f"{base_id}_{counter:02d}"
-            while University.objects.filter(university_id=self.university_id).exists():
-                counter += 1
-                self.university_id = f"{base_id}_{counter:02d}"
+            from .ids import allocate_ids, university_base_id
+            base_id = university_base_id(self.name, self.country)
+            self.university_id = allocate_ids(University, 'university_id', base_id)[0]
         
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.name} - {self.city}, {self.country}"
-    
-    @property
-    def programs_count(self):
-        """Get the number of programs offered by this university"""
-        return self.programs.count()
-    
-    @property
-    def coordinators_count(self):
-        """Get the number of coordinators for this university"""
-        return self.coordinators.count()
 
 
 class Program(models.Model):
@@ -92,6 +92,9 @@ class Program(models.Model):
     brochure_url = models.URLField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     
+    # Denormalized counter of active coordinators (see University counters)
+    coordinators_count = models.PositiveIntegerField(default=0, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -99,30 +102,64 @@ class Program(models.Model):
         db_table = 'programs'
         ordering = ['university__name', 'name']
         unique_together = ['university', 'name']
+        indexes = [
+            # /api/search/ exact filters and the fields of study list
+            models.Index(fields=['field_of_study', 'degree_level'], name='programs_field_level_idx'),
+            models.Index(fields=['language', 'degree_level'], name='programs_language_level_idx'),
+            # DRF list/search views always filter on is_active=True
+            models.Index(
+                fields=['degree_level', 'field_of_study', 'language'],
+                condition=Q(is_active=True),
+                name='programs_active_filters_idx',
+            ),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.program_id:
             # Generate a unique program_id based on university and program name
-            university_prefix = self.university.university_id[:6] if self.university.university_id != 'TEMP_ID' else 'UNI'
-            program_slug = ''.join(c.upper() for c in self.name if c.isalnum())[:6]
-            base_id = f"{university_prefix}_{program_slug}"
-            
-            # Ensure uniqueness
-            counter = 1
-            self.program_id = f"{base_id}_{counter:02d}"
-            while Program.objects.filter(program_id=self.program_id).exists():
-                counter += 1
-                self.program_id = f"{base_id}_{counter:02d}"
+            from .ids import allocate_ids, program_base_id
+            base_id = program_base_id(self.university_public_id(), self.name)
+            self.program_id = allocate_ids(Program, 'program_id', base_id)[0]
         
-        super().save(*args, **kwargs)
+        previous = self._previous_counted_state()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            current = self._counted_state()
+            if previous != current:
+                if previous and previous[1]:
+                    adjust_counter(University, previous[0], 'programs_count', -1)
+                if current[1]:
+                    adjust_counter(University, current[0], 'programs_count', 1)
+        self._counted = current
+    
+    def university_public_id(self):
+        """university_id string of the parent, without loading the whole University"""
+        if Program.university.is_cached(self):
+            return self.university.university_id
+        return University.objects.filter(pk=self.university_id).values_list('university_id', flat=True).first()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'university_id' in instance.__dict__ and 'is_active' in instance.__dict__:
+            instance._counted = instance._counted_state()
+        return instance
+    
+    def _counted_state(self):
+        """State that determines which University.programs_count includes this program"""
+        return (self.university_id, self.is_active)
+    
+    def _previous_counted_state(self):
+        """Counted state as stored in the database, None for a new program"""
+        if self._state.adding:
+            return None
+        previous = getattr(self, '_counted', None)
+        if previous is None:
+            previous = Program.objects.filter(pk=self.pk).values_list('university_id', 'is_active').first()
+        return previous
     
     def __str__(self):
         return f"{self.name} - {self.university.name}"
-    
-    @property
-    def coordinators_count(self):
-        """Get the number of coordinators for this program"""
-        return self.coordinators.count()
 
 
 class Coordinator(models.Model):
@@ -160,6 +197,108 @@ class Coordinator(models.Model):
         db_table = 'coordinators'
         ordering = ['university__name', 'program__name', 'name']
         unique_together = ['program', 'public_email']
+        indexes = [
+            # Active coordinators per program / university (lists and counter recounts)
+            models.Index(fields=['program', 'is_active'], name='coord_program_active_idx'),
+            models.Index(fields=['university', 'is_active'], name='coord_university_active_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        previous = self._previous_counted_state()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            current = self._counted_state()
+            if previous != current:
+                if previous and previous[2]:
+                    adjust_counter(University, previous[0], 'coordinators_count', -1)
+                    adjust_counter(Program, previous[1], 'coordinators_count', -1)
+                if current[2]:
+                    adjust_counter(University, current[0], 'coordinators_count', 1)
+                    adjust_counter(Program, current[1], 'coordinators_count', 1)
+        self._counted = current
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(name in instance.__dict__ for name in ('university_id', 'program_id', 'is_active')):
+            instance._counted = instance._counted_state()
+        return instance
+    
+    def _counted_state(self):
+        """State that determines which counters include this coordinator"""
+        return (self.university_id, self.program_id, self.is_active)
+    
+    def _previous_counted_state(self):
+        """Counted state as stored in the database, None for a new coordinator"""
+        if self._state.adding:
+            return None
+        previous = getattr(self, '_counted', None)
+        if previous is None:
+            previous = Coordinator.objects.filter(pk=self.pk).values_list(
+                'university_id', 'program_id', 'is_active'
+            ).first()
+        return previous
+    
+    def __str__(self):
+        return f"{self.name} - {self.program.name}"
+
+
+class IdSequence(models.Model):
+    """Last counter handed out per university_id/program_id base (see universities.ids)"""
+    
+    prefix = models.CharField(max_length=64, primary_key=True)
+    last_value = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'id_sequences'
+    
+    def __str__(self):
+        return f"{self.prefix}: {self.last_value}"
+
+
+class ImportFingerprint(models.Model):
+    """Content hash of the last imported CSV row per record key (import_csv --incremental)"""
+    
+    model_name = models.CharField(max_length=50)
+    key = models.CharField(max_length=300)
+    # Empty once the record has been deactivated for missing from an import
+    digest = models.CharField(max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'import_fingerprints'
+        unique_together = ['model_name', 'key']
+    
+    def __str__(self):
+        return f"{self.model_name}:{self.key}"
+
+
+class ImportCheckpoint(models.Model):
+    """Last committed position of an unfinished bulk import, so a rerun of the same file resumes"""
+    
+    model_name = models.CharField(max_length=50)
+    file_fingerprint = models.CharField(max_length=64)
+    file_name = models.CharField(max_length=255)
+    byte_offset = models.PositiveBigIntegerField(default=0)
+    rows = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'import_checkpoints'
+        unique_together = ['model_name', 'file_fingerprint']
+    
+    def __str__(self):
+        return f"{self.model_name} {self.file_name} @ {self.byte_offset}"
+
+
+class CatalogVersion(models.Model):
+    """Single-row counter bumped whenever universities, programs or coordinators change"""
+    
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'catalog_version'
     
     def __str__(self):
-        return f"{self.name} - {self.program.name}"
\ No newline at end of file
+        return f"Catalog version {self.version}"
@@ -0,0 +1,239 @@
+"""
+Full-text search index for programs.
+
+Programs are indexed in a side table kept in sync with Program/University
+saves (see universities.signals):
+
+- SQLite: an FTS5 virtual table ``programs_fts`` ranked with bm25()
+- PostgreSQL: a ``programs_search`` table holding a weighted tsvector with a
+  GIN index, ranked with ts_rank_cd()
+
+The ``search_rank`` annotation is "lower is better" on every backend so
+callers can always order on it ascending. Other backends (or a database where
+the index has not been created yet) fall back to the old icontains filter.
+"""
+
+import re
+
+from django.db import DatabaseError, connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+SQLITE_INDEX_TABLE = 'programs_fts'
+POSTGRES_INDEX_TABLE = 'programs_search'
+
+# Column weights used for ranking: name, field of study, description, university name
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+
+# Maximum number of terms taken from a user query
+MAX_QUERY_TERMS = 8
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Database aliases on which the index table is known to exist
+_ready_aliases = set()
+
+
+def is_supported(conn=None):
+    """Check if the given connection has a full-text backend implemented"""
+    conn = conn or connection
+    return conn.vendor in ('sqlite', 'postgresql')
+
+
+def create_index(conn=None):
+    """Create the search index table for the connection's backend"""
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_INDEX_TABLE} USING fts5("
+                "name, field_of_study, description, university_name, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        elif conn.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {POSTGRES_INDEX_TABLE} ("
+                "program_id bigint PRIMARY KEY REFERENCES programs(id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX_TABLE}_document_idx "
+                f"ON {POSTGRES_INDEX_TABLE} USING GIN (document)"
+            )
+
+
+def drop_index(conn=None):
+    """Drop the search index table"""
+    conn = conn or connection
+    _ready_aliases.discard(conn.alias)
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_INDEX_TABLE}")
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"DROP TABLE IF EXISTS {POSTGRES_INDEX_TABLE}")
+
+
+def _where_clause(program_ids=None, university_id=None):
+    """Build the WHERE clause selecting the programs to (re)index"""
+    if program_ids is not None:
+        program_ids = list(program_ids)
+        if not program_ids:
+            return None, []
+        placeholders = ', '.join(['%s'] * len(program_ids))
+        return f"WHERE p.id IN ({placeholders})", program_ids
+    if university_id is not None:
+        return "WHERE p.university_id = %s", [university_id]
+    return "", []
+
+
+def reindex_programs(program_ids=None, university_id=None, conn=None):
+    """
+    Rebuild index entries from the programs table.
+
+    Args:
+        program_ids: Only reindex these programs
+        university_id: Only reindex programs of this university (pk)
+
+    With neither argument the whole index is rebuilt.
+    """
+    conn = conn or connection
+    if not is_supported(conn):
+        return
+
+    where, params = _where_clause(program_ids, university_id)
+    if where is None:
+        return
+
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            if where:
+                cursor.execute(
+                    f"DELETE FROM {SQLITE_INDEX_TABLE} WHERE rowid IN (SELECT p.id FROM programs p {where})",
+                    params
+                )
+            else:
+                cursor.execute(f"DELETE FROM {SQLITE_INDEX_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {SQLITE_INDEX_TABLE} "
+                "(rowid, name, field_of_study, description, university_name) "
+                "SELECT p.id, p.name, p.field_of_study, COALESCE(p.description, ''), u.name "
+                f"FROM programs p JOIN universities u ON u.id = p.university_id {where}",
+                params
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_INDEX_TABLE} (program_id, document) "
+                "SELECT p.id, "
+                "setweight(to_tsvector('simple', COALESCE(p.name, '')), 'A') || "
+                "setweight(to_tsvector('simple', COALESCE(p.field_of_study, '')), 'B') || "
+                "setweight(to_tsvector('simple', COALESCE(u.name, '')), 'B') || "
+                "setweight(to_tsvector('simple', COALESCE(p.description, '')), 'D') "
+                f"FROM programs p JOIN universities u ON u.id = p.university_id {where} "
+                "ON CONFLICT (program_id) DO UPDATE SET document = EXCLUDED.document",
+                params
+            )
+
+
+def remove_programs(program_ids, conn=None):
+    """Remove index entries for deleted programs"""
+    conn = conn or connection
+    program_ids = list(program_ids)
+    if not program_ids or not is_supported(conn):
+        return
+
+    placeholders = ', '.join(['%s'] * len(program_ids))
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {SQLITE_INDEX_TABLE} WHERE rowid IN ({placeholders})", program_ids)
+        else:
+            cursor.execute(f"DELETE FROM {POSTGRES_INDEX_TABLE} WHERE program_id IN ({placeholders})", program_ids)
+
+
+def index_exists(conn=None):
+    """Check if the search index table has been created"""
+    conn = conn or connection
+    if not is_supported(conn):
+        return False
+    if conn.alias in _ready_aliases:
+        return True
+    table = SQLITE_INDEX_TABLE if conn.vendor == 'sqlite' else POSTGRES_INDEX_TABLE
+    try:
+        with conn.cursor() as cursor:
+            exists = table in conn.introspection.table_names(cursor)
+    except DatabaseError:
+        return False
+    if exists:
+        _ready_aliases.add(conn.alias)
+    return exists
+
+
+def query_terms(text):
+    """Split user input into search terms, dropping any query syntax"""
+    return _TOKEN_RE.findall(text or '')[:MAX_QUERY_TERMS]
+
+
+def build_match_query(text, vendor='sqlite'):
+    """
+    Build a safe full-text query from user input.
+
+    Every term must match (AND) and terms are treated as prefixes, so
+    "comp sci" finds "Computer Science" while the user is still typing.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return ''
+    if vendor == 'postgresql':
+        return ' & '.join(f"{term.lower()}:*" for term in terms)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _icontains_filter(queryset, text):
+    """Fallback filter used when no full-text index is available"""
+    return queryset.filter(
+        Q(name__icontains=text) |
+        Q(field_of_study__icontains=text) |
+        Q(description__icontains=text) |
+        Q(university__name__icontains=text)
+    )
+
+
+def filter_programs(queryset, text):
+    """
+    Restrict a Program queryset to full-text matches of ``text``.
+
+    Matching programs are annotated with ``search_rank`` (lower is better).
+    """
+    conn = connection
+    if not query_terms(text) or not index_exists(conn):
+        return _icontains_filter(queryset, text).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    match = build_match_query(text, conn.vendor)
+    table = queryset.model._meta.db_table
+
+    if conn.vendor == 'sqlite':
+        weights = ', '.join(str(w) for w in SQLITE_WEIGHTS)
+        matches = RawSQL(
+            f"SELECT rowid FROM {SQLITE_INDEX_TABLE} WHERE {SQLITE_INDEX_TABLE} MATCH %s",
+            (match,)
+        )
+        rank = RawSQL(
+            f"SELECT bm25({SQLITE_INDEX_TABLE}, {weights}) FROM {SQLITE_INDEX_TABLE} "
+            f"WHERE {SQLITE_INDEX_TABLE} MATCH %s AND {SQLITE_INDEX_TABLE}.rowid = {table}.id",
+            (match,)
+        )
+    else:
+        matches = RawSQL(
+            f"SELECT program_id FROM {POSTGRES_INDEX_TABLE} "
+            "WHERE document @@ to_tsquery('simple', %s)",
+            (match,)
+        )
+        rank = RawSQL(
+            f"SELECT -ts_rank_cd(document, to_tsquery('simple', %s)) FROM {POSTGRES_INDEX_TABLE} "
+            f"WHERE {POSTGRES_INDEX_TABLE}.program_id = {table}.id",
+            (match,)
+        )
+
+    return queryset.filter(id__in=matches).annotate(search_rank=rank)
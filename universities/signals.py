@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .catalog_version import bump_catalog_version
+from .models import University, Program, Coordinator, adjust_counter
+
+
+@receiver(post_save, sender=Program)
+def index_program(sender, instance, raw=False, **kwargs):
+    """Keep the program's search index entry in sync"""
+    if raw:
+        return
+    search.reindex_programs(program_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Program)
+def unindex_program(sender, instance, **kwargs):
+    """Remove a deleted program from the search index"""
+    search.remove_programs([instance.pk])
+
+
+@receiver(post_delete, sender=Program)
+def uncount_program(sender, instance, **kwargs):
+    """Decrement the university's counter when an active program is deleted"""
+    if instance.is_active:
+        adjust_counter(University, instance.university_id, 'programs_count', -1)
+
+
+@receiver(post_delete, sender=Coordinator)
+def uncount_coordinator(sender, instance, **kwargs):
+    """Decrement counters when an active coordinator is deleted"""
+    if instance.is_active:
+        adjust_counter(University, instance.university_id, 'coordinators_count', -1)
+        adjust_counter(Program, instance.program_id, 'coordinators_count', -1)
+
+
+@receiver(post_save, sender=University)
+def reindex_university_programs(sender, instance, created=False, raw=False, **kwargs):
+    """Reindex programs when their university's name may have changed"""
+    if raw or created:
+        return
+    search.reindex_programs(university_id=instance.pk)
+
+
+@receiver(post_save, sender=University)
+@receiver(post_save, sender=Program)
+@receiver(post_save, sender=Coordinator)
+@receiver(post_delete, sender=University)
+@receiver(post_delete, sender=Program)
+@receiver(post_delete, sender=Coordinator)
+def catalog_changed(sender, raw=False, **kwargs):
+    """Bump the catalog version so cached catalog responses are revalidated"""
+    if raw:
+        return
+    bump_catalog_version()
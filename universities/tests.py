@@ -1,3 +1,827 @@
-from django.test import TestCase
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from uniworld_backend import benchmarks, pagination
+
+from . import facets, search
+from .catalog_version import get_catalog_version
+from .exporters import iter_rows
+from .import_rows import byte_ranges
+from .ids import allocate_ids
+from .importers import CoordinatorImporter, ProgramImporter, UniversityImporter
+from .models import Coordinator, IdSequence, ImportCheckpoint, Program, University
+
+
+class BulkImportTests(TestCase):
+    """Batched imports through the CatalogImporter classes"""
+
+    def setUp(self):
+        self.university = University.objects.create(
+            university_id='UNI001', name='University of Turin', country='Italy', city='Turin',
+            logo='university_logos/unito.png',
+        )
+        self.program = Program.objects.create(
+            program_id='PRG001', university=self.university, name='Economics',
+            field_of_study='Economics', degree_level='master', language='English',
+        )
+        self.coordinator = Coordinator.objects.create(
+            university=self.university, program=self.program, name='Anna Rossi',
+            public_email='anna.rossi@unito.it', role='coordinator',
+            phone='+39 011 000000', bio='Coordinator since 2015', title='Prof.',
+        )
+
+    def test_reimported_coordinator_keeps_columns_missing_from_the_file(self):
+        result = CoordinatorImporter().run([{
+            'program_id': 'PRG001', 'first_name': 'Anna', 'last_name': 'Rossi-Bianchi',
+            'email': 'anna.rossi@unito.it', 'role': 'head',
+        }])
+
+        self.assertEqual((result.created, result.updated), (0, 1))
+        coordinator = Coordinator.objects.get(pk=self.coordinator.pk)
+        self.assertEqual(coordinator.name, 'Anna Rossi-Bianchi')
+        self.assertEqual(coordinator.role, 'head')
+        self.assertEqual(coordinator.phone, '+39 011 000000')
+        self.assertEqual(coordinator.bio, 'Coordinator since 2015')
+        self.assertEqual(coordinator.title, 'Prof.')
+
+    def test_reimported_university_keeps_its_logo(self):
+        UniversityImporter().run([{
+            'university_id': 'UNI001', 'name': 'University of Turin', 'country': 'Italy', 'city': 'Torino',
+            'website': '', 'description': '', 'established_year': '1404', 'student_count': '',
+            'ranking_world': '', 'ranking_country': '',
+        }])
+
+        university = University.objects.get(pk=self.university.pk)
+        self.assertEqual(university.city, 'Torino')
+        self.assertEqual(university.established_year, 1404)
+        self.assertEqual(university.logo.name, 'university_logos/unito.png')
+
+    def test_counters_are_recounted_when_an_import_fails(self):
+        def rows():
+            yield {
+                'program_id': 'PRG001', 'first_name': 'Marco', 'last_name': 'Verdi',
+                'email': 'marco.verdi@unito.it', 'role': 'advisor',
+            }
+            raise RuntimeError('Connection to the source lost')
+
+        with self.assertRaises(RuntimeError):
+            CoordinatorImporter(batch_size=1).run(rows())
+
+        # The first batch was committed and is counted
+        self.assertEqual(Program.objects.get(pk=self.program.pk).coordinators_count, 2)
+        self.assertEqual(University.objects.get(pk=self.university.pk).coordinators_count, 2)
+
+    def test_failed_bulk_import_bumps_the_catalog_version(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write('program_id,first_name,last_name,email,role\n')
+            file.write('PRG001,Marco,Verdi,marco.verdi@unito.it,advisor\n')
+            file.write('PRG001,Sara,Neri,sara.neri@unito.it,advisor\n')
+        self.addCleanup(os.remove, file.name)
+
+        resolve = CoordinatorImporter.resolve
+        calls = []
+
+        def failing_resolve(importer, records):
+            calls.append(records)
+            if len(calls) == 2:
+                raise RuntimeError('Database went away')
+            return resolve(importer, records)
+
+        version, _ = get_catalog_version()
+        with mock.patch.object(CoordinatorImporter, 'resolve', failing_resolve):
+            call_command(
+                'import_csv', file=file.name, model='coordinators', bulk=True, batch_size=1, stdout=StringIO()
+            )
+
+        self.assertTrue(Coordinator.objects.filter(public_email='marco.verdi@unito.it').exists())
+        self.assertGreater(get_catalog_version()[0], version)
+
+
+class ImportFileTestCase(TestCase):
+    """import_csv runs on files written to a temporary directory"""
+
+    program_header = 'program_id,university_id,name,field_of_study,degree_level,language,is_active'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.turin = University.objects.create(
+            university_id='UNI001', name='University of Turin', country='Italy', city='Turin',
+        )
+
+    def write(self, name, lines, open_file=open):
+        path = os.path.join(self.directory, name)
+        with open_file(path, 'wt', encoding='utf-8', newline='') as file:
+            file.write(''.join(f'{line}\n' for line in lines))
+        return path
+
+    def program_rows(self, *names):
+        return [f'PRG00{number},UNI001,{name},{name},master,English,true' for number, name in names]
+
+    def import_file(self, path, model='programs', **options):
+        output = StringIO()
+        call_command('import_csv', file=path, model=model, stdout=output, **options)
+        return output.getvalue()
+
+
+class IncrementalImportTests(ImportFileTestCase):
+    """import_csv --incremental"""
+
+    def test_unchanged_rows_are_skipped_and_missing_rows_deactivated(self):
+        rows = self.program_rows((1, 'Economics'), (2, 'Law'), (3, 'History'))
+        self.import_file(self.write('programs.csv', [self.program_header, *rows]), incremental=True)
+        economics = Program.objects.get(program_id='PRG001')
+
+        changed = 'PRG002,UNI001,Law,Criminal Law,master,English,true'
+        output = self.import_file(self.write('programs.csv', [self.program_header, rows[0], changed]), incremental=True)
+
+        self.assertIn('0 inserts, 1 updates, 1 unchanged, 1 deactivations (1 missing from the file)', output)
+        self.assertEqual(Program.objects.get(program_id='PRG001').updated_at, economics.updated_at)
+        self.assertEqual(Program.objects.get(program_id='PRG002').field_of_study, 'Criminal Law')
+        self.assertFalse(Program.objects.get(program_id='PRG003').is_active)
+        self.assertEqual(University.objects.get(pk=self.turin.pk).programs_count, 2)
+
+    def test_dry_run_writes_nothing(self):
+        rows = self.program_rows((1, 'Economics'), (2, 'Law'))
+        self.import_file(self.write('programs.csv', [self.program_header, *rows]), incremental=True)
+        version, _ = get_catalog_version()
+
+        output = self.import_file(self.write('programs.csv', [self.program_header, rows[0]]), dry_run=True)
+
+        self.assertIn('Dry run: 0 inserts, 0 updates, 1 unchanged, 1 deactivations', output)
+        self.assertTrue(Program.objects.get(program_id='PRG002').is_active)
+        self.assertEqual(get_catalog_version()[0], version)
+
+
+class ImportCheckpointTests(ImportFileTestCase):
+    """Bulk imports resumed from the checkpoint of an interrupted run"""
+
+    def setUp(self):
+        super().setUp()
+        self.lines = [
+            self.program_header,
+            *self.program_rows((1, 'Economics'), (2, 'Law'), (3, 'History'), (4, 'Physics')),
+        ]
+
+    def interrupted_import(self, path):
+        """Import path in batches of one row, failing on the third; returns the checkpoint left"""
+        write_batch = ProgramImporter.write_batch
+        calls = []
+
+        def failing_write_batch(importer, records):
+            calls.append(records)
+            if len(calls) == 3:
+                raise RuntimeError('Database went away')
+            return write_batch(importer, records)
+
+        with mock.patch.object(ProgramImporter, 'write_batch', failing_write_batch):
+            output = self.import_file(path, bulk=True, batch_size=1)
+        self.assertIn('Database went away', output)
+        return ImportCheckpoint.objects.get(model_name='programs')
+
+    def resumed_import(self, path, **options):
+        """Import path again; returns the output and the program ids written"""
+        written = []
+        write_batch = ProgramImporter.write_batch
+
+        def recording_write_batch(importer, records):
+            written.extend(record['program_id'] for record in records)
+            return write_batch(importer, records)
+
+        with mock.patch.object(ProgramImporter, 'write_batch', recording_write_batch):
+            output = self.import_file(path, bulk=True, batch_size=1, **options)
+        return output, written
+
+    def assertResumed(self, output, written):
+        self.assertIn('Resumed an interrupted import after row 2', output)
+        self.assertEqual(written, ['PRG003', 'PRG004'])
+        self.assertEqual(Program.objects.count(), 4)
+        self.assertEqual(University.objects.get(pk=self.turin.pk).programs_count, 4)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_csv_import_resumes_from_the_byte_offset(self):
+        path = self.write('programs.csv', self.lines)
+
+        checkpoint = self.interrupted_import(path)
+
+        self.assertEqual(checkpoint.rows, 2)
+        self.assertEqual(checkpoint.byte_offset, len(''.join(f'{line}\n' for line in self.lines[:3]).encode()))
+        self.assertResumed(*self.resumed_import(path))
+
+    def test_compressed_import_resumes_by_skipping_rows(self):
+        path = self.write('programs.csv.gz', self.lines, open_file=gzip.open)
+
+        checkpoint = self.interrupted_import(path)
+
+        self.assertEqual((checkpoint.rows, checkpoint.byte_offset), (2, 0))
+        self.assertResumed(*self.resumed_import(path))
+
+    def test_restart_ignores_the_checkpoint(self):
+        path = self.write('programs.csv', self.lines)
+        self.interrupted_import(path)
+
+        output, written = self.resumed_import(path, restart=True)
+
+        self.assertNotIn('Resumed', output)
+        self.assertEqual(written, ['PRG001', 'PRG002', 'PRG003', 'PRG004'])
+
+
+class ExportImportRoundTripTests(ImportFileTestCase):
+    """export_catalog output read back by import_csv, in every format"""
+
+    def setUp(self):
+        super().setUp()
+        economics = Program.objects.create(
+            program_id='PRG001', university=self.turin, name='Economics', field_of_study='Economics',
+            degree_level='master', language='English', description='Quantitative, "applied" economics',
+            duration_months=24, tuition_fee_euro='2500.50', application_deadline='2025-03-31',
+            start_date='2025-09-15', min_gpa='3.25', ielts_score='6.5', toefl_score=90,
+        )
+        Program.objects.create(
+            program_id='PRG002', university=self.turin, name='Law', field_of_study='Law',
+            degree_level='bachelor', language='Italian', is_active=False,
+        )
+        Coordinator.objects.create(
+            university=self.turin, program=economics, name='Anna Rossi', public_email='anna@unito.it', role='head',
+        )
+        Coordinator.objects.create(
+            university=self.turin, program=economics, name='Marco', public_email='marco@unito.it',
+            role='advisor', is_active=False,
+        )
+
+    def catalog(self):
+        return {model_name: list(iter_rows(model_name)) for model_name in ('universities', 'programs', 'coordinators')}
+
+    def export(self, fmt, compress=None):
+        directory = os.path.join(self.directory, f'{fmt}-{compress}')
+        call_command(
+            'export_catalog', model='catalog', output=directory, format=fmt, compress=compress, stderr=StringIO(),
+        )
+        return directory
+
+    def to_arrow(self, directory):
+        """Arrow IPC copies of the exported parquet files (export_catalog does not write Arrow)"""
+        import pyarrow
+        from pyarrow import parquet
+
+        for model_name in ('universities', 'programs', 'coordinators'):
+            table = parquet.read_table(os.path.join(directory, f'{model_name}.parquet'))
+            with pyarrow.ipc.new_file(os.path.join(directory, f'{model_name}.arrow'), table.schema) as writer:
+                writer.write_table(table)
+
+    def test_exported_catalog_imports_back_unchanged(self):
+        expected = self.catalog()
+        for fmt, compress, extension, package in (
+            ('csv', None, '.csv', None), ('csv', 'gzip', '.csv.gz', None), ('csv', 'zstd', '.csv.zst', 'zstandard'),
+            ('jsonl', None, '.jsonl', None), ('parquet', None, '.parquet', 'pyarrow'),
+            ('parquet', None, '.arrow', 'pyarrow'),
+        ):
+            with self.subTest(extension=extension):
+                if package and importlib.util.find_spec(package) is None:
+                    self.skipTest(f'{package} is not installed')
+                directory = self.export(fmt, compress)
+                if extension == '.arrow':
+                    self.to_arrow(directory)
+                University.objects.all().delete()
+
+                for model_name in ('universities', 'programs', 'coordinators'):
+                    path = os.path.join(directory, model_name + extension)
+                    output = self.import_file(path, model=model_name, bulk=True)
+                    self.assertIn(', 0 skipped', output)
+
+                self.assertEqual(self.catalog(), expected)
+                self.assertEqual(Program.objects.get(program_id='PRG001').coordinators_count, 1)
+
+
+class ParallelImportTests(ImportFileTestCase):
+    """import_csv --workers"""
+
+    def setUp(self):
+        super().setUp()
+        self.milan = University.objects.create(
+            university_id='UNI002', name='University of Milan', country='Italy', city='Milan',
+        )
+        # Every fifth program inactive, coordinators spread over all of them
+        programs = [
+            f'PRG{number:03d},UNI00{number % 2 + 1},Program {number},Economics,master,English,'
+            f'{"false" if number % 5 == 0 else "true"}'
+            for number in range(1, 41)
+        ]
+        coordinators = [
+            f'PRG{number % 40 + 1:03d},Anna,Rossi {number},anna{number}@example.com,coordinator'
+            for number in range(100)
+        ]
+        self.programs = self.write('programs.csv', [self.program_header, *programs])
+        self.coordinators = self.write(
+            'coordinators.csv', ['program_id,first_name,last_name,email,role', *coordinators],
+        )
+
+    def import_catalog(self, **options):
+        """Import the files; returns the counters and how far the catalog version moved"""
+        version, _ = get_catalog_version()
+        self.import_file(self.programs, **options)
+        self.import_file(self.coordinators, model='coordinators', **options)
+        universities = University.objects.order_by('university_id').values_list(
+            'university_id', 'programs_count', 'coordinators_count'
+        )
+        programs = Program.objects.order_by('program_id').values_list('program_id', 'coordinators_count')
+        return list(universities), list(programs), get_catalog_version()[0] - version
+
+    def test_parallel_import_matches_a_serial_import(self):
+        def small_ranges(path, chunk_bytes, start):
+            # A few rows each, so that the file is split between the workers
+            return byte_ranges(path, 256, start)
+
+        with mock.patch('universities.importers.byte_ranges', small_ranges):
+            parallel = self.import_catalog(workers=2)
+        self.assertEqual(Coordinator.objects.count(), 100)
+
+        Program.objects.all().delete()
+        serial = self.import_catalog(bulk=True)
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel[0], [('UNI001', 16, 50), ('UNI002', 16, 50)])
+        # One bump per import
+        self.assertEqual(parallel[2], 2)
+
+
+class CatalogCounterTests(TestCase):
+    """Denormalized counters kept up to date by saves and deletes"""
+
+    def setUp(self):
+        self.turin = University.objects.create(
+            university_id='UNI001', name='University of Turin', country='Italy', city='Turin',
+        )
+        self.milan = University.objects.create(
+            university_id='UNI002', name='University of Milan', country='Italy', city='Milan',
+        )
+        self.economics = self.program(self.turin, 'PRG001', 'Economics')
+        self.law = self.program(self.turin, 'PRG002', 'Law')
+
+    def program(self, university, program_id, name):
+        return Program.objects.create(
+            program_id=program_id, university=university, name=name,
+            field_of_study=name, degree_level='master', language='English',
+        )
+
+    def coordinator(self, program, email):
+        return Coordinator.objects.create(
+            university=program.university, program=program, name='Anna Rossi', public_email=email,
+        )
+
+    def assertCounts(self, university, programs, coordinators):
+        university = University.objects.get(pk=university.pk)
+        self.assertEqual((university.programs_count, university.coordinators_count), (programs, coordinators))
+
+    def assertProgramCount(self, program, coordinators):
+        self.assertEqual(Program.objects.get(pk=program.pk).coordinators_count, coordinators)
+
+    def test_created_rows_are_counted(self):
+        self.coordinator(self.economics, 'anna@unito.it')
+        self.coordinator(self.economics, 'marco@unito.it')
+
+        self.assertCounts(self.turin, 2, 2)
+        self.assertProgramCount(self.economics, 2)
+        self.assertCounts(self.milan, 0, 0)
+
+    def test_deleted_rows_are_uncounted(self):
+        coordinator = self.coordinator(self.economics, 'anna@unito.it')
+
+        coordinator.delete()
+        self.assertCounts(self.turin, 2, 0)
+        self.assertProgramCount(self.economics, 0)
+
+        self.law.delete()
+        self.assertCounts(self.turin, 1, 0)
+
+    def test_deactivated_rows_are_uncounted_and_reactivated_ones_counted(self):
+        coordinator = self.coordinator(self.economics, 'anna@unito.it')
+
+        coordinator.is_active = False
+        coordinator.save()
+        self.law.is_active = False
+        self.law.save()
+        self.assertCounts(self.turin, 1, 0)
+        self.assertProgramCount(self.economics, 0)
+
+        # Saving an inactive row again changes nothing, nor does deleting it
+        coordinator.save()
+        self.law.delete()
+        self.assertCounts(self.turin, 1, 0)
+
+        coordinator.is_active = True
+        coordinator.save()
+        self.assertCounts(self.turin, 1, 1)
+        self.assertProgramCount(self.economics, 1)
+
+    def test_moved_program_is_counted_at_its_new_university(self):
+        self.law.university = self.milan
+        self.law.save()
+
+        self.assertCounts(self.turin, 1, 0)
+        self.assertCounts(self.milan, 1, 0)
+
+    def test_moved_coordinator_is_counted_at_its_new_program_and_university(self):
+        coordinator = self.coordinator(self.economics, 'anna@unito.it')
+        business = self.program(self.milan, 'PRG003', 'Business')
+
+        coordinator.program = self.law
+        coordinator.save()
+        self.assertProgramCount(self.economics, 0)
+        self.assertProgramCount(self.law, 1)
+        self.assertCounts(self.turin, 2, 1)
+
+        # Loaded fresh, without the state remembered by the instance
+        coordinator = Coordinator.objects.get(pk=coordinator.pk)
+        coordinator.program = business
+        coordinator.university = self.milan
+        coordinator.save()
+        self.assertProgramCount(self.law, 0)
+        self.assertProgramCount(business, 1)
+        self.assertCounts(self.turin, 2, 0)
+        self.assertCounts(self.milan, 1, 1)
+
+    def test_repair_corrects_drifted_counters_and_bumps_the_catalog_version(self):
+        self.coordinator(self.economics, 'anna@unito.it')
+        University.objects.filter(pk=self.turin.pk).update(programs_count=7)
+        Program.objects.filter(pk=self.economics.pk).update(coordinators_count=0)
+        version, _ = get_catalog_version()
+
+        call_command('repair_catalog_counters', stdout=StringIO())
+
+        self.assertCounts(self.turin, 2, 1)
+        self.assertProgramCount(self.economics, 1)
+        self.assertGreater(get_catalog_version()[0], version)
+
+    def test_repair_leaves_correct_counters_alone(self):
+        self.coordinator(self.economics, 'anna@unito.it')
+        version, _ = get_catalog_version()
+        output = StringIO()
+
+        call_command('repair_catalog_counters', stdout=output)
+
+        self.assertIn('0 universities and 0 programs', output.getvalue())
+        self.assertEqual(get_catalog_version()[0], version)
+
+
+class IdAllocationTests(TestCase):
+    """Public university_id / program_id allocation from the per-base sequences"""
+
+    def university(self, university_id, name='Turin Polytechnic'):
+        return University.objects.create(university_id=university_id, name=name, country='Italy', city='Turin')
+
+    def test_bulk_allocation_reserves_a_block(self):
+        self.assertEqual(
+            allocate_ids(University, 'university_id', 'TURINP_ITA', 3),
+            ['TURINP_ITA_01', 'TURINP_ITA_02', 'TURINP_ITA_03'],
+        )
+        self.assertEqual(allocate_ids(University, 'university_id', 'TURINP_ITA'), ['TURINP_ITA_04'])
+        self.assertEqual(IdSequence.objects.get(prefix='university:TURINP_ITA').last_value, 4)
+
+    def test_sequence_is_seeded_from_existing_ids(self):
+        self.university('TURINP_ITA_07')
+        self.university('TURINP_ITA_12', name='Turin Polytechnic 2')
+        # Neither shares the base as far as the counter goes
+        self.university('TURINP_ITA_99X', name='Turin Polytechnic 3')
+        self.university('TURINP_ITALY_50', name='Turin Polytechnic 4')
+
+        university = University(name='Turin Polytechnic 5', country='Italy', city='Turin')
+        university.save()
+
+        self.assertEqual(university.university_id, 'TURINP_ITA_13')
+
+    def test_ids_taken_explicitly_are_skipped(self):
+        self.assertEqual(allocate_ids(University, 'university_id', 'TURINP_ITA'), ['TURINP_ITA_01'])
+        # e.g. rows of a CSV import, which do not advance the sequence
+        self.university('TURINP_ITA_02')
+        self.university('TURINP_ITA_03', name='Turin Polytechnic 2')
+
+        self.assertEqual(
+            allocate_ids(University, 'university_id', 'TURINP_ITA', 2), ['TURINP_ITA_04', 'TURINP_ITA_05'],
+        )
+        self.assertEqual(IdSequence.objects.get(prefix='university:TURINP_ITA').last_value, 5)
+
+
+class CatalogPaginationTests(TestCase):
+    """Keyset pages of the catalog list endpoints"""
+
+    def setUp(self):
+        university = University.objects.create(
+            university_id='UNI001', name='University of Turin', country='Italy', city='Turin',
+        )
+        programs = [
+            Program.objects.create(
+                program_id=f'PRG00{number}', university=university, name=name,
+                field_of_study=name, degree_level='master', language='English',
+            )
+            for number, name in enumerate(['Law', 'Economics'], start=1)
+        ]
+        # Names repeat so pages split between rows with the same sort key
+        for number, (program, name) in enumerate([
+            (programs[0], 'Marco Verdi'), (programs[1], 'Anna Rossi'), (programs[0], 'Anna Rossi'),
+            (programs[1], 'Anna Rossi'), (programs[0], 'Anna Rossi'), (programs[1], 'Marco Verdi'),
+            (programs[1], 'Anna Rossi'),
+        ]):
+            Coordinator.objects.create(
+                university=university, program=program, name=name, public_email=f'coordinator{number}@unito.it',
+            )
+        self.ordered_ids = list(
+            Coordinator.objects.order_by('program__name', 'name', 'id').values_list('id', flat=True)
+        )
+
+    def get(self, **params):
+        return self.client.get(reverse('coordinators-api'), params)
+
+    def walk(self, page_size):
+        """Ids of every page followed by cursor, and the number of pages"""
+        ids, pages, cursor = [], 0, None
+        while True:
+            params = {'page_size': page_size, **({'cursor': cursor} if cursor else {})}
+            data = self.get(**params).json()
+            ids += [coordinator['id'] for coordinator in data['results']]
+            pages += 1
+            cursor = data['next_cursor']
+            if cursor is None:
+                return ids, pages
+
+    @override_settings(CATALOG_PAGE_SIZE=3)
+    def test_responses_are_one_page_by_default(self):
+        data = self.get().json()
+
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['page_size'], 3)
+        self.assertEqual([coordinator['id'] for coordinator in data['results']], self.ordered_ids[:3])
+        self.assertIsNotNone(data['next_cursor'])
+
+    def test_cursors_return_every_row_once_in_order(self):
+        for page_size in (1, 2, 3, 7, 10):
+            with self.subTest(page_size=page_size):
+                ids, pages = self.walk(page_size)
+                self.assertEqual(ids, self.ordered_ids)
+                self.assertEqual(pages, max(1, -(-len(ids) // page_size)))
+
+    def test_invalid_cursors_are_rejected(self):
+        for cursor in ('not a cursor', 'WzFd', pagination.encode_cursor(['Anna Rossi'])):
+            with self.subTest(cursor=cursor):
+                response = self.get(cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+    @override_settings(CATALOG_PAGE_SIZE=3, CATALOG_MAX_PAGE_SIZE=4)
+    def test_page_size_is_capped(self):
+        self.assertEqual(self.get(page_size=100).json()['page_size'], 4)
+        self.assertEqual(len(self.get(page_size=100).json()['results']), 4)
+        self.assertEqual(self.get(page_size=0).json()['page_size'], 1)
+        self.assertEqual(self.get(page_size='many').json()['page_size'], 3)
+
+    @override_settings(CATALOG_PAGE_SIZE=3, CATALOG_STREAM_CHUNK_SIZE=2)
+    def test_streamed_responses_hold_every_row(self):
+        paged, _ = self.walk(3)
+
+        response = self.get(stream='json')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['count'], len(self.ordered_ids))
+        self.assertEqual([coordinator['id'] for coordinator in data['results']], paged)
+        self.assertEqual(data['results'][0], self.get(page_size=1).json()['results'][0])
+
+        response = self.get(stream='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], data['results'])
+
+
+class ProgramSearchTests(TestCase):
+    """Full-text search over the programs index"""
+
+    def setUp(self):
+        self.assertTrue(search.index_exists())
+        self.turin = University.objects.create(
+            university_id='UNI001', name='University of Turin', country='Italy', city='Turin',
+        )
+        self.computer_science = self.program('PRG001', 'Computer Science', 'Informatics')
+        self.computer_engineering = self.program('PRG002', 'Computer Engineering', 'Engineering')
+        self.economics = self.program(
+            'PRG003', 'Economics', 'Economics', description='Includes a computer science module',
+        )
+
+    def program(self, program_id, name, field_of_study, description=''):
+        return Program.objects.create(
+            program_id=program_id, university=self.turin, name=name, field_of_study=field_of_study,
+            description=description, degree_level='master', language='English',
+        )
+
+    def search(self, text):
+        programs = search.filter_programs(Program.objects.all(), text).order_by('search_rank', 'id')
+        return list(programs.values_list('program_id', flat=True))
+
+    def indexed(self, text):
+        """Ids of the index entries matching text, read from the index table itself"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {search.SQLITE_INDEX_TABLE} WHERE {search.SQLITE_INDEX_TABLE} MATCH %s",
+                [search.build_match_query(text)],
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('computer science'), ['PRG001', 'PRG003'])
+
+    def test_terms_match_as_prefixes_and_all_must_match(self):
+        self.assertEqual(self.search('comp sci'), ['PRG001', 'PRG003'])
+        self.assertEqual(self.search('comp eng'), ['PRG002'])
+        # Query syntax is dropped, not passed to the index
+        self.assertEqual(self.search('econ* OR "law'), [])
+        self.assertEqual(self.search('"econ'), ['PRG003'])
+
+    def test_saved_programs_are_reindexed(self):
+        self.computer_engineering.name = 'Electronic Engineering'
+        self.computer_engineering.save()
+
+        self.assertEqual(self.indexed('computer engineering'), set())
+        self.assertEqual(self.indexed('electronic'), {self.computer_engineering.pk})
+
+    def test_deleted_programs_are_removed_from_the_index(self):
+        pk = self.economics.pk
+
+        self.economics.delete()
+
+        self.assertNotIn(pk, self.indexed('computer'))
+        self.assertEqual(self.indexed('economics'), set())
+
+    def test_renamed_university_reindexes_its_programs(self):
+        programs = {self.computer_science.pk, self.computer_engineering.pk, self.economics.pk}
+        self.assertEqual(self.indexed('turin'), programs)
+
+        self.turin.name = 'Polytechnic of Milan'
+        self.turin.save()
+
+        self.assertEqual(self.indexed('turin'), set())
+        self.assertEqual(self.indexed('polytechnic'), programs)
+        self.assertEqual(self.search('polytechnic'), ['PRG001', 'PRG002', 'PRG003'])
+
+
+class SearchCacheTests(TestCase):
+    """Requests sharing a search cache key return the same results"""
+
+    def setUp(self):
+        caches['search'].clear()
+        university = University.objects.create(
+            university_id='UNI001', name='University of Turin', country='Italy', city='Turin',
+        )
+        Program.objects.create(
+            program_id='PRG001', university=university, name='Economics',
+            field_of_study='Economics', degree_level='master', language='English',
+        )
+
+    def test_filter_values_are_normalized_like_the_cache_key(self):
+        padded = self.client.get(reverse('search-api'), {'country': ' Italy '})
+        exact = self.client.get(reverse('search-api'), {'country': 'Italy'})
+
+        self.assertEqual(padded['X-Cache'], 'MISS')
+        self.assertEqual(exact['X-Cache'], 'HIT')
+        self.assertEqual(padded.json()['count'], 1)
+        self.assertEqual(exact.json()['count'], 1)
+
+
+class SearchFacetTests(TestCase):
+    """Facet counts of /api/search/"""
+
+    def setUp(self):
+        caches['search'].clear()
+        turin = University.objects.create(
+            university_id='UNI001', name='University of Turin', country='Italy', city='Turin',
+        )
+        munich = University.objects.create(
+            university_id='UNI002', name='University of Munich', country='Germany', city='Munich',
+        )
+        for number, (university, language, tuition) in enumerate([
+            (turin, 'English', '999.99'), (turin, 'English', '1000'), (turin, 'Italian', '2999.99'),
+            (turin, 'English', '3000'), (munich, 'English', '9999.99'), (munich, 'German', '10000'),
+            (munich, 'English', None),
+        ], start=1):
+            Program.objects.create(
+                program_id=f'PRG00{number}', university=university, name=f'Program {number}',
+                field_of_study='Economics', degree_level='master', language=language, tuition_fee_euro=tuition,
+            )
+
+    def search(self, **params):
+        return self.client.get(reverse('search-api'), {'facets': '1', **params})
+
+    def counts(self, data, facet):
+        return {entry['value']: entry['count'] for entry in data['facets'][facet]}
+
+    def test_each_facet_ignores_its_own_filter(self):
+        data = self.search(country='Italy', language='English').json()
+
+        self.assertEqual(data['count'], 3)
+        # Other countries under the language filter, other languages in Italy
+        self.assertEqual(self.counts(data, 'country'), {'Italy': 3, 'Germany': 2})
+        self.assertEqual(self.counts(data, 'language'), {'English': 3, 'Italian': 1})
+        self.assertEqual(self.counts(data, 'degree_level'), {'master': 3})
+
+    def test_tuition_buckets_include_their_lower_bound(self):
+        data = self.search().json()
+
+        self.assertEqual(self.counts(data, 'tuition'), {
+            'lt_1000': 1, '1000_3000': 2, '3000_5000': 1, '5000_10000': 1, 'gte_10000': 1, 'unknown': 1,
+        })
+        programs = self.search(tuition='1000_3000').json()['programs']
+        self.assertEqual({program['program_id'] for program in programs}, {'PRG002', 'PRG003'})
+        self.assertEqual(self.counts(self.search(tuition='gte_10000').json(), 'tuition')['lt_1000'], 1)
+
+    def test_facets_are_served_from_the_cache(self):
+        with mock.patch.object(facets, 'facet_counts', wraps=facets.facet_counts) as facet_counts:
+            first = self.search(country='Italy')
+            second = self.search(country='Italy')
+
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(facet_counts.call_count, len(facets.FACET_FIELDS))
+        self.assertEqual(second.json()['facets'], first.json()['facets'])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """Catalog endpoints stay within QUERY_BUDGETS (over-budget requests raise)"""
+
+    catalog_urls = ['universities-api', 'programs-api', 'coordinators-api', 'countries-api', 'fields-of-study-api']
+
+    def setUp(self):
+        for number in range(1, 4):
+            university = University.objects.create(
+                university_id=f'UNI00{number}', name=f'University {number}', country='Italy', city='Turin',
+            )
+            program = Program.objects.create(
+                program_id=f'PRG00{number}', university=university, name='Economics',
+                field_of_study='Economics', degree_level='master', language='English',
+            )
+            Coordinator.objects.create(
+                university=university, program=program, name=f'Coordinator {number}',
+                public_email=f'coordinator{number}@example.com', role='coordinator',
+            )
+
+    def get_catalog(self):
+        for name in self.catalog_urls:
+            self.assertEqual(self.client.get(reverse(name)).status_code, 200, name)
+        response = self.client.get(reverse('search-api'), {'country': 'Italy', 'facets': '1'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_requests(self):
+        self.get_catalog()
+
+    def test_logged_in_requests(self):
+        user = get_user_model().objects.create_user(
+            username='student', email='student@example.com', password='password'
+        )
+        self.client.force_login(user)
+        self.get_catalog()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+    def test_bench_agrees_with_the_middleware(self):
+        user = get_user_model().objects.create_user(username='student', email='student@example.com')
+        self.client.force_login(user)
+        endpoint = next(endpoint for endpoint in benchmarks.ENDPOINTS if endpoint.name == 'profile')
+
+        summary = benchmarks.summarize(benchmarks.run_endpoint(endpoint, self.client, {}, iterations=2, warmup=0))
+
+        self.assertEqual(summary['status'], [200])
+        self.assertEqual(
+            summary['query_budget'], settings.QUERY_BUDGETS['profile'] + settings.QUERY_BUDGET_SESSION_QUERIES
+        )
+        self.assertFalse(summary['over_budget'])
+
+
+class MetricsViewTests(TestCase):
+    """Access to the Prometheus scrape endpoint"""
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_not_served_without_a_token_in_production(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=True)
+    def test_served_without_a_token_in_debug(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret', DEBUG=False)
+    def test_requires_the_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        wrong = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer guess'})
+        self.assertEqual(wrong.status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'uniworld_http_requests_total', response.content)
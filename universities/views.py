@@ -2,8 +2,8 @@ from rest_framework import generics, permissions, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
 from .models import University, Program, Coordinator
+from . import search
 from .serializers import (
     UniversitySerializer, ProgramSerializer, CoordinatorSerializer,
     UniversityDetailSerializer, ProgramDetailSerializer, SearchSerializer
@@ -79,12 +79,7 @@ def search_view(request):
     programs_query = Program.objects.filter(is_active=True).select_related('university')
     
     if data.get('query'):
-        programs_query = programs_query.filter(
-            Q(name__icontains=data['query']) |
-            Q(field_of_study__icontains=data['query']) |
-            Q(description__icontains=data['query']) |
-            Q(university__name__icontains=data['query'])
-        )
+        programs_query = search.filter_programs(programs_query, data['query']).order_by('search_rank', 'id')
     
     if data.get('country'):
         programs_query = programs_query.filter(university__country__icontains=data['country'])
@@ -109,8 +104,8 @@ def search_view(request):
     
     # Get unique universities from filtered programs
     universities = University.objects.filter(
-        programs__in=programs_query
-    ).distinct()
+        id__in=programs_query.values('university_id')
+    )
     
     return Response({
         'programs': ProgramSerializer(programs_query[:50], many=True).data,
@@ -0,0 +1,299 @@
+"""
+Endpoint benchmarks.
+
+Every URL of the site (uniworld_backend/urls.py) and of the DRF API in
+universities/urls.py, which is not routed yet and is mounted under
+``bench/api/`` here, has an entry in ENDPOINTS: either a request to time or
+a reason it is skipped (external services, payments, OAuth). This module is
+also the URLconf used while benchmarking; check_coverage() lists routes that
+have no entry so new endpoints are not silently left out.
+
+run_endpoint() repeats one request with the Django test client and records
+latency, queries and response bytes per request; summarize() turns those
+samples into p50/p95/p99 figures. Queries are counted with the middleware's
+QueryStats (including those run while a streamed body is read), and a
+request is over budget when the middleware would have said so. The ``bench`` management command seeds the
+data, runs everything and writes the JSON results.
+"""
+
+import json
+import math
+import time
+
+from django.core.cache import caches
+from django.db import connection
+from django.urls import URLPattern, URLResolver, get_resolver, include, path, reverse
+
+from uniworld_backend.query_budget import QueryStats, query_budget
+from uniworld_backend.urls import urlpatterns as site_urlpatterns
+
+
+urlpatterns = site_urlpatterns + [
+    path('bench/api/', include('universities.urls')),
+]
+
+URLCONF = __name__
+
+
+class Endpoint:
+    """
+    One benchmarked request.
+
+    Args:
+        name: Name used in the results
+        url_name: URL pattern name
+        kwargs: URL kwargs; values are formatted with the fixtures
+        method: HTTP method
+        params: Query string parameters, formatted with the fixtures
+        data: JSON body, formatted with the fixtures and the iteration ``n``
+        auth: Send the request as the logged in benchmark user
+        cold_cache: Clear the caches (untimed) before every request
+        writes: Leaves rows behind (users, sessions); not run against an existing database
+        headers: Request headers, formatted with the fixtures
+    """
+
+    def __init__(self, name, url_name, kwargs=None, method='GET', params=None, data=None, auth=False,
+                 cold_cache=False, writes=False, headers=None):
+        self.name = name
+        self.url_name = url_name
+        self.kwargs = kwargs or {}
+        self.method = method
+        self.params = params or {}
+        self.data = data
+        self.auth = auth
+        self.cold_cache = cold_cache
+        self.writes = writes
+        self.headers = headers or {}
+
+    def path(self, fixtures):
+        kwargs = {key: str(value).format(**fixtures) for key, value in self.kwargs.items()}
+        return reverse(self.url_name, kwargs=kwargs, urlconf=URLCONF)
+
+    def query(self, fixtures):
+        return {key: str(value).format(**fixtures) for key, value in self.params.items()}
+
+    def request_headers(self, fixtures):
+        return {key: str(value).format(**fixtures) for key, value in self.headers.items()}
+
+    def body(self, fixtures, n):
+        if self.data is None:
+            return None
+        return json.dumps({key: str(value).format(n=n, **fixtures) for key, value in self.data.items()})
+
+
+PAGE = {'page_size': 50}
+
+ENDPOINTS = [
+    # Pages and scripts
+    Endpoint('home', 'home'),
+    Endpoint('app_js', 'app-js'),
+    Endpoint('oauth2_config_js', 'oauth2-config-js'),
+    Endpoint('api_welcome', 'api-welcome'),
+    Endpoint('metrics', 'metrics', headers={'Authorization': 'Bearer {metrics_token}'}),
+
+    # Accounts
+    Endpoint('register', 'register', method='POST', data={
+        'username': 'bench_register_{run}_{n}',
+        'email': 'bench_register_{run}_{n}@example.com',
+        'password': 'bench-password-123',
+    }, writes=True),
+    Endpoint(
+        'login', 'login', method='POST', data={'email': '{user_email}', 'password': '{user_password}'}, writes=True
+    ),
+    Endpoint('profile', 'profile', auth=True),
+    Endpoint('test_user_profile', 'test-user-profile'),
+    Endpoint('user_subscription', 'user-subscription', kwargs={'user_id': '{user}'}),
+    Endpoint('oauth_tokens', 'get-oauth-tokens', auth=True),
+
+    # Catalog
+    Endpoint('universities', 'universities-api'),
+    Endpoint('universities_page', 'universities-api', params=PAGE),
+    Endpoint('programs', 'programs-api'),
+    Endpoint('programs_page', 'programs-api', params=PAGE),
+    Endpoint('programs_ndjson', 'programs-api', params={'stream': 'ndjson'}),
+    Endpoint('coordinators', 'coordinators-api'),
+    Endpoint('coordinators_page', 'coordinators-api', params=PAGE),
+    Endpoint('coordinators_by_program', 'coordinators-api', params={'program_id': '{program_id}'}),
+    Endpoint('countries', 'countries-api'),
+    Endpoint('fields_of_study', 'fields-of-study-api'),
+    Endpoint('search', 'search-api', params={'q': '{search_term}', **PAGE}, cold_cache=True),
+    Endpoint('search_cached', 'search-api', params={'q': '{search_term}', **PAGE}),
+    Endpoint('search_filters_facets', 'search-api', params={
+        'country': '{country}', 'degree_level': 'master', 'facets': '1', **PAGE,
+    }, cold_cache=True),
+    Endpoint('ai_templates', 'ai_services:get_templates'),
+
+    # DRF API (universities/urls.py)
+    Endpoint('drf_universities', 'university-list'),
+    Endpoint('drf_university_detail', 'university-detail', kwargs={'pk': '{university}'}),
+    Endpoint('drf_university_programs', 'programs-by-university', kwargs={'university_id': '{university}'}),
+    Endpoint('drf_programs', 'program-list'),
+    Endpoint('drf_program_detail', 'program-detail', kwargs={'pk': '{program}'}),
+    Endpoint('drf_program_coordinators', 'coordinators-by-program', kwargs={'program_id': '{program}'}),
+    Endpoint('drf_coordinators', 'coordinator-list'),
+    Endpoint('drf_search', 'search', params={'q': '{search_term}'}),
+    Endpoint('drf_countries', 'countries-list'),
+    Endpoint('drf_fields_of_study', 'fields-of-study-list'),
+]
+
+# URL pattern name -> why it is not benchmarked
+SKIPPED = {
+    'admin': 'Django admin',
+    'change-password': 'changes the benchmark user\'s password',
+    'send-email-api': 'sends mail through Gmail/Outlook',
+    'send-bulk-email-api': 'sends mail through Gmail/Outlook',
+    'bulk-email-job': 'needs a bulk email job of the benchmark user',
+    'create-payment-session': 'calls the Stripe API',
+    'stripe-webhook': 'needs Stripe-signed payloads',
+    'subscription-success': 'calls the Stripe API',
+    'subscription-cancel': 'its template (subscription_cancel.html) does not exist',
+    'gmail-oauth-callback': 'exchanges codes with Google',
+    'gmail-oauth-callback-slash': 'exchanges codes with Google',
+    'outlook-oauth-callback': 'exchanges codes with Microsoft',
+    'outlook-oauth-callback-slash': 'exchanges codes with Microsoft',
+    'refresh-oauth-token': 'calls the OAuth providers',
+    'profile-list': 'staff-only profiling downloads',
+    'profile-download': 'staff-only profiling downloads',
+    'ai_services:generate_suggestions': 'calls the Gemini API',
+    'ai_services:generate_subjects': 'calls the Gemini API',
+    'ai_services:enhance_content': 'calls the Gemini API',
+    'ai_services:generate_template': 'calls the Gemini API',
+    'ai_services:generate_multiple_templates': 'calls the Gemini API',
+    'ai_services:test_gemini': 'calls the Gemini API',
+}
+
+
+def _route_names(patterns, namespace=None):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.app_name == 'admin':
+                yield 'admin'
+                continue
+            inner = pattern.namespace if pattern.namespace else None
+            prefix = ':'.join(part for part in (namespace, inner) if part) or None
+            yield from _route_names(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern):
+            name = pattern.name or pattern.lookup_str
+            yield f'{namespace}:{name}' if namespace else name
+
+
+def check_coverage():
+    """URL pattern names with neither an endpoint nor a skip reason"""
+    covered = {endpoint.url_name for endpoint in ENDPOINTS} | set(SKIPPED)
+    names = dict.fromkeys(_route_names(get_resolver(URLCONF).url_patterns))
+    return [name for name in names if name not in covered]
+
+
+def _content_length(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def run_endpoint(endpoint, client, fixtures, iterations, warmup):
+    """
+    Time ``iterations`` requests to one endpoint after ``warmup`` untimed ones.
+
+    Returns a dict with the path, status codes, the query budget and
+    per-request samples of latency (seconds), query count, queries counted
+    against the budget and response bytes.
+    """
+    path = endpoint.path(fixtures)
+    params = endpoint.query(fixtures)
+    headers = endpoint.request_headers(fixtures)
+    request = getattr(client, endpoint.method.lower())
+    samples = {'latency': [], 'queries': [], 'budget_queries': [], 'bytes': []}
+    statuses = set()
+    budget = None
+
+    for n in range(warmup + iterations):
+        body = endpoint.body(fixtures, n)
+        kwargs = {'data': body, 'content_type': 'application/json'} if body is not None else {'data': params}
+        kwargs['headers'] = headers
+        if endpoint.cold_cache:
+            for cache in caches.all():
+                cache.clear()
+
+        queries = QueryStats(keep_slowest=0)
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            response = request(path, **kwargs)
+            size = _content_length(response)
+            elapsed = time.perf_counter() - started
+
+        if n < warmup:
+            continue
+        statuses.add(response.status_code)
+        samples['latency'].append(elapsed)
+        samples['queries'].append(queries.count)
+        # What QueryBudgetMiddleware counted and allowed for this request
+        samples['budget_queries'].append(response.wsgi_request.query_stats.count)
+        budget = query_budget(endpoint.url_name, response.wsgi_request)
+        samples['bytes'].append(size)
+
+    return {
+        'method': endpoint.method, 'path': path, 'params': params, 'status': sorted(statuses),
+        'query_budget': budget, **samples,
+    }
+
+
+def percentile(values, p):
+    """Linear interpolation percentile of ``values`` (0 < p < 100)"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * p / 100
+    lower, upper = math.floor(rank), math.ceil(rank)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(run):
+    """Collapse the samples of run_endpoint() into the figures written to the results"""
+    latency_ms = [value * 1000 for value in run['latency']]
+    return {
+        'method': run['method'],
+        'path': run['path'],
+        'params': run['params'],
+        'status': run['status'],
+        'iterations': len(latency_ms),
+        'p50_ms': round(percentile(latency_ms, 50), 3),
+        'p95_ms': round(percentile(latency_ms, 95), 3),
+        'p99_ms': round(percentile(latency_ms, 99), 3),
+        'mean_ms': round(sum(latency_ms) / len(latency_ms), 3),
+        'max_ms': round(max(latency_ms), 3),
+        'queries': max(run['queries']),
+        'query_budget': run['query_budget'],
+        'over_budget': run['query_budget'] is not None and max(run['budget_queries']) > run['query_budget'],
+        'bytes': max(run['bytes']),
+    }
+
+
+# Metrics compared between two result files; latency regressions are relative,
+# query count and size changes are reported whenever they differ
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'bytes')
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compare two result files.
+
+    Returns (rows, regressions): one row per endpoint present in both with
+    (name, metric, before, after, relative change) for every changed metric,
+    and the rows considered regressions (latency more than ``threshold``
+    slower, or more queries).
+    """
+    rows, regressions = [], []
+    for name, after in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None or old == new:
+                continue
+            change = (new - old) / old if old else math.inf
+            row = (name, metric, old, new, change)
+            rows.append(row)
+            if metric.endswith('_ms') and change > threshold or metric == 'queries' and new > old:
+                regressions.append(row)
+    return rows, regressions
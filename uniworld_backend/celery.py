@@ -0,0 +1,16 @@
+"""
+Celery application, used when BULK_EMAIL_QUEUE is 'celery'.
+
+Start a worker with ``celery -A uniworld_backend worker``.
+"""
+
+import os
+
+from celery import Celery
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'uniworld_backend.settings')
+
+app = Celery('uniworld_backend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
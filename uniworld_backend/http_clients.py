@@ -0,0 +1,102 @@
+"""
+Shared HTTP sessions for calls to external providers.
+
+session(provider) returns one requests.Session per provider and process.
+Connections are kept alive and reused through a pool per host, so bulk sends
+and token refreshes pay the TCP and TLS handshake once per pooled connection
+instead of once per call. Every request gets the default (connect, read)
+timeout unless the caller passes one, and requests are retried (with backoff)
+when a connection can not be established; once sent, nothing is retried.
+
+Sessions are created lazily and dropped in forked children, so pre-forking
+servers do not share sockets between workers.
+"""
+
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Provider -> hosts it talks to (one connection pool per host)
+PROVIDERS = {
+    'google': ('oauth2.googleapis.com', 'www.googleapis.com', 'gmail.googleapis.com'),
+    'microsoft': ('login.microsoftonline.com', 'graph.microsoft.com'),
+    'stripe': ('api.stripe.com', 'files.stripe.com'),
+}
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def default_timeout():
+    """(connect, read) timeout in seconds"""
+    return (
+        getattr(settings, 'HTTP_CONNECT_TIMEOUT', 3.05),
+        getattr(settings, 'HTTP_READ_TIMEOUT', 20),
+    )
+
+
+class ProviderSession(requests.Session):
+    """requests.Session applying the default timeout to every request"""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', default_timeout())
+        return super().request(method, url, **kwargs)
+
+
+def _build_session(provider):
+    pool_size = getattr(settings, 'HTTP_POOL_MAXSIZE', 10)
+    retries = Retry(
+        total=getattr(settings, 'HTTP_MAX_RETRIES', 2),
+        connect=getattr(settings, 'HTTP_MAX_RETRIES', 2),
+        read=0,
+        status=0,
+        backoff_factor=0.2,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=len(PROVIDERS.get(provider, ())) or 1,
+        pool_maxsize=pool_size,
+        max_retries=retries,
+        # Wait for a free connection instead of opening extra ones that are
+        # thrown away after use
+        pool_block=True,
+    )
+    http = ProviderSession()
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    return http
+
+
+def session(provider):
+    """The pooled session of a provider (``google``, ``microsoft``, ``stripe``)"""
+    http = _sessions.get(provider)
+    if http is None:
+        with _lock:
+            http = _sessions.get(provider)
+            if http is None:
+                http = _sessions[provider] = _build_session(provider)
+    return http
+
+
+def close_sessions():
+    """Close every pooled connection of this process"""
+    with _lock:
+        for http in _sessions.values():
+            http.close()
+        _sessions.clear()
+
+
+def _forget_sessions():
+    # In a forked child the parent's sockets must not be reused
+    global _lock
+    _lock = threading.Lock()
+    _sessions.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_sessions)
@@ -0,0 +1,194 @@
+"""
+Prometheus metrics.
+
+MetricsMiddleware records, per URL name (``view`` label):
+
+- ``uniworld_http_request_duration_seconds``: request latency histogram
+- ``uniworld_http_requests_total``: requests by method and status code
+- ``uniworld_http_requests_in_progress``: requests being served (saturation)
+- ``uniworld_db_time_seconds`` / ``uniworld_db_queries``: database time and
+  query count per request, taken from the QueryBudgetMiddleware statistics
+
+plus, from the code making the calls:
+
+- ``uniworld_cache_requests_total``: response cache hits and misses
+  (hit ratio = hits / (hits + misses))
+- ``uniworld_outbound_request_duration_seconds`` and
+  ``uniworld_outbound_errors_total``: calls to Gmail, Microsoft Graph,
+  Stripe and Gemini, by service and operation
+
+metrics_view serves them at /metrics to requests carrying
+``Authorization: Bearer <METRICS_TOKEN>``; without a token configured it is
+only served with DEBUG on, since the figures describe the site's internals
+and its providers' error rates. Under a multi-process server set the
+PROMETHEUS_MULTIPROC_DIR environment variable to an empty directory shared
+by the workers (wiped on deploy): every process then writes its samples to
+memory-mapped files there and /metrics aggregates all of them, whichever
+worker answers the scrape. Dead workers should be reported with
+mark_process_dead(pid), e.g. from gunicorn's ``child_exit`` hook.
+"""
+
+import functools
+import hmac
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_http_methods
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from stripe.http_client import RequestsClient
+
+from . import http_clients
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_DURATION = Histogram(
+    'uniworld_http_request_duration_seconds', 'Request latency', ['view', 'method'], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter('uniworld_http_requests', 'Requests served', ['view', 'method', 'status'])
+IN_PROGRESS = Gauge(
+    'uniworld_http_requests_in_progress', 'Requests being served', multiprocess_mode='livesum'
+)
+DB_TIME = Histogram('uniworld_db_time_seconds', 'Database time per request', ['view'], buckets=LATENCY_BUCKETS)
+DB_QUERIES = Histogram('uniworld_db_queries', 'Queries per request', ['view'], buckets=QUERY_BUCKETS)
+CACHE_REQUESTS = Counter('uniworld_cache_requests', 'Response cache lookups', ['cache', 'result'])
+OUTBOUND_DURATION = Histogram(
+    'uniworld_outbound_request_duration_seconds', 'Latency of calls to external services',
+    ['service', 'operation'], buckets=LATENCY_BUCKETS
+)
+OUTBOUND_ERRORS = Counter(
+    'uniworld_outbound_errors', 'Failed calls to external services', ['service', 'operation']
+)
+
+# Label of requests that did not resolve to a URL (keeps 404 scans from
+# creating one series per path)
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+def multiprocess_enabled():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def mark_process_dead(pid):
+    """Drop the live gauges of a worker that exited"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+@contextmanager
+def track_outbound(service, operation):
+    """Time a call to an external service; exceptions count as errors"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        OUTBOUND_ERRORS.labels(service, operation).inc()
+        raise
+    finally:
+        OUTBOUND_DURATION.labels(service, operation).observe(time.perf_counter() - started)
+
+
+def observe_outbound(service, operation, is_error=None):
+    """
+    Decorator timing a function that calls an external service.
+
+    Args:
+        service: ``service`` label, e.g. ``gmail``
+        operation: ``operation`` label, e.g. ``send``
+        is_error: Optional callable telling from the return value that the
+            call failed, for functions that report errors instead of raising
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_outbound(service, operation):
+                result = func(*args, **kwargs)
+            if is_error is not None and is_error(result):
+                OUTBOUND_ERRORS.labels(service, operation).inc()
+            return result
+        return wrapper
+    return decorator
+
+
+_STRIPE_ID_RE = re.compile(r'/[a-z]+_[0-9A-Za-z]+')
+
+
+class InstrumentedStripeClient(RequestsClient):
+    """
+    Stripe HTTP client recording every API call, labelled by resource (``/v1/customers``).
+
+    Calls go through the pooled ``stripe`` session of http_clients, looked up
+    on every call rather than kept: a forked worker gets a session of its own
+    instead of the parent's sockets.
+    """
+
+    def _request_internal(self, method, url, headers, post_data, is_streaming):
+        self._thread_local.session = http_clients.session('stripe')
+        return super()._request_internal(method, url, headers, post_data, is_streaming)
+
+    def request(self, method, url, headers, post_data=None):
+        path = url.split('://', 1)[-1].split('?', 1)[0]
+        operation = f'{method.upper()} {_STRIPE_ID_RE.sub("/:id", path[path.find("/"):])}'
+        with track_outbound('stripe', operation):
+            content, status, response_headers = super().request(method, url, headers, post_data)
+        if status >= 400:
+            OUTBOUND_ERRORS.labels('stripe', operation).inc()
+        return content, status, response_headers
+
+
+class MetricsMiddleware:
+    """Records request latency, status and database figures per URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        IN_PROGRESS.inc()
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_PROGRESS.dec()
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match else UNRESOLVED_VIEW
+            REQUEST_DURATION.labels(view, request.method).observe(elapsed)
+            REQUESTS.labels(view, request.method, str(status)).inc()
+            stats = getattr(request, 'query_stats', None)
+            if stats is not None:
+                DB_TIME.labels(view).observe(stats.duration)
+                DB_QUERIES.labels(view).observe(stats.count)
+
+
+def _authorized(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return settings.DEBUG
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    if not _authorized(request):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
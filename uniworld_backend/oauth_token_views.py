@@ -6,7 +6,8 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import json
-import requests
+
+from . import http_clients
 
 User = get_user_model()
 
@@ -149,7 +150,7 @@ def refresh_gmail_token(refresh_token):
             'grant_type': 'refresh_token'
         }
         
-        response = requests.post(token_url, data=data)
+        response = http_clients.session('google').post(token_url, data=data)
         
         if response.status_code == 200:
             return response.json()
@@ -174,7 +175,7 @@ def refresh_outlook_token(refresh_token):
             'grant_type': 'refresh_token'
         }
         
-        response = requests.post(token_url, data=data)
+        response = http_clients.session('microsoft').post(token_url, data=data)
         
         if response.status_code == 200:
             return response.json()
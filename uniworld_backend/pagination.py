@@ -0,0 +1,102 @@
+"""
+Keyset (cursor) pagination for the frontend catalog endpoints.
+
+Pages are selected with a WHERE clause on the ordering keys of the last row
+of the previous page instead of OFFSET, so every page costs the same as the
+first one. Cursors are opaque url-safe strings encoding those key values.
+
+Ordering fields must be non-null and must end with a unique field (``id``)
+so the ordering is total.
+"""
+
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor can not be decoded for the requested ordering"""
+
+
+def encode_cursor(values):
+    """Encode the ordering key values of a row into an opaque cursor"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, ordering):
+    """Decode a cursor produced by encode_cursor for the given ordering"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def default_page_size():
+    return getattr(settings, 'CATALOG_PAGE_SIZE', 50)
+
+
+def get_page_size(request):
+    """Read the requested page size, capped at CATALOG_MAX_PAGE_SIZE"""
+    default = default_page_size()
+    maximum = getattr(settings, 'CATALOG_MAX_PAGE_SIZE', 200)
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, maximum))
+
+
+def _after(ordering, values):
+    """Build the filter selecting rows that sort after the given key values"""
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _key_values(obj, ordering):
+    """Read the ordering key values from a model instance"""
+    values = []
+    for field in ordering:
+        value = obj
+        for part in field.lstrip('-').split('__'):
+            value = getattr(value, part)
+        values.append(value)
+    return values
+
+
+def paginate(queryset, request, ordering):
+    """
+    Return one page of ``queryset`` ordered by ``ordering``.
+
+    Returns:
+        Tuple of (rows, next_cursor, page_size); next_cursor is None on the
+        last page.
+
+    Raises:
+        InvalidCursor: if the request carries a malformed cursor
+    """
+    page_size = get_page_size(request)
+    queryset = queryset.order_by(*ordering)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, ordering)))
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(_key_values(rows[-1], ordering))
+    return rows, next_cursor, page_size
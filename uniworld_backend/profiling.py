@@ -0,0 +1,125 @@
+"""
+On-demand profiling of single requests.
+
+A staff user adds the ``X-Profile: 1`` header (or ``?_profile=1``) to a slow
+request and ProfilingMiddleware runs that request under cProfile. The stats
+are saved in PROFILING_DIR as ``<id>.pstats`` next to a plain text summary
+``<id>.txt`` (top functions by cumulative time), and the response carries
+``X-Profile-Id``/``X-Profile-Url`` pointing at the download endpoint. The
+.pstats file opens in snakeviz, or as a flamegraph through flameprof.
+
+Requests without the trigger only pay for a header and a query parameter
+lookup; the user is not even loaded. Only the newest PROFILING_MAX_FILES
+profiles are kept.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.urls import reverse
+
+
+PROFILE_ID_RE = re.compile(r'^[0-9A-Za-z_-]+$')
+
+# Functions listed in the text summary
+SUMMARY_LINES = 60
+
+
+def profiling_dir():
+    return str(getattr(settings, 'PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def profile_path(profile_id, extension):
+    """Path of a stored profile, None for ids that are not ours"""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    return os.path.join(profiling_dir(), f'{profile_id}.{extension}')
+
+
+def is_triggered(request):
+    header = getattr(settings, 'PROFILING_HEADER', 'X-Profile')
+    param = getattr(settings, 'PROFILING_QUERY_PARAM', '_profile')
+    return request.headers.get(header) == '1' or request.GET.get(param) == '1'
+
+
+def can_profile(user):
+    return user.is_authenticated and user.is_staff and user.is_active
+
+
+def list_profiles():
+    """Stored profiles, newest first, as (profile id, modification time, size in bytes)"""
+    directory = profiling_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith('.pstats'):
+            path = os.path.join(directory, name)
+            stat = os.stat(path)
+            profiles.append((name[:-len('.pstats')], stat.st_mtime, stat.st_size))
+    return sorted(profiles, key=lambda profile: profile[1], reverse=True)
+
+
+def _prune(keep):
+    for profile_id, _, _ in list_profiles()[keep:]:
+        for extension in ('pstats', 'txt'):
+            try:
+                os.remove(profile_path(profile_id, extension))
+            except FileNotFoundError:
+                pass
+
+
+def save_profile(profiler, request, response, elapsed):
+    """Write the stats and text summary of one profiled request; returns the profile id"""
+    directory = profiling_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    match = getattr(request, 'resolver_match', None)
+    view = re.sub(r'[^0-9A-Za-z_-]', '_', match.view_name if match else 'unresolved')
+    profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{view}-{uuid.uuid4().hex[:8]}'
+
+    profiler.dump_stats(profile_path(profile_id, 'pstats'))
+    summary = io.StringIO()
+    summary.write(
+        f'{request.method} {request.get_full_path()} -> {response.status_code} '
+        f'in {elapsed * 1000:.1f}ms (user {request.user.pk})\n\n'
+    )
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    with open(profile_path(profile_id, 'txt'), 'w') as f:
+        f.write(summary.getvalue())
+
+    _prune(getattr(settings, 'PROFILING_MAX_FILES', 100))
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """Profiles requests from staff users that ask for it (see module docstring)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (getattr(settings, 'PROFILING_ENABLED', True) and is_triggered(request)):
+            return self.get_response(request)
+        if not can_profile(request.user):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        profile_id = save_profile(profiler, request, response, elapsed)
+        response['X-Profile-Id'] = profile_id
+        response['X-Profile-Url'] = reverse('profile-download', kwargs={'profile_id': profile_id})
+        return response
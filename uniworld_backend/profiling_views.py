@@ -0,0 +1,41 @@
+from django.http import FileResponse, JsonResponse
+from django.views.decorators.http import require_http_methods
+from datetime import datetime, timezone
+import os
+
+from . import profiling
+
+
+@require_http_methods(["GET"])
+def list_profiles_view(request):
+    """List stored request profiles (staff only)"""
+    if not profiling.can_profile(request.user):
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+
+    profiles = [
+        {
+            'id': profile_id,
+            'created_at': datetime.fromtimestamp(mtime, tz=timezone.utc).isoformat(),
+            'size': size,
+            'pstats_url': request.build_absolute_uri(f'{profile_id}/'),
+            'summary_url': request.build_absolute_uri(f'{profile_id}/?format=txt'),
+        }
+        for profile_id, mtime, size in profiling.list_profiles()
+    ]
+    return JsonResponse({'count': len(profiles), 'results': profiles})
+
+
+@require_http_methods(["GET"])
+def download_profile_view(request, profile_id):
+    """Download one profile as .pstats, or its text summary with ?format=txt (staff only)"""
+    if not profiling.can_profile(request.user):
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+
+    extension = 'txt' if request.GET.get('format') == 'txt' else 'pstats'
+    path = profiling.profile_path(profile_id, extension)
+    if path is None or not os.path.exists(path):
+        return JsonResponse({'error': 'Profile not found'}, status=404)
+
+    if extension == 'txt':
+        return FileResponse(open(path, 'rb'), content_type='text/plain; charset=utf-8')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
@@ -0,0 +1,141 @@
+"""
+Per-request SQL instrumentation and query budgets.
+
+QueryBudgetMiddleware installs an execute wrapper on every database
+connection for the duration of a request and records the number of queries,
+the total time spent in the database and the slowest statements. With DEBUG
+on the figures are sent back as response headers (``X-DB-Queries``,
+``X-DB-Time-Ms``, ``X-DB-Slowest`` and a ``Server-Timing`` entry that browser
+dev tools display); otherwise one log line per request is written to the
+``uniworld_backend.query_budget`` logger.
+
+QUERY_BUDGETS maps URL names (``namespace:name`` for namespaced URLs) to the
+maximum number of queries a request may run. Requests carrying a session
+cookie are allowed QUERY_BUDGET_SESSION_QUERIES more for the session and user
+lookups, so budgets stay at what the view itself needs. Requests over budget
+are logged as warnings, or raise QueryBudgetExceeded when QUERY_BUDGET_STRICT
+is set, so a test hitting the view fails.
+
+Queries run while a streaming response is consumed happen after the
+middleware returns and are not counted, nor are the savepoint statements
+nested ``atomic()`` blocks issue (in tests every save runs in one), so a
+request counts the same in tests as in production.
+"""
+
+import heapq
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Length statements are shortened to in headers and log lines
+STATEMENT_PREVIEW = 200
+
+SAVEPOINT_PREFIXES = ('SAVEPOINT ', 'RELEASE SAVEPOINT ', 'ROLLBACK TO SAVEPOINT ')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a request runs more queries than its budget"""
+
+
+class QueryStats:
+    """Execute wrapper collecting the queries of one request"""
+
+    def __init__(self, keep_slowest=3):
+        self.count = 0
+        self.duration = 0.0
+        self.keep_slowest = keep_slowest
+        self._slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            if not sql.lstrip().upper().startswith(SAVEPOINT_PREFIXES):
+                self.count += 1
+            self.duration += elapsed
+            if self.keep_slowest:
+                entry = (elapsed, self.count, sql)
+                if len(self._slowest) < self.keep_slowest:
+                    heapq.heappush(self._slowest, entry)
+                elif elapsed > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        """(seconds, sql) of the slowest statements, slowest first"""
+        return [(elapsed, sql) for elapsed, _, sql in sorted(self._slowest, reverse=True)]
+
+
+def _preview(sql):
+    text = ' '.join(sql.split())
+    if len(text) > STATEMENT_PREVIEW:
+        text = text[:STATEMENT_PREVIEW - 3] + '...'
+    return text.encode('ascii', 'replace').decode('ascii')
+
+
+def url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+def query_budget(name, request=None):
+    """Query budget of a URL name (for this request, if given), None when it has none"""
+    if name is None:
+        return None
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(name)
+    if budget is not None and request is not None and settings.SESSION_COOKIE_NAME in request.COOKIES:
+        budget += getattr(settings, 'QUERY_BUDGET_SESSION_QUERIES', 3)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """Records the queries of every request and checks them against QUERY_BUDGETS"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats(getattr(settings, 'QUERY_SLOWEST_COUNT', 3))
+        # Read by MetricsMiddleware once the response is built
+        request.query_stats = stats
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        name = url_name(request)
+        duration_ms = stats.duration * 1000
+        if settings.DEBUG:
+            response['X-DB-Queries'] = str(stats.count)
+            response['X-DB-Time-Ms'] = f'{duration_ms:.2f}'
+            if stats.slowest:
+                response['X-DB-Slowest'] = _preview(stats.slowest[0][1])
+            timing = f'db;dur={duration_ms:.2f};desc="{stats.count} queries"'
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+        else:
+            logger.info(
+                '%s %s %s queries=%d db_ms=%.2f slowest=%s',
+                request.method, request.path, response.status_code, stats.count, duration_ms,
+                ' | '.join(f'{elapsed * 1000:.2f}ms {_preview(sql)}' for elapsed, sql in stats.slowest) or '-',
+            )
+
+        budget = query_budget(name, request)
+        if budget is not None and stats.count > budget:
+            message = (
+                f'{request.method} {request.path} ({name}) ran {stats.count} queries, '
+                f'over its budget of {budget}'
+            )
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
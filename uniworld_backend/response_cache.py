@@ -0,0 +1,143 @@
+"""
+Shared response cache for catalog queries.
+
+Responses are stored in the ``search`` cache (Redis in production, local
+memory or files locally) under a key made of the canonicalized query
+parameters and the catalog version, so any catalog change invalidates every
+entry at once without explicit deletes. Entries expire after
+SEARCH_CACHE_TIMEOUT seconds; eviction under memory pressure is LRU
+(LocMemCache MAX_ENTRIES culling / Redis ``allkeys-lru``).
+
+Concurrent misses for the same key are collapsed: the first request takes a
+short lock and computes the response while the others wait for it to appear
+in the cache instead of running the same query.
+"""
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, QueryDict
+
+from universities.catalog_version import get_catalog_version
+
+from . import metrics
+
+
+CACHE_ALIAS = 'search'
+
+# How long a request computing a response holds the stampede lock
+LOCK_TIMEOUT = 30
+# How long other requests wait for that response before computing it themselves
+LOCK_WAIT = 5.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _cache():
+    return caches[CACHE_ALIAS] if CACHE_ALIAS in settings.CACHES else caches['default']
+
+
+def _canonical_items(params, lowercase=()):
+    items = []
+    for key in sorted(params.keys()):
+        for value in params.getlist(key):
+            value = ' '.join(value.split())
+            if not value:
+                continue
+            if key in lowercase:
+                value = value.lower()
+            items.append((key, value))
+    return sorted(items)
+
+
+def canonical_params(params, lowercase=()):
+    """
+    Canonical, order independent form of query parameters.
+
+    Empty values are dropped and whitespace is collapsed; parameters listed in
+    ``lowercase`` (e.g. case-insensitive text queries) are lowercased.
+    """
+    return urlencode(_canonical_items(params, lowercase))
+
+
+def canonical_query_dict(params, lowercase=()):
+    """
+    The canonical parameters as a QueryDict.
+
+    Views whose responses are cached must query with these rather than the raw
+    parameters: requests sharing a cache key then also share their results
+    (`` Italy`` and ``Italy`` filter the same way).
+    """
+    query = QueryDict(mutable=True)
+    for key, value in _canonical_items(params, lowercase):
+        query.appendlist(key, value)
+    query._mutable = False
+    return query
+
+
+def cache_key(namespace, request, lowercase=()):
+    version, _ = get_catalog_version()
+    digest = hashlib.sha256(canonical_params(request.GET, lowercase).encode('utf-8')).hexdigest()
+    return f'response:{namespace}:v{version}:{digest}'
+
+
+def _cached_response(entry):
+    content_type, content = entry
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def _store(cache, key, response, timeout):
+    if response.status_code == 200 and not response.streaming:
+        cache.set(key, (response['Content-Type'], response.content), timeout)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def cached_response(request, namespace, build_response, lowercase=()):
+    """
+    Return a cached response for the request, building it on a miss.
+
+    Args:
+        request: The current request (its GET parameters form the key)
+        namespace: Key prefix identifying the endpoint
+        build_response: Callable returning the response on a cache miss
+        lowercase: Parameters whose values are case-insensitive
+
+    The request's GET parameters are replaced by their canonical form before
+    build_response runs, so the response always matches its key. Only
+    successful, non-streaming responses are cached.
+    """
+    request.GET = canonical_query_dict(request.GET, lowercase)
+    timeout = getattr(settings, 'SEARCH_CACHE_TIMEOUT', 300)
+    if not timeout:
+        return build_response()
+
+    cache = _cache()
+    key = cache_key(namespace, request, lowercase)
+    entry = cache.get(key)
+    metrics.record_cache(namespace, entry is not None)
+    if entry is not None:
+        return _cached_response(entry)
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _store(cache, key, build_response(), timeout)
+        finally:
+            cache.delete(lock_key)
+
+    # Someone else is computing this response; wait for it
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return _cached_response(entry)
+        if cache.get(lock_key) is None:
+            break
+
+    return _store(cache, key, build_response(), timeout)
@@ -53,12 +53,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'uniworld_backend.query_budget.QueryBudgetMiddleware',  # Outermost so session/auth queries are counted
+    'uniworld_backend.metrics.MetricsMiddleware',  # Reads the query statistics of QueryBudgetMiddleware
     'corsheaders.middleware.CorsMiddleware',  # Re-enabled for session authentication
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'uniworld_backend.profiling.ProfilingMiddleware',  # Needs request.user
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -258,3 +261,144 @@ GOOGLE_REDIRECT_URI = config('GOOGLE_REDIRECT_URI', default='http://127.0.0.1:80
 MICROSOFT_CLIENT_ID = config('MICROSOFT_CLIENT_ID', default='')
 MICROSOFT_CLIENT_SECRET = config('MICROSOFT_CLIENT_SECRET', default='')
 MICROSOFT_REDIRECT_URI = config('MICROSOFT_REDIRECT_URI', default='http://127.0.0.1:8000/oauth/outlook/callback/')
+
+# Catalog API pagination (every non-streamed list response is one page) and streaming dumps
+CATALOG_PAGE_SIZE = config('CATALOG_PAGE_SIZE', default=50, cast=int)
+CATALOG_MAX_PAGE_SIZE = config('CATALOG_MAX_PAGE_SIZE', default=200, cast=int)
+CATALOG_STREAM_CHUNK_SIZE = config('CATALOG_STREAM_CHUNK_SIZE', default=2000, cast=int)
+
+# Caches: Redis when REDIS_URL is set (configure the server with
+# maxmemory-policy allkeys-lru), otherwise local memory or files
+REDIS_URL = config('REDIS_URL', default='')
+CACHE_DIR = config('CACHE_DIR', default='')
+
+if REDIS_URL:
+    _search_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'search',
+    }
+elif CACHE_DIR:
+    _search_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+else:
+    _search_cache = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'uniworld-search',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+
+# Bulk email token buckets (payments/rate_limits.py) must be shared by all
+# processes sending mail: Redis in production, per process otherwise
+if REDIS_URL:
+    _rate_limits_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'rate_limits',
+    }
+else:
+    _rate_limits_cache = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'uniworld-rate-limits',
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': _search_cache,
+    'rate_limits': _rate_limits_cache,
+}
+
+# Seconds a cached search response is reused (0 disables the search cache)
+SEARCH_CACHE_TIMEOUT = config('SEARCH_CACHE_TIMEOUT', default=300, cast=int)
+
+# Per-request query instrumentation (uniworld_backend/query_budget.py): URL
+# name -> maximum queries per request (catalog endpoints: the catalog version
+# check and the page; search: plus one per facet). Requests carrying a session
+# cookie may run QUERY_BUDGET_SESSION_QUERIES more (loading the session and
+# the user, saving the session with SESSION_SAVE_EVERY_REQUEST).
+# Over-budget requests are logged, or raise with QUERY_BUDGET_STRICT (tests)
+QUERY_BUDGETS = {
+    'universities-api': 2,
+    'programs-api': 2,
+    'coordinators-api': 2,
+    'countries-api': 2,
+    'fields-of-study-api': 2,
+    'search-api': 7,
+    'profile': 1,
+    'get-oauth-tokens': 1,
+}
+QUERY_BUDGET_SESSION_QUERIES = 3
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=False, cast=bool)
+QUERY_SLOWEST_COUNT = config('QUERY_SLOWEST_COUNT', default=3, cast=int)
+
+# On-demand request profiling for staff (uniworld_backend/profiling.py)
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILING_MAX_FILES = config('PROFILING_MAX_FILES', default=100, cast=int)
+PROFILING_HEADER = 'X-Profile'
+PROFILING_QUERY_PARAM = '_profile'
+
+# Bulk email jobs (payments/bulk_email.py): 'thread' sends from a thread of
+# the web process (development), 'db' waits for manage.py run_bulk_email_worker,
+# 'celery' queues a Celery task
+BULK_EMAIL_QUEUE = config('BULK_EMAIL_QUEUE', default='thread')
+# Running jobs without a heartbeat for this long are resumed by another worker
+BULK_EMAIL_STALE_SECONDS = config('BULK_EMAIL_STALE_SECONDS', default=300, cast=int)
+# Gmail bulk sends pack up to GMAIL_BATCH_SIZE messages (Gmail allows 100)
+# into one batch request; 1 sends them one request at a time. GMAIL_API_URL
+# can point at manage.py fake_email_provider
+GMAIL_BATCH_SIZE = config('GMAIL_BATCH_SIZE', default=50, cast=int)
+GMAIL_API_URL = config('GMAIL_API_URL', default='https://gmail.googleapis.com')
+# Outlook bulk sends pack up to GRAPH_BATCH_SIZE messages (Graph allows 20)
+# into one $batch request
+GRAPH_BATCH_SIZE = config('GRAPH_BATCH_SIZE', default=20, cast=int)
+GRAPH_API_URL = config('GRAPH_API_URL', default='https://graph.microsoft.com')
+# Throttled (429) and unavailable (503) messages are sent again up to this many
+# times, waiting as long as the provider's Retry-After asks (capped)
+BULK_EMAIL_MAX_RETRIES = config('BULK_EMAIL_MAX_RETRIES', default=3, cast=int)
+BULK_EMAIL_MAX_RETRY_AFTER = config('BULK_EMAIL_MAX_RETRY_AFTER', default=60, cast=int)
+# Requests a bulk email job keeps in flight at once (Graph allows 4 concurrent
+# requests per mailbox)
+BULK_EMAIL_CONCURRENCY = config('BULK_EMAIL_CONCURRENCY', default=4, cast=int)
+# Token buckets per provider, (messages per second, burst), for each sending
+# user and for the whole deployment (payments/rate_limits.py)
+BULK_EMAIL_RATE_LIMITS = {
+    'gmail': {'user': (2.5, 25), 'provider': (200, 400)},
+    'outlook': {'user': (0.5, 20), 'provider': (1000, 2000)},
+}
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=REDIS_URL or 'redis://localhost:6379/0')
+CELERY_TASK_ACKS_LATE = True
+
+# Outbound HTTP (uniworld_backend/http_clients.py): one keep-alive session per
+# provider and process, with at most HTTP_POOL_MAXSIZE connections per host.
+# Only failed connection attempts are retried
+HTTP_CONNECT_TIMEOUT = config('HTTP_CONNECT_TIMEOUT', default=3.05, cast=float)
+HTTP_READ_TIMEOUT = config('HTTP_READ_TIMEOUT', default=20, cast=float)
+HTTP_POOL_MAXSIZE = config('HTTP_POOL_MAXSIZE', default=10, cast=int)
+HTTP_MAX_RETRIES = config('HTTP_MAX_RETRIES', default=2, cast=int)
+
+# Prometheus scrape endpoint (uniworld_backend/metrics.py): /metrics requires
+# "Authorization: Bearer <METRICS_TOKEN>" and, without a token, is only served
+# with DEBUG on. Multi-process servers also need the PROMETHEUS_MULTIPROC_DIR
+# environment variable
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'uniworld_backend.query_budget': {
+            'handlers': ['console'],
+            'level': config('QUERY_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,70 @@
+"""
+Streaming responses for full catalog dumps.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` and written out as
+they are serialized, so memory stays constant and the first bytes go out
+before the whole catalog has been read.
+
+Supported formats (``?stream=<format>``):
+
+- ``json``: ``{"results": [...], "count": N}`` (count is written last)
+- ``ndjson``: one JSON object per line
+"""
+
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def requested_format(request):
+    """Return the requested stream format, or None for a regular response"""
+    fmt = request.GET.get('stream')
+    return fmt if fmt in STREAM_FORMATS else None
+
+
+def _dumps(obj):
+    return json.dumps(obj, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def _iter_rows(queryset, serializer, chunk_size):
+    """Yield serialized rows in groups of chunk_size"""
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(_dumps(serializer(obj)))
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _json_stream(queryset, serializer, results_key, chunk_size):
+    yield f'{{"{results_key}":['
+    count = 0
+    for batch in _iter_rows(queryset, serializer, chunk_size):
+        yield (',' if count else '') + ','.join(batch)
+        count += len(batch)
+    yield f'],"count":{count}}}'
+
+
+def _ndjson_stream(queryset, serializer, chunk_size):
+    for batch in _iter_rows(queryset, serializer, chunk_size):
+        yield '\n'.join(batch) + '\n'
+
+
+def stream_response(queryset, serializer, fmt, results_key='results'):
+    """Build a StreamingHttpResponse serializing every row of queryset"""
+    chunk_size = getattr(settings, 'CATALOG_STREAM_CHUNK_SIZE', 2000)
+    if fmt == 'ndjson':
+        content = _ndjson_stream(queryset, serializer, chunk_size)
+    else:
+        content = _json_stream(queryset, serializer, results_key, chunk_size)
+    return StreamingHttpResponse(content, content_type=STREAM_FORMATS[fmt])
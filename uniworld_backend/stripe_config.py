@@ -2,9 +2,16 @@ import stripe
 import os
 from django.conf import settings
 
+from . import http_clients
+from .metrics import InstrumentedStripeClient
+
 # Stripe configuration
 stripe.api_key = getattr(settings, 'STRIPE_SECRET_KEY', 'sk_test_your_stripe_secret_key_here')
 
+# Every Stripe API call (here, in stripe_views and in payments) is timed and
+# goes through the pooled keep-alive session of the calling process
+stripe.default_http_client = InstrumentedStripeClient(timeout=http_clients.default_timeout())
+
 # Stripe webhook endpoint secret
 STRIPE_WEBHOOK_SECRET = getattr(settings, 'STRIPE_WEBHOOK_SECRET', 'whsec_your_webhook_secret_here')
 
@@ -26,6 +26,8 @@ from .stripe_views import (
     get_user_subscription
 )
 from . import oauth_token_views
+from . import profiling_views
+from . import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -58,6 +60,7 @@ urlpatterns = [
     path('api/search/', views.search_api_view, name='search-api'),
     path('api/send-email/', views.send_email_api_view, name='send-email-api'),
     path('api/send-bulk-email/', views.send_bulk_email_api_view, name='send-bulk-email-api'),
+    path('api/bulk-email-jobs/<int:job_id>/', views.bulk_email_job_view, name='bulk-email-job'),
     
     # Stripe Payment Endpoints
     path('api/create-payment-session/', create_payment_session, name='create-payment-session'),
@@ -76,6 +79,13 @@ urlpatterns = [
     path('api/oauth/tokens/', oauth_token_views.get_oauth_tokens, name='get-oauth-tokens'),
     path('api/oauth/refresh/', oauth_token_views.refresh_oauth_token, name='refresh-oauth-token'),
     
+    # Prometheus metrics
+    path('metrics', metrics.metrics_view, name='metrics'),
+    
+    # Request profiles (staff only)
+    path('api/profiles/', profiling_views.list_profiles_view, name='profile-list'),
+    path('api/profiles/<str:profile_id>/', profiling_views.download_profile_view, name='profile-download'),
+    
     # AI Services Endpoints
     path('api/ai/', include('ai_services.urls')),
     
@@ -1,6 +1,7 @@
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth import get_user_model
 User = get_user_model()
@@ -8,10 +9,14 @@ from django.contrib.auth.hashers import make_password
 from django.conf import settings
 from django.utils import timezone
 from universities.models import University, Program, Coordinator
+from universities import facets, search
+from universities.catalog_version import catalog_condition
+from payments import bulk_email, email_transports
+from payments.models import BulkEmailJob
+from . import http_clients, metrics, pagination, response_cache, streaming
 import json
 import os
 import time
-import requests
 from datetime import datetime, timedelta
 from .oauth_token_views import refresh_gmail_token, refresh_outlook_token
 
@@ -390,84 +395,152 @@ def change_password_view(request):
 
 
 # API Endpoints for Frontend
+
+# Keyset orderings used when a catalog endpoint is paginated
+UNIVERSITY_ORDERING = ('name', 'id')
+PROGRAM_ORDERING = ('university__country', 'university__name', 'name', 'id')
+COORDINATOR_ORDERING = ('university__name', 'program__name', 'name', 'id')
+SEARCH_RANK_ORDERING = ('search_rank', 'id')
+
+
+def serialize_university(uni):
+    """Convert a University into the JSON shape used by the frontend"""
+    return {
+        'id': uni.id,
+        'university_id': uni.university_id,
+        'name': uni.name,
+        'country': uni.country,
+        'city': uni.city,
+        'website': uni.website,
+        'description': uni.description,
+        'established_year': uni.established_year,
+        'student_count': uni.student_count,
+        'ranking_world': uni.ranking_world,
+        'ranking_country': uni.ranking_country,
+        'programs_count': uni.programs_count,
+        'coordinators_count': uni.coordinators_count
+    }
+
+
+def serialize_program(prog):
+    """Convert a Program (with its university selected) into the frontend JSON shape"""
+    return {
+        'id': prog.id,
+        'program_id': prog.program_id,
+        'university': {
+            'id': prog.university.id,
+            'university_id': prog.university.university_id,
+            'name': prog.university.name,
+            'country': prog.university.country,
+            'city': prog.university.city
+        },
+        'name': prog.name,
+        'field_of_study': prog.field_of_study,
+        'degree_level': prog.degree_level,
+        'description': prog.description,
+        'duration_months': prog.duration_months,
+        'language': prog.language,
+        'tuition_fee_euro': float(prog.tuition_fee_euro) if prog.tuition_fee_euro else None,
+        'application_deadline': prog.application_deadline.isoformat() if prog.application_deadline else None,
+        'start_date': prog.start_date.isoformat() if prog.start_date else None,
+        'min_gpa': float(prog.min_gpa) if prog.min_gpa else None,
+        'ielts_score': float(prog.ielts_score) if prog.ielts_score else None,
+        'toefl_score': prog.toefl_score,
+        'gre_score': prog.gre_score,
+        'program_website': prog.program_website,
+        'brochure_url': prog.brochure_url,
+        'is_active': prog.is_active,
+        'coordinators_count': prog.coordinators_count
+    }
+
+
+def serialize_coordinator(coord):
+    """Convert a Coordinator (with university and program selected) into the frontend JSON shape"""
+    return {
+        'id': coord.id,
+        'university': {
+            'id': coord.university.id,
+            'university_id': coord.university.university_id,
+            'name': coord.university.name,
+            'country': coord.university.country,
+            'city': coord.university.city
+        },
+        'program': {
+            'id': coord.program.id,
+            'program_id': coord.program.program_id,
+            'name': coord.program.name,
+            'field_of_study': coord.program.field_of_study
+        },
+        'name': coord.name,
+        'email': coord.public_email,  # Changed from public_email to email
+        'role': coord.role,
+        'phone': coord.phone,
+        'office_location': coord.office_location,
+        'office_hours': coord.office_hours,
+        'title': coord.title,
+        'department': coord.department,
+        'bio': coord.bio,
+        'is_active': coord.is_active
+    }
+
+
+def catalog_list_response(request, queryset, ordering, serializer, results_key='results', extra=None):
+    """
+    Build a list response for a catalog endpoint.
+
+    One keyset page of ``page_size`` rows (CATALOG_PAGE_SIZE by default) is
+    returned together with the ``next_cursor`` of the following page, so a
+    request never loads more than CATALOG_MAX_PAGE_SIZE rows. The whole
+    queryset is only sent streamed (``stream=json|ndjson``, constant memory).
+    ``extra`` keys are added to non-streamed responses.
+    """
+    stream_format = streaming.requested_format(request)
+    if stream_format:
+        return streaming.stream_response(queryset, serializer, stream_format, results_key)
+
+    extra = extra or {}
+    try:
+        rows, next_cursor, page_size = pagination.paginate(queryset, request, ordering)
+    except pagination.InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    data = [serializer(obj) for obj in rows]
+    return JsonResponse({
+        'count': len(data),
+        results_key: data,
+        'page_size': page_size,
+        'next_cursor': next_cursor,
+        **extra
+    })
+
+
 @require_http_methods(["GET"])
+@cache_control(no_cache=True)
+@catalog_condition
 def universities_api_view(request):
     """API endpoint to get all universities"""
     try:
         universities = University.objects.all()
-        universities_data = []
-        
-        for uni in universities:
-            universities_data.append({
-                'id': uni.id,
-                'university_id': uni.university_id,
-                'name': uni.name,
-                'country': uni.country,
-                'city': uni.city,
-                'website': uni.website,
-                'description': uni.description,
-                'established_year': uni.established_year,
-                'student_count': uni.student_count,
-                'ranking_world': uni.ranking_world,
-                'ranking_country': uni.ranking_country,
-                'programs_count': uni.programs_count,
-                'coordinators_count': uni.coordinators_count
-            })
-        
-        return JsonResponse({
-            'count': len(universities_data),
-            'results': universities_data
-        })
+        return catalog_list_response(request, universities, UNIVERSITY_ORDERING, serialize_university)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
 @require_http_methods(["GET"])
+@cache_control(no_cache=True)
+@catalog_condition
 def programs_api_view(request):
     """API endpoint to get all programs"""
     try:
         programs = Program.objects.select_related('university').all()
-        programs_data = []
-        
-        for prog in programs:
-            programs_data.append({
-                'id': prog.id,
-                'program_id': prog.program_id,
-                'university': {
-                    'id': prog.university.id,
-                    'university_id': prog.university.university_id,
-                    'name': prog.university.name,
-                    'country': prog.university.country,
-                    'city': prog.university.city
-                },
-                'name': prog.name,
-                'field_of_study': prog.field_of_study,
-                'degree_level': prog.degree_level,
-                'description': prog.description,
-                'duration_months': prog.duration_months,
-                'language': prog.language,
-                'tuition_fee_euro': float(prog.tuition_fee_euro) if prog.tuition_fee_euro else None,
-                'application_deadline': prog.application_deadline.isoformat() if prog.application_deadline else None,
-                'start_date': prog.start_date.isoformat() if prog.start_date else None,
-                'min_gpa': float(prog.min_gpa) if prog.min_gpa else None,
-                'ielts_score': float(prog.ielts_score) if prog.ielts_score else None,
-                'toefl_score': prog.toefl_score,
-                'gre_score': prog.gre_score,
-                'program_website': prog.program_website,
-                'brochure_url': prog.brochure_url,
-                'is_active': prog.is_active,
-                'coordinators_count': prog.coordinators_count
-            })
-        
-        return JsonResponse({
-            'count': len(programs_data),
-            'results': programs_data
-        })
+        return catalog_list_response(request, programs, PROGRAM_ORDERING, serialize_program)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
 @require_http_methods(["GET"])
+@cache_control(no_cache=True)
+@catalog_condition
 def coordinators_api_view(request):
     """API endpoint to get coordinators with optional filtering"""
     try:
@@ -482,50 +555,16 @@ def coordinators_api_view(request):
         # Apply filtering if program_id is provided
         if program_id:
             coordinators = coordinators.filter(program__program_id=program_id)
-            print(f"Filtered coordinators for program_id {program_id}: {coordinators.count()}")
-        
-        coordinators_data = []
-        
-        for coord in coordinators:
-            coordinators_data.append({
-                'id': coord.id,
-                'university': {
-                    'id': coord.university.id,
-                    'university_id': coord.university.university_id,
-                    'name': coord.university.name,
-                    'country': coord.university.country,
-                    'city': coord.university.city
-                },
-                'program': {
-                    'id': coord.program.id,
-                    'program_id': coord.program.program_id,
-                    'name': coord.program.name,
-                    'field_of_study': coord.program.field_of_study
-                },
-                'name': coord.name,
-                'email': coord.public_email,  # Changed from public_email to email
-                'role': coord.role,
-                'phone': coord.phone,
-                'office_location': coord.office_location,
-                'office_hours': coord.office_hours,
-                'title': coord.title,
-                'department': coord.department,
-                'bio': coord.bio,
-                'is_active': coord.is_active
-            })
-        
-        print(f"Returning {len(coordinators_data)} coordinators")
         
-        return JsonResponse({
-            'count': len(coordinators_data),
-            'results': coordinators_data
-        })
+        return catalog_list_response(request, coordinators, COORDINATOR_ORDERING, serialize_coordinator)
     except Exception as e:
         print(f"Error in coordinators API: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
 @require_http_methods(["GET"])
+@cache_control(no_cache=True)
+@catalog_condition
 def countries_api_view(request):
     """API endpoint to get all unique countries"""
     try:
@@ -539,6 +578,8 @@ def countries_api_view(request):
 
 
 @require_http_methods(["GET"])
+@cache_control(no_cache=True)
+@catalog_condition
 def fields_of_study_api_view(request):
     """API endpoint to get all unique fields of study"""
     try:
@@ -551,92 +592,94 @@ def fields_of_study_api_view(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+# Search filter parameter -> Program lookup (exact match)
+SEARCH_FILTERS = {
+    'university': 'university__name',
+    'country': 'university__country',
+    'field_of_study': 'field_of_study',
+    'degree_level': 'degree_level',
+    'language': 'language',
+}
+
+
+def filter_search_programs(params, exclude=None):
+    """
+    Build the Program queryset for /api/search/ from request parameters.
+
+    Args:
+        params: The request's GET parameters
+        exclude: Facet name whose filter should be skipped (for facet counts)
+    """
+    programs = Program.objects.select_related('university').all()
+    
+    query = params.get('q', '').strip()
+    if query:
+        programs = search.filter_programs(programs, query)
+    
+    for param, lookup in SEARCH_FILTERS.items():
+        value = params.get(param)
+        if value and param != exclude:
+            programs = programs.filter(**{lookup: value})
+    
+    tuition = params.get('tuition')
+    if tuition and exclude != 'tuition':
+        tuition_q = facets.tuition_filter(tuition)
+        if tuition_q is not None:
+            programs = programs.filter(tuition_q)
+    
+    return programs
+
+
 @require_http_methods(["GET"])
 def search_api_view(request):
-    """API endpoint to search programs with filters"""
+    """
+    API endpoint to search programs with filters
+    
+    Pass ``facets=1`` (or a list such as ``facets=country,language``) to also
+    get per-value counts for country, field_of_study, degree_level, language
+    and tuition buckets under the current filters.
+    """
     try:
         print("=== SEARCH API CALLED ===")
+        print(f"Search API called with filters: {dict(request.GET.items())}")
         
-        # Get filter parameters
-        university = request.GET.get('university')
-        country = request.GET.get('country')
-        field_of_study = request.GET.get('field_of_study')
-        degree_level = request.GET.get('degree_level')
-        language = request.GET.get('language')
-        
-        print(f"Search API called with filters: university={university}, country={country}, field_of_study={field_of_study}")
-        
-        # Start with all programs
-        programs = Program.objects.select_related('university').all()
-        print(f"Total programs before filtering: {programs.count()}")
-        
-        # Apply filters
-        if university:
-            programs = programs.filter(university__name=university)
-            print(f"After university filter: {programs.count()}")
-        if country:
-            programs = programs.filter(university__country=country)
-            print(f"After country filter: {programs.count()}")
-        if field_of_study:
-            programs = programs.filter(field_of_study=field_of_study)
-            print(f"After field_of_study filter: {programs.count()}")
-        if degree_level:
-            programs = programs.filter(degree_level=degree_level)
-            print(f"After degree_level filter: {programs.count()}")
-        if language:
-            programs = programs.filter(language=language)
-            print(f"After language filter: {programs.count()}")
-        
-        # Order by country first, then by university name, then by program name
-        programs = programs.order_by('university__country', 'university__name', 'name')
-        print(f"Final programs count: {programs.count()}")
-        
-        # Convert to JSON format
-        programs_data = []
-        for prog in programs:
-            programs_data.append({
-                'id': prog.id,
-                'program_id': prog.program_id,
-                'university': {
-                    'id': prog.university.id,
-                    'university_id': prog.university.university_id,
-                    'name': prog.university.name,
-                    'country': prog.university.country,
-                    'city': prog.university.city
-                },
-                'name': prog.name,
-                'field_of_study': prog.field_of_study,
-                'degree_level': prog.degree_level,
-                'description': prog.description,
-                'duration_months': prog.duration_months,
-                'language': prog.language,
-                'tuition_fee_euro': float(prog.tuition_fee_euro) if prog.tuition_fee_euro else None,
-                'application_deadline': prog.application_deadline.isoformat() if prog.application_deadline else None,
-                'start_date': prog.start_date.isoformat() if prog.start_date else None,
-                'min_gpa': float(prog.min_gpa) if prog.min_gpa else None,
-                'ielts_score': float(prog.ielts_score) if prog.ielts_score else None,
-                'toefl_score': prog.toefl_score,
-                'gre_score': prog.gre_score,
-                'program_website': prog.program_website,
-                'brochure_url': prog.brochure_url,
-                'is_active': prog.is_active,
-                'coordinators_count': prog.coordinators_count
-            })
-        
-        print(f"Returning {len(programs_data)} programs")
-        print(f"First program: {programs_data[0] if programs_data else 'None'}")
-        
-        response_data = {
-            'count': len(programs_data),
-            'programs': programs_data
-        }
+        if streaming.requested_format(request):
+            # Filter exactly like the cached JSON responses do
+            request.GET = response_cache.canonical_query_dict(request.GET, lowercase=('q',))
+            return build_search_response(request)
         
-        print(f"Response data: {response_data}")
-        return JsonResponse(response_data)
+        # Identical searches are answered from the shared cache until the
+        # catalog changes
+        return response_cache.cached_response(
+            request, 'search', lambda: build_search_response(request), lowercase=('q',)
+        )
     except Exception as e:
         print(f"Search API error: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
+
+def build_search_response(request):
+    """Run the search for /api/search/ and build its response"""
+    query = request.GET.get('q', '').strip()
+    programs = filter_search_programs(request.GET)
+    
+    # Order by relevance for text queries, otherwise by country first,
+    # then by university name, then by program name
+    ordering = SEARCH_RANK_ORDERING if query else PROGRAM_ORDERING
+    programs = programs.order_by(*ordering)
+    
+    extra = {}
+    facet_names = facets.requested_facets(request.GET.get('facets'))
+    if facet_names:
+        extra['facets'] = facets.compute_facets(
+            lambda exclude: filter_search_programs(request.GET, exclude=exclude),
+            facet_names
+        )
+    
+    return catalog_list_response(
+        request, programs, ordering, serialize_program, results_key='programs', extra=extra
+    )
+
 @csrf_exempt
 def send_email_api_view(request):
     """API endpoint to send emails to coordinators using OAuth2"""
@@ -744,7 +787,13 @@ def send_email_api_view(request):
 
 @csrf_exempt
 def send_bulk_email_api_view(request):
-    """API endpoint to send bulk emails to multiple coordinators"""
+    """
+    API endpoint to send bulk emails to multiple coordinators
+    
+    The personalized messages are queued as a background job (see
+    payments.bulk_email) and the response, 202 Accepted, carries the job id;
+    /api/bulk-email-jobs/<id>/ reports the progress of every recipient.
+    """
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
     
@@ -767,160 +816,24 @@ def send_bulk_email_api_view(request):
         if not all([coordinators, subject, body]):
             return JsonResponse({'error': 'Missing required fields'}, status=400)
         
-        # Check if user has OAuth tokens for the specified provider
-        if email_provider == 'gmail':
-            if not user.google_access_token:
-                return JsonResponse({'error': 'Gmail not connected. Please connect your Gmail account first.'}, status=400)
-            
-            # Check if token is expired
-            if user.google_token_expiry and user.google_token_expiry < timezone.now():
-                # Try to refresh the token
-                if user.google_refresh_token:
-                    new_token_data = refresh_gmail_token(user.google_refresh_token)
-                    if new_token_data:
-                        user.google_access_token = new_token_data.get('access_token')
-                        if new_token_data.get('refresh_token'):
-                            user.google_refresh_token = new_token_data.get('refresh_token')
-                        expires_in = new_token_data.get('expires_in', 3600)
-                        user.google_token_expiry = timezone.now() + timedelta(seconds=expires_in)
-                        user.save()
-                    else:
-                        return JsonResponse({'error': 'Gmail token expired and refresh failed. Please reconnect your Gmail account.'}, status=400)
-                else:
-                    return JsonResponse({'error': 'Gmail token expired. Please reconnect your Gmail account.'}, status=400)
-        
-        elif email_provider == 'outlook':
-            if not user.microsoft_access_token:
-                return JsonResponse({'error': 'Outlook not connected. Please connect your Outlook account first.'}, status=400)
-            
-            # Check if token is expired
-            if user.microsoft_token_expiry and user.microsoft_token_expiry < timezone.now():
-                # Try to refresh the token
-                if user.microsoft_refresh_token:
-                    new_token_data = refresh_outlook_token(user.microsoft_refresh_token)
-                    if new_token_data:
-                        user.microsoft_access_token = new_token_data.get('access_token')
-                        if new_token_data.get('refresh_token'):
-                            user.microsoft_refresh_token = new_token_data.get('refresh_token')
-                        expires_in = new_token_data.get('expires_in', 3600)
-                        user.microsoft_token_expiry = timezone.now() + timedelta(seconds=expires_in)
-                        user.save()
-                    else:
-                        return JsonResponse({'error': 'Outlook token expired and refresh failed. Please reconnect your Outlook account.'}, status=400)
-                else:
-                    return JsonResponse({'error': 'Outlook token expired. Please reconnect your Outlook account.'}, status=400)
+        if email_provider not in bulk_email.PROVIDERS:
+            return JsonResponse({'error': 'Unsupported email provider'}, status=400)
         
-        # Send emails to all coordinators
-        total_coordinators = len(coordinators)
-        successful_sends = 0
-        failed_sends = 0
-        message_ids = []
-        
-        for coordinator in coordinators:
-            coordinator_email = coordinator.get('email')
-            if not coordinator_email:
-                failed_sends += 1
-                continue
-            
-            # Personalize email content for each coordinator
-            coordinator_name = coordinator.get('name', 'Coordinator')
-            program_name = coordinator.get('program_name', 'Program')
-            university_name = coordinator.get('university_name', 'University')
-            
-            # Get program details for more specific content
-            program_data = coordinator.get('program', {})
-            field_of_study = program_data.get('field_of_study', '')
-            degree_level = program_data.get('degree_level', '')
-            
-            # Create program-specific subject
-            if program_name == 'test program 1':
-                personalized_subject = f"Test 1 Programme Inquiry - {user.full_name or user.email} - {program_name} at {university_name}"
-            elif program_name == 'test 2 programe':
-                personalized_subject = f"Test 2 Programme Inquiry - {user.full_name or user.email} - {program_name} at {university_name}"
-            else:
-                personalized_subject = f"{program_name} Programme Inquiry - {user.full_name or user.email} - {university_name}"
-            
-            # Create program-specific email body
-            if program_name == 'test program 1':
-                personalized_body = f"""Dear {coordinator_name},
-
-My name is {user.full_name or user.email}, and I am writing to express my strong interest in the Test 1 Programme at the University of Turin. I am particularly drawn to this program's focus on {field_of_study} and believe it aligns perfectly with my academic and career goals.
-
-Having researched the University of Turin's excellent reputation in {field_of_study}, I am excited about the opportunity to contribute to and learn from your distinguished faculty. My background in economics provides a solid foundation for this {degree_level} program, and I am confident that my analytical skills and dedication to academic excellence would make me a valuable addition to your cohort.
-
-I would be grateful if you could provide me with further information regarding the admission requirements, application deadlines, and the selection criteria for the Test 1 Programme. I am particularly interested in understanding the program structure and any specific prerequisites.
-
-Thank you for your time and consideration. I look forward to hearing from you soon.
-
-Best regards,
-{user.full_name or user.email}"""
-            
-            elif program_name == 'test 2 programe':
-                personalized_body = f"""Dear {coordinator_name},
-
-I hope this email finds you well. My name is {user.full_name or user.email}, and I am writing to inquire about the Test 2 Programme at the University of Turin. I am very interested in pursuing my {degree_level} studies in {field_of_study} at your prestigious institution.
-
-The University of Turin's commitment to academic excellence and innovation in {field_of_study} has particularly caught my attention. I believe that the Test 2 Programme would provide me with the advanced knowledge and skills necessary to excel in my chosen field.
-
-I would appreciate any information you could provide about the program curriculum, admission process, and application requirements. Additionally, I would be grateful for any insights into the program's unique features and what makes it stand out among similar programs.
-
-Thank you for taking the time to consider my inquiry. I look forward to your response and the possibility of joining your academic community.
-
-Best regards,
-{user.full_name or user.email}"""
-            
-            else:
-                # Generic template for other programs
-                personalized_body = f"""Dear {coordinator_name},
-
-My name is {user.full_name or user.email}, and I am writing to express my interest in the {program_name} at {university_name}. I am particularly interested in the {field_of_study} field and believe this {degree_level} program would be an excellent fit for my academic and career aspirations.
-
-I would be grateful if you could provide me with information about the admission requirements, application process, and program details. Thank you for your time and consideration.
-
-Best regards,
-{user.full_name or user.email}"""
-            
-            # Send email via the appropriate provider
-            if email_provider == 'gmail':
-                success = send_gmail_email(user.google_access_token, coordinator_email, personalized_subject, personalized_body)
-            elif email_provider == 'outlook':
-                success = send_outlook_email(user.microsoft_access_token, coordinator_email, personalized_subject, personalized_body)
-            else:
-                success = False
-            
-            if success:
-                successful_sends += 1
-                message_ids.append(f'msg_{int(time.time())}_{successful_sends}')
-            else:
-                failed_sends += 1
-        
-        # Create bulk email log
-        bulk_email_log = {
-            'id': f'bulk_email_{int(time.time())}',
-            'coordinators': coordinators,
-            'subject': subject,
-            'body': body,
-            'email_provider': email_provider,
-            'total_coordinators': total_coordinators,
-            'successful_sends': successful_sends,
-            'failed_sends': failed_sends,
-            'status': 'completed' if failed_sends == 0 else 'partial',
-            'sent_at': timezone.now().isoformat(),
-            'message_ids': message_ids
-        }
+        # Check that the user can send through the provider before queueing
+        try:
+            bulk_email.ensure_access_token(user, email_provider)
+        except bulk_email.ProviderNotConnected as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
-        if successful_sends == total_coordinators:
-            message = f'Bulk email sent successfully to {successful_sends} coordinators'
-        elif successful_sends > 0:
-            message = f'Bulk email sent to {successful_sends} out of {total_coordinators} coordinators ({failed_sends} failed)'
-        else:
-            message = f'Failed to send bulk email to any coordinators ({failed_sends} failed)'
+        job = bulk_email.create_job(user, coordinators, subject, body, email_provider)
         
         return JsonResponse({
-            'success': successful_sends > 0,
-            'message': message,
-            'bulk_email_log': bulk_email_log
-        })
+            'success': True,
+            'message': f'Bulk email to {job.total_recipients} coordinators queued',
+            'job_id': job.pk,
+            'status_url': f'/api/bulk-email-jobs/{job.pk}/',
+            'bulk_email_log': bulk_email.job_progress(job, include_recipients=False)
+        }, status=202)
         
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
@@ -928,6 +841,22 @@ Best regards,
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@require_http_methods(["GET"])
+def bulk_email_job_view(request, job_id):
+    """API endpoint reporting the progress of a bulk email job, per recipient"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    jobs = BulkEmailJob.objects.all()
+    if not request.user.is_staff:
+        jobs = jobs.filter(user=request.user)
+    job = jobs.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Bulk email job not found'}, status=404)
+    
+    return JsonResponse(bulk_email.job_progress(job))
+
+
 @require_http_methods(["GET"])
 def test_user_profile_view(request):
     """Test endpoint for user profile functionality"""
@@ -1038,7 +967,7 @@ def exchange_gmail_code_for_token(code):
         print(f"Redirect URI being sent: {data['redirect_uri']}")
         print(f"Settings GOOGLE_REDIRECT_URI: {getattr(settings, 'GOOGLE_REDIRECT_URI', 'NOT_SET')}")
         
-        response = requests.post(token_url, data=data)
+        response = http_clients.session('google').post(token_url, data=data)
         
         print(f"Token exchange response status: {response.status_code}")
         print(f"Token exchange response text: {response.text}")
@@ -1058,7 +987,7 @@ def get_gmail_user_email(access_token):
     """Get user's email from Google API"""
     try:
         headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get('https://www.googleapis.com/oauth2/v2/userinfo', headers=headers)
+        response = http_clients.session('google').get('https://www.googleapis.com/oauth2/v2/userinfo', headers=headers)
         
         if response.status_code == 200:
             user_info = response.json()
@@ -1123,7 +1052,7 @@ def exchange_outlook_code_for_token(code):
             'redirect_uri': getattr(settings, 'MICROSOFT_REDIRECT_URI', 'http://127.0.0.1:8000/oauth/outlook/callback')
         }
         
-        response = requests.post(token_url, data=data)
+        response = http_clients.session('microsoft').post(token_url, data=data)
         
         if response.status_code == 200:
             return response.json()
@@ -1139,7 +1068,7 @@ def get_outlook_user_email(access_token):
     """Get user's email from Microsoft Graph API"""
     try:
         headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get('https://graph.microsoft.com/v1.0/me', headers=headers)
+        response = http_clients.session('microsoft').get('https://graph.microsoft.com/v1.0/me', headers=headers)
         
         if response.status_code == 200:
             user_info = response.json()
@@ -1153,24 +1082,13 @@ def get_outlook_user_email(access_token):
         return None
 
 
+@metrics.observe_outbound('gmail', 'send', is_error=lambda sent: not sent)
 def send_gmail_email(access_token, to_email, subject, body):
     """Send email via Gmail API using OAuth2 access token"""
     try:
-        import base64
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        
-        # Create email message
-        message = MIMEMultipart()
-        message['to'] = to_email
-        message['subject'] = subject
-        
-        # Add body to email
-        message.attach(MIMEText(body, 'plain'))
-        
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
-        
+        # Create and encode the email message
+        raw_message = email_transports.gmail_raw_message(to_email, subject, body)
+
         # Send email via Gmail API
         headers = {
             'Authorization': f'Bearer {access_token}',
@@ -1181,8 +1099,8 @@ def send_gmail_email(access_token, to_email, subject, body):
             'raw': raw_message
         }
         
-        response = requests.post(
-            'https://gmail.googleapis.com/gmail/v1/users/me/messages/send',
+        response = http_clients.session('google').post(
+            f'{email_transports.gmail_api_url()}/gmail/v1/users/me/messages/send',
             headers=headers,
             json=email_data
         )
@@ -1199,6 +1117,7 @@ def send_gmail_email(access_token, to_email, subject, body):
         return False
 
 
+@metrics.observe_outbound('outlook', 'send', is_error=lambda sent: not sent)
 def send_outlook_email(access_token, to_email, subject, body):
     """Send email via Outlook API using OAuth2 access token"""
     try:
@@ -1207,26 +1126,10 @@ def send_outlook_email(access_token, to_email, subject, body):
             'Content-Type': 'application/json'
         }
         
-        email_data = {
-            'message': {
-                'subject': subject,
-                'body': {
-                    'contentType': 'Text',
-                    'content': body
-                },
-                'toRecipients': [
-                    {
-                        'emailAddress': {
-                            'address': to_email
-                        }
-                    }
-                ]
-            },
-            'saveToSentItems': True
-        }
-        
-        response = requests.post(
-            'https://graph.microsoft.com/v1.0/me/sendMail',
+        email_data = email_transports.outlook_message(to_email, subject, body)
+
+        response = http_clients.session('microsoft').post(
+            f'{email_transports.graph_api_url()}/v1.0/me/sendMail',
             headers=headers,
             json=email_data
         )